@@ -0,0 +1,119 @@
+import math
+import time
+import threading
+from typing import Any, Dict, Hashable
+
+from metrics import REGISTRY
+from ttl_cache import TTLCache
+
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "medimate_admission_decisions_total",
+    "Admission decisions by branch: admitted at once, queued (admitted after a wait) or shed.",
+    ["branch", "outcome"],
+)
+ADMISSION_TOKENS = REGISTRY.counter(
+    "medimate_admission_tokens_total", "Estimated OpenAI tokens of requests by branch and outcome.", ["branch", "outcome"]
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "medimate_admission_wait_seconds", "Time queued requests waited for token budget.", ["branch"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; `retry_after` is the seconds until its budget has refilled."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Token budget exhausted; retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled at `rate` tokens per second.
+    Admitted requests take their tokens up front, even into debt, so a queued
+    request reserves its share and later requests wait behind it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 when they are now)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdmissionController:
+    """
+    Token-bucket admission for requests that spend OpenAI tokens: one bucket
+    for the whole worker and one per client, both refilled per minute and
+    holding at most a minute's budget. A request is charged its estimated
+    tokens in both; when that needs waiting, it is queued for at most
+    `max_wait` seconds, otherwise shed at once with the time to retry.
+    """
+
+    def __init__(self, global_tokens_per_minute: float, client_tokens_per_minute: float,
+                 max_wait: float = 1.0, max_clients: int = 10_000):
+        self.global_bucket = TokenBucket(global_tokens_per_minute / 60, global_tokens_per_minute)
+        self.client_tokens_per_minute = client_tokens_per_minute
+        self.max_wait = max_wait
+        # An idle client's bucket refills within a minute; forgetting it then changes nothing
+        self.clients = TTLCache(max_entries=max_clients, ttl=60, sliding=True)
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def _client_bucket(self, client: Hashable) -> TokenBucket:
+        bucket = self.clients.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_tokens_per_minute / 60, self.client_tokens_per_minute)
+            self.clients.set(client, bucket)
+        return bucket
+
+    def admit(self, client: Hashable, tokens: int, branch: str) -> None:
+        """Charges `tokens` to `client`, waiting if needed; raises AdmissionRejected to shed the request."""
+        with self._lock:
+            now = time.monotonic()
+            client_bucket = self._client_bucket(client)
+            wait = max(client_bucket.wait_time(tokens, now), self.global_bucket.wait_time(tokens, now))
+            if wait > self.max_wait:
+                self.shed += 1
+                ADMISSION_DECISIONS.inc(branch=branch, outcome="shed")
+                ADMISSION_TOKENS.inc(tokens, branch=branch, outcome="shed")
+                raise AdmissionRejected(math.ceil(wait))
+            client_bucket.take(tokens)
+            self.global_bucket.take(tokens)
+            outcome = "queued" if wait > 0 else "admitted"
+            if wait > 0:
+                self.queued += 1
+            else:
+                self.admitted += 1
+            ADMISSION_DECISIONS.inc(branch=branch, outcome=outcome)
+            ADMISSION_TOKENS.inc(tokens, branch=branch, outcome=outcome)
+
+        if wait > 0:
+            time.sleep(wait)
+            ADMISSION_WAIT_SECONDS.observe(wait, branch=branch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self.global_bucket._refill(time.monotonic())
+            return {
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "shed": self.shed,
+                "global_tokens_available": round(self.global_bucket.tokens),
+                "clients": len(self.clients),
+            }
@@ -0,0 +1,199 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from medicine_scanner import normalize
+from metrics import REGISTRY
+
+ANSWER_CACHE_LOOKUPS = REGISTRY.counter(
+    "medimate_answer_cache_lookups_total", "First-turn answer cache lookups by result.", ["result"]
+)
+
+# Words dropped from questions before matching; they never change what is asked
+FILLER_WORDS = {"a", "an", "the", "please", "hi", "hello", "hey"}
+NUMBER_PATTERN = re.compile(r"\d+")
+# Words that flip what is asked ("I am not pregnant"); normalizing splits "can't"
+# into "can t", so a lone "t" is the negation of a contraction
+NEGATION_WORDS = {
+    "no", "not", "never", "without", "none", "nor", "neither", "nothing", "cannot", "t",
+    "cant", "dont", "doesnt", "didnt", "isnt", "arent", "wasnt", "wont", "shouldnt",
+}
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cased words of `question` without punctuation or filler words."""
+    text, _ = normalize(question)
+    return " ".join(word for word in text.split() if word not in FILLER_WORDS)
+
+
+def question_terms(text: str, medicine_names: Optional[Callable[[str], Iterable[str]]] = None) -> Tuple[Any, ...]:
+    """
+    What two similar questions must share for one to get the other's answer:
+    the numbers, the number of negations and, given `medicine_names`, the
+    catalog medicines named in the normalized `text`.
+    """
+    words = text.split()
+    medicines = tuple(sorted(set(medicine_names(text)))) if medicine_names is not None else ()
+    return (
+        tuple(NUMBER_PATTERN.findall(text)),
+        sum(word in NEGATION_WORDS for word in words),
+        medicines,
+    )
+
+
+class SemanticAnswerCache:
+    """
+    Answers to session-opening questions.
+    A question matches a cached one with the same normalized text. Only when
+    given an `embedding` and a `threshold` does it otherwise match the most
+    similar cached question whose embedding has cosine similarity of at least
+    `threshold` and which has the same `question_terms`: the same numbers,
+    negations and catalog medicine names (found by `medicine_names`). Similar
+    wording is not enough for medical answers: "I am pregnant" and "I am not
+    pregnant" are close, and so are the same question about two drugs.
+    Vectors live in one preallocated matrix, one row per entry, so a lookup
+    is a single matrix-vector product. Entries expire `ttl` seconds after they
+    are stored; beyond `max_entries` the least recently used entry is evicted.
+    """
+
+    def __init__(self, embedding: Optional[Embeddings] = None, threshold: Optional[float] = None,
+                 ttl: Optional[float] = 3600, max_entries: int = 1000,
+                 medicine_names: Optional[Callable[[str], Iterable[str]]] = None):
+        self.embedding = embedding
+        self.threshold = threshold if embedding is not None else None
+        self.medicine_names = medicine_names
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Row -> entry, least recently used first
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._rows_by_text: Dict[str, int] = {}
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._vectors: Optional[np.ndarray] = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedding.embed_query(text), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return entry["expires_at"] is not None and entry["expires_at"] <= now
+
+    def _remove(self, row: int) -> None:
+        entry = self._entries.pop(row)
+        del self._rows_by_text[entry["text"]]
+        self._live[row] = False
+        self._free_rows.append(row)
+
+    def _hit(self, row: int, kind: str) -> str:
+        entry = self._entries[row]
+        entry["hits"] += 1
+        self._entries.move_to_end(row)
+        if kind == "exact":
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        ANSWER_CACHE_LOOKUPS.inc(result=kind)
+        return entry["answer"]
+
+    def _miss(self) -> None:
+        self.misses += 1
+        ANSWER_CACHE_LOOKUPS.inc(result="miss")
+
+    def get(self, question: str) -> Optional[str]:
+        """The cached answer for `question`, or None."""
+        text = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            row = self._rows_by_text.get(text)
+            if row is not None:
+                if not self._is_expired(self._entries[row], now):
+                    return self._hit(row, "exact")
+                self._remove(row)
+                self.expirations += 1
+            if self.threshold is None or not self._entries:
+                self._miss()
+                return None
+
+        vector = self._embed(text)
+        terms = question_terms(text, self.medicine_names)
+        with self._lock:
+            if self._vectors is None:
+                self._miss()
+                return None
+            scores = self._vectors @ vector
+            scores[~self._live] = -np.inf
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for row in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[int(row)]
+                if self._is_expired(entry, now):
+                    self._remove(int(row))
+                    self.expirations += 1
+                elif entry["terms"] == terms:
+                    return self._hit(int(row), "semantic")
+            self._miss()
+            return None
+
+    def set(self, question: str, answer: str) -> None:
+        text = normalize_question(question)
+        vector = terms = None
+        if self.threshold is not None:
+            vector = self._embed(text)
+            terms = question_terms(text, self.medicine_names)
+        with self._lock:
+            if vector is not None and self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if text in self._rows_by_text:
+                self._remove(self._rows_by_text[text])
+            if not self._free_rows:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            row = self._free_rows.pop()
+            if vector is not None:
+                self._vectors[row] = vector
+            self._live[row] = True
+            self._rows_by_text[text] = row
+            self._entries[row] = {
+                "text": text,
+                "question": question,
+                "answer": answer,
+                "terms": terms,
+                "expires_at": time.monotonic() + self.ttl if self.ttl is not None else None,
+                "hits": 0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for row in list(self._entries):
+                self._remove(row)
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Counters, the hit ratio and the `top` most-hit entries with their hit counts."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            most_hit: List[Dict[str, Any]] = sorted(
+                ({"question": entry["question"], "hits": entry["hits"]} for entry in self._entries.values()),
+                key=lambda item: item["hits"], reverse=True
+            )[:top]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "top_entries": most_hit,
+            }
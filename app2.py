@@ -1,21 +1,57 @@
+from __future__ import annotations
+
+import time
+_import_started = time.perf_counter()
+
+import io
 import os
 import sys
 import json
 import shutil
-from typing import List, Dict, Any, Optional
+import uuid
+import tempfile
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from itertools import zip_longest
+from typing import List, Dict, Any, Callable, Optional, IO, Iterable, Iterator, Tuple, Union, TYPE_CHECKING
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify, g
 from flask_cors import CORS
 from dotenv import load_dotenv, find_dotenv
-from pymongo import MongoClient
 
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.chains import RetrievalQA, ConversationChain
-from langchain.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
+from langchain.schema import Document
+
+from admission import AdmissionController, AdmissionRejected
+from catalog_index import sync_catalog_index, catalog_fingerprint, embedding_dimension, open_numpy_catalog_index
+from catalog_ingest import iter_catalog_records
+from embedding_cache import CachedEmbeddings
+from medicine_repository import MedicineRepository
+from jobs import JobQueue, QueueFull
+from medicine_scanner import DocumentScan, MedicineScanner, split_medicine_names
+from metrics import REGISTRY
+from resources import LazyResource, WarmUp
+from retries import call_with_retries, pooled_session
+from pdf_ingest import PdfLimitExceeded, hash_upload, iter_pdf_pages
+from token_usage import TokenUsageHandler, count_tokens
+from tracing import StageClock, span, start_trace, end_trace, current_trace
+from ttl_cache import TTLCache
+
+# Heavy client libraries (langchain chains and models, chromadb, pymongo) are
+# imported where they are first used, so they load during warm-up rather than
+# delaying the first response
+if TYPE_CHECKING:
+    from langchain.chains import ConversationChain
+    from langchain.chains.combine_documents.base import BaseCombineDocumentsChain
+    from langchain.chat_models import ChatOpenAI
+    from langchain.schema.embeddings import Embeddings
+    from langchain.vectorstores import Chroma
+    from answer_cache import SemanticAnswerCache
+    from vector_index import NumpyVectorIndex
+    from vector_store import VectorStore
+    from session_memory import BoundedConversationMemory, SessionMemoryStore
 
 # ==========================================
 # Configuration & Environment Variables
@@ -25,15 +61,150 @@ load_dotenv(find_dotenv())
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 MONGO_URL = os.environ.get("MONGO_URL")
 
+# OpenAI calls share one pooled HTTP session per worker. Timeouts are (connect, read);
+# connection failures, 429s and 5xx responses are retried with jittered backoff
+OPENAI_POOL_SIZE = int(os.environ.get("OPENAI_POOL_SIZE", "16"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+OPENAI_READ_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_READ_TIMEOUT_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+
+# Mongo connection pool, timeouts and retries of transient read errors
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_MAX_RETRIES = int(os.environ.get("MONGO_MAX_RETRIES", "2"))
+
+# Backoff between retries: a random delay up to base * 2**attempt, at most the max
+RETRY_BASE_DELAY_SECONDS = float(os.environ.get("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.environ.get("RETRY_MAX_DELAY_SECONDS", "8"))
+
 # Directory Paths
 DOCS_FOLDER = "./docs/"
-PRES_PERSIST_DIRECTORY = "docs/pres_chroma"
 MED_PERSIST_DIRECTORY = "docs/chroma/"
-MEDICINES_FILE = "medicines.json"
+# JSON array or JSON lines (.jsonl); catalog_ingest.py loads it into Mongo and the index
+MEDICINES_FILE = os.environ.get("MEDICINES_FILE", "medicines.json")
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "docs/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# Texts missing from the embedding cache go out in requests of EMBEDDING_BATCH_SIZE
+# texts, EMBEDDING_CONCURRENCY requests at a time per worker process
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", "4"))
+
+# Embedder for the medicine index and its queries: "openai", or an in-process
+# backend ("hashed" character n-grams, or "spacy" word vectors of SPACY_MODEL)
+CATALOG_EMBEDDING_BACKEND = os.environ.get("CATALOG_EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_DIMENSION = int(os.environ.get("LOCAL_EMBEDDING_DIMENSION", "512"))
+SPACY_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_md")
+
+# Medicine index: "chroma" (one worker process only); "numpy" for an exact index saved as memory-mapped .npy
+# files in MEDICINE_INDEX_DIRECTORY (shared by workers); "memory" for an exact index
+# built in each worker; or "remote" for a vector service at VECTOR_STORE_URL
+MEDICINE_INDEX_BACKEND = os.environ.get("MEDICINE_INDEX_BACKEND", "chroma")
+MEDICINE_INDEX_DIRECTORY = os.environ.get("MEDICINE_INDEX_DIRECTORY", "docs/medicine_index/")
+# HNSW search breadth of newly created Chroma collections (Chroma's default, 10, misses neighbours)
+CHROMA_SEARCH_EF = int(os.environ.get("CHROMA_SEARCH_EF", "100"))
+# Remote vector service speaking Pinecone's data-plane API: index host, key, namespace,
+# concurrent queries per worker and retries of failed requests
+VECTOR_STORE_URL = os.environ.get("VECTOR_STORE_URL")
+VECTOR_STORE_API_KEY = os.environ.get("VECTOR_STORE_API_KEY")
+VECTOR_STORE_NAMESPACE = os.environ.get("VECTOR_STORE_NAMESPACE", "")
+VECTOR_STORE_CONCURRENCY = int(os.environ.get("VECTOR_STORE_CONCURRENCY", "4"))
+VECTOR_STORE_MAX_RETRIES = int(os.environ.get("VECTOR_STORE_MAX_RETRIES", "2"))
+
+# Where full medicine documents are read from: "mongo", or "catalog" when the
+# Mongo collection is only a mirror of medicines.json
+MEDICINE_SOURCE = os.environ.get("MEDICINE_SOURCE", "mongo")
+MEDICINE_CACHE_TTL_SECONDS = float(os.environ.get("MEDICINE_CACHE_TTL_SECONDS", "300"))
+MEDICINE_CACHE_MAX_ENTRIES = int(os.environ.get("MEDICINE_CACHE_MAX_ENTRIES", "10000"))
+
+# Catalog matches returned for each medicine named in a prescription
+MEDICINE_MATCHES_PER_NAME = int(os.environ.get("MEDICINE_MATCHES_PER_NAME", "3"))
+
+# Below this share of prescribed items recognised locally, extraction falls back to the LLM
+SCANNER_MIN_CONFIDENCE = float(os.environ.get("SCANNER_MIN_CONFIDENCE", "0.6"))
+
+# Drop exactly repeated prescription chunks (page headers, footers, boilerplate) before
+# embedding. Opt-in: chunks whose simhashes differ in at most CHUNK_NEAR_DUPLICATE_BITS
+# bits count as repeats too, which can merge lines that differ only in the drug name
+CHUNK_DEDUPLICATION = os.environ.get("CHUNK_DEDUPLICATION", "1") == "1"
+CHUNK_NEAR_DUPLICATE_BITS = int(os.environ.get("CHUNK_NEAR_DUPLICATE_BITS", "0"))
+
+# Cache of whole prescription results, keyed by the hash of the uploaded PDF
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1000"))
+
+# Upload limits; uploads stay in memory up to PDF_SPOOL_MEMORY_BYTES
+PDF_MAX_BYTES = int(os.environ.get("PDF_MAX_BYTES", str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "50"))
+PDF_SPOOL_MEMORY_BYTES = int(os.environ.get("PDF_SPOOL_MEMORY_BYTES", str(10 * 1024 * 1024)))
+
+# Page text of PDFs with at least PDF_PARALLEL_MIN_PAGES pages is extracted in a pool
+# of PDF_EXTRACT_PROCESSES processes per worker (1 or less, the default: in the request
+# thread). Every gunicorn worker gets its own pool, so only enable it with fewer
+# workers than CPUs, keeping workers * (1 + PDF_EXTRACT_PROCESSES) near the CPU count
+PDF_EXTRACT_PROCESSES = int(os.environ.get("PDF_EXTRACT_PROCESSES", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "8"))
+
+# Batch prescription uploads: files per request, total body size and files analysed at once
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "50"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(100 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+# Background prescription jobs: worker threads, queue capacity and how long results are kept
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "32"))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("JOB_RESULT_TTL_SECONDS", "600"))
+
+# Per-session conversation memory: history token budget, session count and idle timeout
+SESSION_MAX_TOKENS = int(os.environ.get("SESSION_MAX_TOKENS", "2000"))
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", "1000"))
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.environ.get("SESSION_IDLE_TIMEOUT_SECONDS", "1800"))
+
+# Cache of answers to session-opening questions, matched on normalized text. Opt-in:
+# ANSWER_CACHE_SEMANTIC=1 also matches questions at least ANSWER_CACHE_THRESHOLD similar
+# that share their numbers, negations and catalog medicine names. ANSWER_CACHE_EMBEDDING
+# is "hashed" (in-process, sub-millisecond), "spacy" or "openai"
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_SEMANTIC = os.environ.get("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_EMBEDDING = os.environ.get("ANSWER_CACHE_EMBEDDING", "hashed")
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.9"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Admission control of requests that spend OpenAI tokens: token budgets per minute for
+# the whole server and for each client. Every one of SERVER_WORKERS worker processes
+# enforces its share of both. Clients are told apart by remote address, or by
+# ADMISSION_CLIENT_HEADER, which must be a header a trusted proxy or auth gateway
+# sets itself (an authenticated user id, say), never one callers choose.
+# Requests wait up to ADMISSION_MAX_WAIT_SECONDS for budget, else get 429. Estimates
+# add ADMISSION_COMPLETION_TOKENS per answer and ADMISSION_EXTRACTION_TOKENS per LLM
+# extraction of a prescription
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_GLOBAL_TOKENS_PER_MINUTE = int(os.environ.get("ADMISSION_GLOBAL_TOKENS_PER_MINUTE", "90000"))
+ADMISSION_CLIENT_TOKENS_PER_MINUTE = int(os.environ.get("ADMISSION_CLIENT_TOKENS_PER_MINUTE", "20000"))
+ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER")
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "1"))
+ADMISSION_MAX_CLIENTS = int(os.environ.get("ADMISSION_MAX_CLIENTS", "10000"))
+ADMISSION_COMPLETION_TOKENS = int(os.environ.get("ADMISSION_COMPLETION_TOKENS", "256"))
+ADMISSION_EXTRACTION_TOKENS = int(os.environ.get("ADMISSION_EXTRACTION_TOKENS", "1000"))
+
+# Worker processes serving the app; gunicorn.conf.py exports its worker count
+SERVER_WORKERS = max(1, int(os.environ.get("GUNICORN_WORKERS", "1")))
+# Directory through which worker processes share metrics, so /metrics and /stats on any
+# worker report the whole server (gunicorn.conf.py sets one for several workers); the
+# other workers' share is at most METRICS_SHARE_INTERVAL_SECONDS old
+METRICS_SHARED_DIRECTORY = os.environ.get("METRICS_SHARED_DIRECTORY")
+METRICS_SHARE_INTERVAL_SECONDS = float(os.environ.get("METRICS_SHARE_INTERVAL_SECONDS", "5"))
+
+# Requests slower than this print their per-stage trace
+TRACE_LOG_SLOW_SECONDS = float(os.environ.get("TRACE_LOG_SLOW_SECONDS", "5"))
 
-# Ensure OpenAI Key is set
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
+# Warm resources up on a background thread as soon as the module is imported
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "1") == "1"
+# Failed warm-up steps are retried with backoff growing up to this many seconds apart
+WARM_UP_RETRY_MAX_DELAY_SECONDS = float(os.environ.get("WARM_UP_RETRY_MAX_DELAY_SECONDS", "60"))
 
 openai_api_key = OPENAI_API_KEY  # For langchain if needed implicitly
 
@@ -41,39 +212,183 @@ openai_api_key = OPENAI_API_KEY  # For langchain if needed implicitly
 # Initialization & Setup
 # ==========================================
 
+def require_openai_key() -> None:
+    """Ensure OpenAI Key is set before building an OpenAI client."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables.")
+
 def init_mongo_connection() -> Any:
     """Initialize MongoDB connection."""
+    from pymongo import MongoClient
+
     if not MONGO_URL:
         raise ValueError("MONGO_URL not found in environment variables.")
-    client = MongoClient(MONGO_URL)
+    client = MongoClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS
+    )
     db = client["medimate"]
     return db["medicines"]
 
-def init_med_vector_store() -> Chroma:
+def mongo_retry() -> Callable[[Callable[[], Any]], Any]:
+    """Wrapper retrying a Mongo call on transient errors (lost connections, timeouts)."""
+    from pymongo.errors import AutoReconnect
+
+    return partial(
+        call_with_retries,
+        attempts=MONGO_MAX_RETRIES + 1,
+        retryable=(AutoReconnect,),
+        target="mongo",
+        base_delay=RETRY_BASE_DELAY_SECONDS,
+        max_delay=RETRY_MAX_DELAY_SECONDS
+    )
+
+def init_openai_session() -> Any:
+    """Installs the pooled HTTP session every OpenAI client of this worker uses."""
+    import openai
+
+    session = pooled_session(
+        "openai",
+        pool_size=OPENAI_POOL_SIZE,
+        retries=OPENAI_MAX_RETRIES,
+        base_delay=RETRY_BASE_DELAY_SECONDS,
+        max_delay=RETRY_MAX_DELAY_SECONDS
+    )
+    openai.requestssession = session
+    return session
+
+def openai_client_options() -> Dict[str, Any]:
+    """Timeouts and retries shared by the OpenAI clients (retries happen in the pooled session)."""
+    openai_session.get()
+    return {
+        "request_timeout": (OPENAI_CONNECT_TIMEOUT_SECONDS, OPENAI_READ_TIMEOUT_SECONDS),
+        # One attempt: langchain's own retries wait 4-10s without jitter
+        "max_retries": 1,
+    }
+
+def init_embedding_function() -> CachedEmbeddings:
+    """Initialize the OpenAI embedder behind the persistent embedding cache."""
+    from langchain.embeddings.openai import OpenAIEmbeddings
+
+    require_openai_key()
+    return CachedEmbeddings(
+        OpenAIEmbeddings(**openai_client_options()),
+        cache_path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_concurrency=EMBEDDING_CONCURRENCY
+    )
+
+def init_catalog_embedding() -> Embeddings:
+    """Initialize the embedder of the medicine index for CATALOG_EMBEDDING_BACKEND."""
+    if CATALOG_EMBEDDING_BACKEND == "openai":
+        return embedding_function.get()
+
+    from local_embeddings import create_local_embeddings
+
+    return create_local_embeddings(
+        CATALOG_EMBEDDING_BACKEND, dimension=LOCAL_EMBEDDING_DIMENSION, spacy_model=SPACY_MODEL
+    )
+
+def catalog_file_stamp() -> Optional[Tuple[int, int, int]]:
+    """Identity of the current MEDICINES_FILE contents (inode, size, mtime), or None if it is missing."""
+    try:
+        stat = os.stat(MEDICINES_FILE)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def load_medicine_catalog() -> List[Dict]:
+    """Reads the medicine catalog from MEDICINES_FILE."""
+    # Stamped before reading, so an edit made while reading is noticed later
+    catalog_stamp.get()
+    if not os.path.exists(MEDICINES_FILE):
+        print(f"Warning: {MEDICINES_FILE} not found. Medicine recommendation might not work.")
+        return []
+
+    return list(iter_catalog_records(MEDICINES_FILE))
+
+def open_medicine_store() -> VectorStore:
+    """Opens the medicine index of MEDICINE_INDEX_BACKEND (chroma, memory or remote)."""
+    from vector_store import InMemoryVectorStore, RemoteVectorStore, open_chroma_store
+
+    if MEDICINE_INDEX_BACKEND == "memory":
+        return InMemoryVectorStore()
+    if MEDICINE_INDEX_BACKEND == "remote":
+        if not VECTOR_STORE_URL:
+            raise ValueError("VECTOR_STORE_URL not found in environment variables.")
+        session = pooled_session(
+            "vector_store",
+            pool_size=VECTOR_STORE_CONCURRENCY,
+            retries=VECTOR_STORE_MAX_RETRIES,
+            base_delay=RETRY_BASE_DELAY_SECONDS,
+            max_delay=RETRY_MAX_DELAY_SECONDS
+        )
+        return RemoteVectorStore(
+            VECTOR_STORE_URL,
+            api_key=VECTOR_STORE_API_KEY,
+            namespace=VECTOR_STORE_NAMESPACE,
+            session=session,
+            max_concurrency=VECTOR_STORE_CONCURRENCY
+        )
+    if MEDICINE_INDEX_BACKEND != "chroma":
+        raise ValueError(f"Unknown MEDICINE_INDEX_BACKEND {MEDICINE_INDEX_BACKEND!r}.")
+    if SERVER_WORKERS > 1:
+        # Each process keeps its own HNSW index in memory and never sees another's writes
+        raise ValueError(
+            f"MEDICINE_INDEX_BACKEND=chroma serves one worker process, not {SERVER_WORKERS}. "
+            f"Use MEDICINE_INDEX_BACKEND=numpy (or remote) with several workers."
+        )
+
+    # Each embedding backend has its own collection, since their vectors are not
+    # comparable; OpenAI vectors stay in the default collection of earlier releases
+    collection_name = "langchain"
+    if CATALOG_EMBEDDING_BACKEND != "openai":
+        collection_name = f"medicines_{CATALOG_EMBEDDING_BACKEND}"
+    return open_chroma_store(MED_PERSIST_DIRECTORY, collection_name, search_ef=CHROMA_SEARCH_EF)
+
+def init_med_vector_store(embedding: Embeddings, medicines: List[Dict]) -> Union[VectorStore, NumpyVectorIndex]:
     """
     Initialize the vector store for medicines.
-    Reads from medicines.json, creates embeddings, and returns the Chroma vector store.
+    Opens the MEDICINE_INDEX_BACKEND store, checks that it holds vectors of
+    the embedder's dimension and syncs it with the catalog, embedding only
+    records that are new or changed since the last start. With
+    MEDICINE_INDEX_BACKEND=numpy, maps the saved NumPy index instead,
+    rebuilding it when the catalog changed.
     """
-    if not os.path.exists(MEDICINES_FILE):
-        print(f"Warning: {MEDICINES_FILE} not found. Medicine recommendation might not work.")
+    from vector_store import check_dimension
+
+    if not medicines:
         return None
+    if MEDICINE_INDEX_BACKEND == "numpy":
+        return open_numpy_catalog_index(MEDICINE_INDEX_DIRECTORY, embedding, medicines)
 
-    with open(MEDICINES_FILE, "r") as file:
-        medicines = json.load(file)
+    store = open_medicine_store()
+    check_dimension(store, embedding_dimension(embedding))
+    sync_stats = sync_catalog_index(store, embedding, medicines)
+    print(f"Medicine index synced: {sync_stats}")
+    return store
 
-    med_splits = [json.dumps(medicine) for medicine in medicines]
-    
-    embedding = OpenAIEmbeddings()
-    vector_db = Chroma.from_texts(
-        texts=med_splits, 
-        embedding=embedding, 
-        persist_directory=MED_PERSIST_DIRECTORY
+def init_medicine_repository(medicines: List[Dict]) -> MedicineRepository:
+    """Initialize the cached medicine document lookup for the configured source."""
+    if MEDICINE_SOURCE == "catalog":
+        return MedicineRepository(catalog=medicines)
+    return MedicineRepository(
+        collection=init_mongo_connection(),
+        ttl=MEDICINE_CACHE_TTL_SECONDS,
+        max_entries=MEDICINE_CACHE_MAX_ENTRIES,
+        retry=mongo_retry()
     )
-    return vector_db
 
-def init_conversation_chain() -> ConversationChain:
-    """Initialize the general healthcare assistant conversation chain."""
-    memory = ConversationBufferMemory()
+def new_session_memory() -> BoundedConversationMemory:
+    """Starts a token-bounded conversation memory primed with the bot instructions."""
+    from session_memory import BoundedConversationMemory
+
+    memory = BoundedConversationMemory(max_tokens=SESSION_MAX_TOKENS)
     memory.save_context(
         {
             "input": (
@@ -93,88 +408,706 @@ def init_conversation_chain() -> ConversationChain:
             "output": "Welcome to MediMate! How can I assist you with your health today?"
         },
     )
-    chat_llm = ChatOpenAI(temperature=0.9)
-    return ConversationChain(llm=chat_llm, memory=memory, verbose=False)
+    return memory
+
+def init_chat_llm() -> ChatOpenAI:
+    """Initialize the chat model shared by every conversation."""
+    from langchain.chat_models import ChatOpenAI
+
+    require_openai_key()
+    # streaming=True makes token callbacks fire; blocking predict() still returns the full answer
+    return ChatOpenAI(
+        temperature=0.9, streaming=True, callbacks=[TokenUsageHandler("chat")], **openai_client_options()
+    )
+
+def init_extraction_llm() -> ChatOpenAI:
+    """Initialize the deterministic chat model used to read prescriptions."""
+    from langchain.chat_models import ChatOpenAI
+
+    require_openai_key()
+    return ChatOpenAI(
+        model="gpt-3.5-turbo", temperature=0, callbacks=[TokenUsageHandler("extraction")], **openai_client_options()
+    )
+
+def init_extraction_chain() -> BaseCombineDocumentsChain:
+    """Builds the prescription extraction chain once; each call passes its own documents."""
+    from langchain.chains.question_answering import load_qa_chain
+
+    # The "stuff" QA chain RetrievalQA would run over the retrieved documents
+    return load_qa_chain(extraction_llm.get(), chain_type="stuff")
+
+def init_session_store() -> SessionMemoryStore:
+    """Initialize the per-session conversation memory store."""
+    from session_memory import SessionMemoryStore
+
+    return SessionMemoryStore(
+        new_session_memory,
+        max_sessions=SESSION_MAX_COUNT,
+        idle_timeout=SESSION_IDLE_TIMEOUT_SECONDS
+    )
+
+def init_answer_cache() -> SemanticAnswerCache:
+    """
+    Initialize the first-turn answer cache: exact normalized-text matches, plus
+    similar questions by the ANSWER_CACHE_EMBEDDING embedder when ANSWER_CACHE_SEMANTIC is on.
+    """
+    from answer_cache import SemanticAnswerCache
+
+    if not ANSWER_CACHE_SEMANTIC:
+        return SemanticAnswerCache(ttl=ANSWER_CACHE_TTL_SECONDS, max_entries=ANSWER_CACHE_MAX_ENTRIES)
+
+    if ANSWER_CACHE_EMBEDDING == "openai":
+        embedding = embedding_function.get()
+    else:
+        from local_embeddings import create_local_embeddings
+
+        embedding = create_local_embeddings(
+            ANSWER_CACHE_EMBEDDING, dimension=LOCAL_EMBEDDING_DIMENSION, spacy_model=SPACY_MODEL
+        )
+    return SemanticAnswerCache(
+        embedding,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        ttl=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        medicine_names=lambda text: [match["name"] for match in medicine_scanner.get().scan(text)]
+    )
+
+def init_admission() -> AdmissionController:
+    """
+    Initialize this worker's share of the server's token budgets. A client's
+    requests spread over the workers like everyone else's, so its budget is split too.
+    """
+    return AdmissionController(
+        global_tokens_per_minute=ADMISSION_GLOBAL_TOKENS_PER_MINUTE / SERVER_WORKERS,
+        client_tokens_per_minute=ADMISSION_CLIENT_TOKENS_PER_MINUTE / SERVER_WORKERS,
+        max_wait=ADMISSION_MAX_WAIT_SECONDS,
+        max_clients=ADMISSION_MAX_CLIENTS
+    )
+
+def init_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    """Initialize the page extraction processes, or None to extract in the request thread."""
+    if PDF_EXTRACT_PROCESSES < 2:
+        return None
+    # Spawned, not forked: forking a threaded worker can copy locks held by other threads
+    pool = ProcessPoolExecutor(
+        max_workers=PDF_EXTRACT_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+    )
+    # Start the processes now rather than in the first long PDF's request
+    list(pool.map(int, range(PDF_EXTRACT_PROCESSES)))
+    return pool
+
+def init_job_queue() -> JobQueue:
+    """Initialize the bounded worker pool for prescription jobs."""
+    return JobQueue(workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL_SECONDS)
 
 # Global Instances
-medicines_collection = init_mongo_connection()
-med_vectordb = init_med_vector_store()
-conversation_chain = init_conversation_chain()
-embedding_function = OpenAIEmbeddings()
+# External clients and indexes are built on first use, once per worker process
+# The MEDICINES_FILE contents the catalog resources below were built from
+catalog_stamp = LazyResource("catalog_stamp", catalog_file_stamp)
+medicine_catalog = LazyResource("medicine_catalog", load_medicine_catalog)
+medicine_repository = LazyResource(
+    "medicine_repository", lambda: init_medicine_repository(medicine_catalog.get())
+)
+medicine_scanner = LazyResource(
+    "medicine_scanner", lambda: MedicineScanner.from_catalog(medicine_catalog.get())
+)
+# Part of every result cache key (see current_catalog_version)
+catalog_version = LazyResource(
+    "catalog_version", lambda: catalog_fingerprint(medicine_catalog.get())
+)
+openai_session = LazyResource("openai_session", init_openai_session)
+embedding_function = LazyResource("embedding_function", init_embedding_function)
+catalog_embedding = LazyResource("catalog_embedding", init_catalog_embedding)
+med_vectordb = LazyResource(
+    "med_vectordb", lambda: init_med_vector_store(catalog_embedding.get(), medicine_catalog.get())
+)
+chat_llm = LazyResource("chat_llm", init_chat_llm)
+extraction_llm = LazyResource("extraction_llm", init_extraction_llm)
+extraction_chain = LazyResource("extraction_chain", init_extraction_chain)
+session_store = LazyResource("session_store", init_session_store)
+answer_cache = LazyResource("answer_cache", init_answer_cache)
+prescription_jobs = LazyResource("prescription_jobs", init_job_queue)
+admission = LazyResource("admission", init_admission)
+pdf_pool = LazyResource("pdf_pool", init_pdf_pool)
+
+# In-process state (thread-safe)
+# Chroma's in-memory client shares one SQLite database per process, which fails
+# concurrent access with "database table is locked", so prescription collections
+# are created, queried and dropped one operation at a time
+pres_store_lock = threading.Lock()
+catalog_reload_lock = threading.Lock()
+result_cache = TTLCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL_SECONDS)
+
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "medimate_chat_time_to_first_token_seconds",
+    "Time from a streaming chat request to its first LLM token."
+)
+REQUESTS = REGISTRY.counter("medimate_requests_total", "Requests by branch and status code.", ["branch", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("medimate_request_seconds", "Request handling time by branch.", ["branch"])
+REQUEST_ERRORS = REGISTRY.counter("medimate_request_errors_total", "Failed requests by branch.", ["branch"])
+PRESCRIPTION_EXTRACTIONS = REGISTRY.counter(
+    "medimate_prescription_extractions_total", "Prescriptions analysed by extraction source (scanner or llm).", ["source"]
+)
+if METRICS_SHARED_DIRECTORY:
+    REGISTRY.share(METRICS_SHARED_DIRECTORY, interval=METRICS_SHARE_INTERVAL_SECONDS)
+
+class UploadRequest(Request):
+    """Request that buffers file uploads in memory instead of werkzeug's 500KB temp-file spill."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None) -> IO[bytes]:
+        return tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MEMORY_BYTES, mode="rb+")
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        # Batch uploads carry many PDFs, so they get their own body limit
+        if self.path == "/chat/batch":
+            return BATCH_MAX_BYTES + 64 * 1024
+        return super().max_content_length
 
 app = Flask(__name__)
-CORS(app)
+app.request_class = UploadRequest
+# Reject oversized bodies while they are being read, before they are buffered
+app.config["MAX_CONTENT_LENGTH"] = PDF_MAX_BYTES + 64 * 1024
+# Browser clients on another origin read the session id of streamed answers from this header
+CORS(app, expose_headers=["X-Session-Id"])
+
+# Everything a request may need, in dependency order, plus the modules that are
+# only imported inside request handlers
+warm_up = WarmUp(
+    resources=[
+        catalog_stamp, medicine_catalog, medicine_scanner, catalog_version, medicine_repository,
+        openai_session, embedding_function, catalog_embedding, med_vectordb, chat_llm, extraction_llm,
+        extraction_chain, session_store,
+        prescription_jobs, answer_cache, admission, pdf_pool,
+    ],
+    modules=["langchain.chains", "chunker", "streaming"],
+    retry_base_delay=RETRY_BASE_DELAY_SECONDS,
+    retry_max_delay=WARM_UP_RETRY_MAX_DELAY_SECONDS,
+)
 
 # ==========================================
 # Helper Functions
 # ==========================================
 
-def process_pdf_and_create_vector_store(pdf_path: str) -> Chroma:
+def reload_catalog() -> None:
+    """Drops everything built from the medicine catalog; each piece is rebuilt on next use."""
+    for resource in (catalog_stamp, medicine_catalog, medicine_scanner, catalog_version, med_vectordb):
+        resource.reset()
+    if MEDICINE_SOURCE == "catalog":
+        medicine_repository.reset()
+    elif medicine_repository.initialized:
+        medicine_repository.get().invalidate()
+
+def current_catalog_version() -> str:
+    """
+    Fingerprint of the catalog this worker serves, part of every result cache key.
+    MEDICINES_FILE is checked (one stat) on every call. Once catalog_ingest or an
+    edit has changed it, the catalog resources are reloaded and the cached
+    medicine documents dropped, so results from the old catalog stop being served.
+    """
+    stamp = catalog_file_stamp()
+    if stamp != catalog_stamp.get():
+        with catalog_reload_lock:
+            if stamp != catalog_stamp.get():
+                print(f"Medicine catalog {MEDICINES_FILE} changed; reloading it")
+                reload_catalog()
+    return catalog_version.get()
+
+def get_session_id(json_data: Dict[str, Any]) -> str:
+    """Session id from the request body or X-Session-Id header; a new one if neither is set."""
+    return json_data.get('session_id') or request.headers.get('X-Session-Id') or uuid.uuid4().hex
+
+def get_client_id() -> str:
+    """
+    Client the admission budgets are charged to: the trusted ADMISSION_CLIENT_HEADER
+    when configured and present, else the remote address.
+    """
+    if ADMISSION_CLIENT_HEADER and request.headers.get(ADMISSION_CLIENT_HEADER):
+        return request.headers[ADMISSION_CLIENT_HEADER]
+    return request.remote_addr or "unknown"
+
+def admit_request(branch: str, tokens: int, client: Optional[str] = None) -> None:
     """
-    Loads a PDF, splits it into chunks, and creates a temporary vector store.
+    Charges estimated OpenAI tokens to `client` (by default, this request's
+    client); raises AdmissionRejected to shed the request.
     """
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load()
+    if ADMISSION_ENABLED:
+        with span("admission"):
+            admission.get().admit(client or get_client_id(), tokens, branch)
+
+def estimate_chat_tokens(memory: BoundedConversationMemory, question: str) -> int:
+    """Prompt (history and question) plus completion tokens of one chat answer."""
+    return memory.token_count() + count_tokens(question) + ADMISSION_COMPLETION_TOKENS
+
+def estimate_prescription_tokens(chunks: List[Document], scanned_meds_text: Optional[str]) -> int:
+    """
+    OpenAI tokens of analysing a read prescription: embedding its chunks and
+    the LLM extraction unless the scanner found the names, plus the catalog
+    queries when the catalog is embedded with OpenAI.
+    """
+    tokens = 0
+    if scanned_meds_text is None:
+        tokens += sum(count_tokens(chunk.page_content) for chunk in chunks) + ADMISSION_EXTRACTION_TOKENS
+    elif CATALOG_EMBEDDING_BACKEND == "openai":
+        tokens += count_tokens(scanned_meds_text)
+    return tokens
+
+def build_conversation_chain(memory: BoundedConversationMemory) -> ConversationChain:
+    """Builds the general healthcare assistant chain around one session's memory."""
+    from langchain.chains import ConversationChain
+
+    return ConversationChain(llm=chat_llm.get(), memory=memory, verbose=False)
 
-    # Split by character first (paragraphs)
-    char_splitter = CharacterTextSplitter(
-        separator="\n", chunk_size=1000, chunk_overlap=50, length_function=len
+def parse_pdf_pages(pdf_stream: IO[bytes], source: str) -> Iterator[Document]:
+    """Pages of an uploaded PDF in page order, as they are extracted; long PDFs are extracted in the pdf_pool processes."""
+    return iter_pdf_pages(
+        pdf_stream, source, max_pages=PDF_MAX_PAGES, pool=pdf_pool.get(),
+        tasks=PDF_EXTRACT_PROCESSES, min_parallel_pages=PDF_PARALLEL_MIN_PAGES
     )
-    docs = char_splitter.split_documents(pages)
 
-    # Further split for embeddings
-    recursive_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=20)
-    pres_splits = recursive_splitter.split_documents(docs)
+def read_prescription(pdf_stream: IO[bytes], source: str) -> Tuple[List[Document], Optional[str]]:
+    """
+    Reads an uploaded prescription in one streaming pass: every page, as it is
+    extracted, is scanned for catalog medicine names and split into chunks, and
+    only the chunks are kept. Returns the chunks and the prescribed names (those
+    with a strength) the scanner found, or None for the names when it found none,
+    a matched name has no strength or its confidence is below SCANNER_MIN_CONFIDENCE.
+    """
+    scan = DocumentScan(medicine_scanner.get())
+    # Parsing, scanning and chunking take turns page by page; each is timed as its own stage
+    clock = StageClock()
+
+    def scanned(pages: Iterator[Document]) -> Iterator[Document]:
+        while True:
+            with clock.time("pdf_parse"):
+                page = next(pages, None)
+            if page is None:
+                return
+            with clock.time("scan"):
+                scan.add(page.page_content)
+            yield page
 
-    pres_vectordb = Chroma.from_documents(
-        documents=pres_splits, 
-        embedding=embedding_function, 
-        persist_directory=PRES_PERSIST_DIRECTORY
+    started = time.perf_counter()
+    try:
+        chunks = list(split_prescription_pages(scanned(parse_pdf_pages(pdf_stream, source))))
+        # The rest of the pass is the chunker's own work
+        clock.add("split", time.perf_counter() - started - sum(clock.seconds.values()))
+    finally:
+        clock.record()
+    if not scan.names or scan.confidence() < SCANNER_MIN_CONFIDENCE:
+        return chunks, None
+    return chunks, ", ".join(scan.names)
+
+def split_prescription_pages(pages: Iterable[Document]) -> Iterator[Document]:
+    """
+    Splits prescription pages into embedding-sized chunks in one streaming pass,
+    skipping chunks that repeat earlier ones when CHUNK_DEDUPLICATION is on.
+    """
+    from chunker import ChunkDeduplicator, PrescriptionChunker
+
+    # Same chunks as a CharacterTextSplitter ("\n", 1000/50) followed by a
+    # RecursiveCharacterTextSplitter (500/20)
+    chunker = PrescriptionChunker(
+        chunk_size=1000, chunk_overlap=50, separator="\n", sub_chunk_size=500, sub_chunk_overlap=20
     )
+    deduplicator = ChunkDeduplicator(CHUNK_NEAR_DUPLICATE_BITS) if CHUNK_DEDUPLICATION else None
+    return chunker.split_documents(pages, deduplicator)
+
+def process_pdf_and_create_vector_store(pres_splits: List[Document]) -> Chroma:
+    """
+    Creates a temporary vector store of prescription chunks.
+    The store is an in-memory collection private to this request; release it
+    with `release_vector_store` once the request is done.
+    """
+    from langchain.vectorstores import Chroma
+
+    # Embed outside the lock; the cache then serves the vectors for the insert
+    embedding = embedding_function.get()
+    with span("embed"):
+        embedding.embed_documents([split.page_content for split in pres_splits])
+    with pres_store_lock, span("vector_store_build"):
+        pres_vectordb = Chroma.from_documents(
+            documents=pres_splits,
+            embedding=embedding,
+            collection_name=f"pres_{uuid.uuid4().hex}"
+        )
     return pres_vectordb
 
+def release_vector_store(pres_vectordb: Optional[Chroma]) -> None:
+    """Drops a per-request prescription collection and frees its memory."""
+    if pres_vectordb is not None:
+        with pres_store_lock:
+            pres_vectordb.delete_collection()
+
 def extract_medicines_from_prescription(pres_vectordb: Chroma) -> str:
     """
     Queries the prescription vector store to extract medicine names.
+    Retrieval runs under `pres_store_lock`; the LLM call does not.
     """
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=ChatOpenAI(model="gpt-3.5-turbo", temperature=0),
-        retriever=pres_vectordb.as_retriever()
-    )
-    response = qa_chain({"query": "meds name only"})
-    return response["result"]
+    with pres_store_lock, span("retrieval"):
+        docs = pres_vectordb.similarity_search("meds name only")
+    with span("llm_extraction"):
+        return extraction_chain.get().run(input_documents=docs, question="meds name only")
 
 def find_medicine_recommendations(medicine_names_text: str) -> List[Dict]:
     """
-    Searches for medicines in the medicine vector store and retrieves details from MongoDB.
+    Searches for medicines in the medicine vector store and retrieves their details.
+    Each medicine named in `medicine_names_text` is matched on its own: the
+    names are embedded in one batch and searched in one multi-query call.
+    Results take every name's best match first, then every second best, and
+    so on, without repeats.
     """
-    if not med_vectordb:
+    vector_db = med_vectordb.get()
+    names = split_medicine_names(medicine_names_text)
+    if not vector_db or not names:
         return []
 
     # Similarity search to find relevant medicines
-    sim_search = med_vectordb.similarity_search(medicine_names_text, k=5)
-    sim_search_json = [json.loads(item.page_content) for item in sim_search]
+    with span("catalog_search"):
+        queries = catalog_embedding.get().embed_documents(names)
+        matches = [
+            [medicine_id for medicine_id, _ in ranked]
+            for ranked in vector_db.query(queries, k=MEDICINE_MATCHES_PER_NAME)
+        ]
+        ranked_ids = list(dict.fromkeys(
+            medicine_id for rank in zip_longest(*matches) for medicine_id in rank if medicine_id is not None
+        ))
+
+    # Fetch full details in one batched lookup
+    with span("medicine_lookup"):
+        return medicine_repository.get().get_many(ranked_ids)
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def analyze_prescription(pdf_stream: IO[bytes], source: str,
+                         admit: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Runs the prescription pipeline for one PDF: extracts medicine names with the
+    local scanner (falling back to the LLM chain) and looks up recommendations.
+    `admit`, if given, is called with the estimated OpenAI tokens once the
+    PDF is read, before any are spent.
+    """
+    chunks, scanned_meds_text = read_prescription(pdf_stream, source)
+    if admit is not None:
+        admit(estimate_prescription_tokens(chunks, scanned_meds_text))
+    return analyze_prescription_chunks(chunks, scanned_meds_text)
+
+def analyze_prescription_chunks(chunks: List[Document], scanned_meds_text: Optional[str]) -> Dict[str, Any]:
+    """
+    Prescription pipeline after `read_prescription`. When the scanner found no
+    names (`scanned_meds_text` is None), the LLM chain extracts them from `chunks`.
+    """
+    pres_vectordb = None
+
+    try:
+        # Extract Medicines
+        extracted_meds_text = scanned_meds_text
+        extraction_source = "scanner"
+        if extracted_meds_text is None:
+            pres_vectordb = process_pdf_and_create_vector_store(chunks)
+            extracted_meds_text = extract_medicines_from_prescription(pres_vectordb)
+            extraction_source = "llm"
+        PRESCRIPTION_EXTRACTIONS.inc(source=extraction_source)
 
-    # Collect unique IDs
-    unique_ids = list({item['_id'] for item in sim_search_json})
+        # Find Recommendations
+        recommendations = find_medicine_recommendations(extracted_meds_text)
+    finally:
+        release_vector_store(pres_vectordb)
 
-    # Fetch full details from MongoDB
-    recommendations = []
-    for med_id in unique_ids:
-        medicine = medicines_collection.find_one({"_id": med_id})
-        if medicine:
-            recommendations.append(medicine)
-    
-    return recommendations
+    return {
+        "recommendation": recommendations,
+        "extracted_text": extracted_meds_text,
+        "extraction_source": extraction_source,
+    }
+
+def analyze_prescription_cached(pdf_stream: IO[bytes], source: str, pdf_hash: str,
+                                admit: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Returns the cached analysis for this PDF content, running the pipeline on a miss."""
+    cache_key = (pdf_hash, current_catalog_version())
+    analysis = result_cache.get(cache_key)
+
+    if analysis is None:
+        analysis = analyze_prescription(pdf_stream, source, admit)
+        result_cache.set(cache_key, analysis)
+    return analysis
+
+def analyze_prescription_batch(uploads: List[Tuple[str, IO[bytes], str]],
+                               admit: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Runs the prescription pipeline for several PDFs, given as (filename, stream, hash).
+    Files are read and analysed BATCH_CONCURRENCY at a time. The chunks of every
+    file the scanner could not read are embedded together first, so the
+    per-file vector stores are then built from the embedding cache.
+    `admit`, if given, is called once with the estimated OpenAI tokens of all
+    files once they are read, before any are spent.
+    Returns one entry per upload, in upload order, with its analysis or its error.
+    """
+    version = current_catalog_version()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(uploads)
+
+    def failed(index: int, error: Exception) -> Dict[str, Any]:
+        message = str(error) if isinstance(error, PdfLimitExceeded) else f"Error processing PDF: {error}"
+        return {"filename": uploads[index][0], "error": message}
+
+    def read(index: int) -> Tuple[List[Document], Optional[str]]:
+        filename, pdf_stream, _ = uploads[index]
+        return read_prescription(pdf_stream, filename)
+
+    pending = []
+    for index, (filename, _, pdf_hash) in enumerate(uploads):
+        analysis = result_cache.get((pdf_hash, version))
+        if analysis is not None:
+            results[index] = {"filename": filename, **analysis}
+        else:
+            pending.append(index)
+
+    def submit(pool: ThreadPoolExecutor, function: Any, *args: Any) -> Any:
+        # Workers record their spans into this request's trace
+        return pool.submit(contextvars.copy_context().run, function, *args)
+
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        scanned = {}
+        for index, future in [(index, submit(pool, read, index)) for index in pending]:
+            try:
+                scanned[index] = future.result()
+            except Exception as e:
+                results[index] = failed(index, e)
+
+        if admit is not None and scanned:
+            admit(sum(estimate_prescription_tokens(chunks, scanned_meds_text)
+                      for chunks, scanned_meds_text in scanned.values()))
+
+        # One batched embedding request for all chunks headed to the LLM chain
+        chunk_texts = [
+            chunk.page_content
+            for chunks, scanned_meds_text in scanned.values() if scanned_meds_text is None
+            for chunk in chunks
+        ]
+        if chunk_texts:
+            try:
+                with span("embed"):
+                    embedding_function.get().embed_documents(chunk_texts)
+            except Exception as e:
+                # Each file retries its own chunks and reports its own error
+                print(f"Warning: batched prescription embedding failed: {e}")
+
+        futures = [
+            (index, submit(pool, analyze_prescription_chunks, chunks, scanned_meds_text))
+            for index, (chunks, scanned_meds_text) in scanned.items()
+        ]
+        for index, future in futures:
+            filename, _, pdf_hash = uploads[index]
+            try:
+                analysis = future.result()
+            except Exception as e:
+                results[index] = failed(index, e)
+                continue
+            result_cache.set((pdf_hash, version), analysis)
+            results[index] = {"filename": filename, **analysis}
+
+    return results
 
 # ==========================================
 # Routes
 # ==========================================
 
+@app.before_request
+def begin_trace():
+    start_trace(request.headers.get('X-Trace-Id'))
+
+@app.after_request
+def finish_trace(response: Response) -> Response:
+    """Records request metrics and returns the trace id and stage timings in headers."""
+    trace = current_trace()
+    branch = g.get('branch') or request.endpoint or "unmatched"
+    REQUESTS.inc(branch=branch, status=response.status_code)
+    if response.status_code >= 500:
+        REQUEST_ERRORS.inc(branch=branch)
+    if trace is not None:
+        REQUEST_SECONDS.observe(trace.elapsed(), branch=branch)
+        response.headers["X-Trace-Id"] = trace.trace_id
+        if trace.spans:
+            response.headers["Server-Timing"] = trace.server_timing()
+        if trace.elapsed() >= TRACE_LOG_SLOW_SECONDS:
+            print(f"Slow request {request.method} {request.path}: {trace.summary()}")
+    return response
+
+@app.teardown_request
+def clear_trace(error: Optional[BaseException]) -> None:
+    end_trace()
+
 @app.route('/', methods=['GET'])
 def welcome():
     return "MediMate Backend is Running", 200
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once this worker has warmed every resource, 503 until then."""
+    status = warm_up.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({"error": "Upload is larger than the configured limit."}), 413
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error: AdmissionRejected):
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Hit, miss and eviction counters of the in-process caches."""
+    return jsonify({
+        "embedding_cache": embedding_function.get().stats(),
+        "medicine_cache": medicine_repository.get().cache.stats(),
+        "result_cache": result_cache.stats(),
+        "sessions": session_store.get().stats(),
+        "answer_cache": answer_cache.get().stats(),
+        "jobs": prescription_jobs.get().stats(),
+        "admission": admission.get().stats(),
+        "metrics": REGISTRY.snapshot(),
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Every registered metric in the Prometheus text format."""
+    return Response(REGISTRY.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of the general chat branch of /chat.
+    Answers as server-sent events: a `token` event per LLM token, then `done`
+    with the full message (or `error`).
+    """
+    from streaming import DONE, stream_prediction
+
+    g.branch = "stream"
+    json_data = request.get_json(silent=True) or {}
+    question = json_data.get('question', '')
+
+    if not question:
+        return jsonify({"message": "Question is required"}), 400
+
+    session_id = get_session_id(json_data)
+    # Admitted before the stream starts, so a shed request still gets its 429
+    admit_request("stream", estimate_chat_tokens(session_store.get().get(session_id), question))
+
+    def generate() -> Iterator[str]:
+        started = time.perf_counter()
+        first_token = True
+        with session_store.get().session(session_id) as memory, span("chat_llm"):
+            conversation_chain = build_conversation_chain(memory)
+            for kind, value in stream_prediction(conversation_chain, {"input": question}):
+                if kind == "token":
+                    if first_token:
+                        TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started)
+                        first_token = False
+                    yield format_sse("token", {"token": value})
+                elif kind == DONE:
+                    yield format_sse("done", {"message": value, "session_id": session_id})
+                else:
+                    REQUEST_ERRORS.inc(branch="stream")
+                    yield format_sse("error", {"error": f"Error processing request: {value}"})
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id}
+    )
+
+@app.route('/jobs/prescriptions', methods=['POST'])
+def submit_prescription_job():
+    """
+    Queues a prescription PDF for background analysis.
+    Returns 202 with a job id to poll at /jobs/<job_id>, or 429 with
+    Retry-After when the queue is full.
+    """
+    pdf_file = request.files.get('pdf_file')
+
+    if pdf_file is None or not pdf_file.filename.endswith('.pdf'):
+        return jsonify({'error': 'Invalid file format. Please upload a PDF.'}), 415
+
+    try:
+        with span("pdf_hash"):
+            pdf_hash = hash_upload(pdf_file.stream, max_bytes=PDF_MAX_BYTES)
+    except PdfLimitExceeded as e:
+        return jsonify({"error": str(e)}), 413
+
+    # The upload buffer is closed with the request, so the job keeps its own copy
+    pdf_stream = io.BytesIO(pdf_file.stream.read())
+    filename = pdf_file.filename
+    # Charged when the job runs; a shed job fails with the time to retry
+    admit = partial(admit_request, "job", client=get_client_id())
+
+    try:
+        job_id = prescription_jobs.get().submit(
+            lambda: analyze_prescription_cached(pdf_stream, filename, pdf_hash, admit)
+        )
+    except QueueFull as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Status of a prescription job; includes `result` once done or `error` if it failed."""
+    job = prescription_jobs.get().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id."}), 404
+    return jsonify(job), 200
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Analyses several prescriptions in one request (form-data, repeated `pdf_files`).
+    Returns a `results` list in upload order; each entry holds the file's
+    `recommendation` or its `error`, so one bad file does not fail the batch.
+    """
+    g.branch = "batch"
+    pdf_files = request.files.getlist('pdf_files')
+
+    if not pdf_files:
+        return jsonify({'error': 'Send form-data with one or more "pdf_files".'}), 415
+    if len(pdf_files) > BATCH_MAX_FILES:
+        return jsonify({'error': f'At most {BATCH_MAX_FILES} files per batch.'}), 413
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(pdf_files)
+    uploads, positions = [], []
+    for position, pdf_file in enumerate(pdf_files):
+        if not pdf_file.filename.endswith('.pdf'):
+            results[position] = {"filename": pdf_file.filename, "error": "Invalid file format. Please upload a PDF."}
+            continue
+        try:
+            with span("pdf_hash"):
+                pdf_hash = hash_upload(pdf_file.stream, max_bytes=PDF_MAX_BYTES)
+        except PdfLimitExceeded as e:
+            results[position] = {"filename": pdf_file.filename, "error": str(e)}
+            continue
+        uploads.append((pdf_file.filename, pdf_file.stream, pdf_hash))
+        positions.append(position)
+
+    try:
+        for position, result in zip(positions, analyze_prescription_batch(uploads, partial(admit_request, "batch"))):
+            results[position] = result
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Error processing PDFs: {str(e)}"}), 500
+
+    return jsonify({
+        "message": "Based on the prescriptions, here are the recommended medicines:",
+        "results": results
+    }), 200
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
@@ -182,57 +1115,70 @@ def chat():
     """
     # 1. Handle JSON Question (General Chat)
     if request.is_json:
+        g.branch = "question"
         json_data = request.get_json()
         question = json_data.get('question', '')
         
         if not question:
             return jsonify({"message": "Question is required"}), 400
         
+        session_id = get_session_id(json_data)
         try:
-            response_message = conversation_chain.predict(input=question)
-            return jsonify({"message": response_message}), 200
+            with session_store.get().session(session_id) as memory:
+                # Only opening questions are cached; later answers depend on the conversation
+                cacheable = ANSWER_CACHE_ENABLED and memory.is_new()
+                response_message = None
+                if cacheable:
+                    with span("answer_cache"):
+                        response_message = answer_cache.get().get(question)
+                if response_message is not None:
+                    memory.save_context({"input": question}, {"output": response_message})
+                else:
+                    admit_request("question", estimate_chat_tokens(memory, question))
+                    with span("chat_llm"):
+                        response_message = build_conversation_chain(memory).predict(input=question)
+                    if cacheable:
+                        answer_cache.get().set(question, response_message)
+            return jsonify({"message": response_message, "session_id": session_id}), 200, {"X-Session-Id": session_id}
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return jsonify({"error": f"Error processing request: {str(e)}"}), 500
 
     # 2. Handle PDF Upload (Prescription Analysis)
     elif 'pdf_file' in request.files:
+        g.branch = "pdf"
         pdf_file = request.files['pdf_file']
 
         if not pdf_file.filename.endswith('.pdf'):
             return jsonify({'error': 'Invalid file format. Please upload a PDF.'}, 415)
         
         try:
-            # Save temporarily
-            temp_filename = f"temp_{pdf_file.filename}"
-            pdf_file.save(temp_filename)
+            with span("pdf_hash"):
+                pdf_hash = hash_upload(pdf_file.stream, max_bytes=PDF_MAX_BYTES)
+            analysis = analyze_prescription_cached(
+                pdf_file.stream, pdf_file.filename, pdf_hash, admit=partial(admit_request, "pdf")
+            )
 
-            try:
-                # Process PDF
-                pres_vectordb = process_pdf_and_create_vector_store(temp_filename)
-                
-                # Extract Medicines
-                extracted_meds_text = extract_medicines_from_prescription(pres_vectordb)
-                
-                # Find Recommendations
-                recommendations = find_medicine_recommendations(extracted_meds_text)
-                
-                return jsonify({
-                    "message": "Based on the prescription, here are the recommended medicines:", 
-                    "recommendation": recommendations,
-                    "extracted_text": extracted_meds_text # Optional: return what was found
-                }), 200
-
-            finally:
-                # Cleanup
-                if os.path.exists(temp_filename):
-                    os.remove(temp_filename)
-                # Note: You might want to cleanup the chroma persistence directory too if it's temporary per request
+            return jsonify({
+                "message": "Based on the prescription, here are the recommended medicines:",
+                **analysis
+            }), 200
 
+        except PdfLimitExceeded as e:
+            return jsonify({"error": str(e)}), 413
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
 
     else:
         return jsonify({'error': 'Unsupported request format. Send JSON with "question" or form-data with "pdf_file".'}, 415)
 
+print(f"Startup: app importable in {time.perf_counter() - _import_started:.2f}s")
+# Not in pdf_pool processes, which import this module as their __main__ under `python app2.py`
+if WARM_UP_ON_START and multiprocessing.parent_process() is None:
+    warm_up.start()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
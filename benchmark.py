@@ -0,0 +1,382 @@
+"""
+Offline benchmark of the /chat JSON and PDF paths.
+
+Drives app2 through the Flask test client with the deterministic fakes from
+fakes.py (no OpenAI or Mongo needed), over a synthetic catalog of the given
+size, and prints one JSON document with per-stage latency percentiles,
+throughput, peak Python memory and the number of calls each fake received.
+
+    python benchmark.py --catalog-size 10000 --requests 50 --concurrency 4
+    python benchmark.py --stages question --replay requests.jsonl --output run.json
+    python benchmark.py --stages extraction_new_clients extraction_pooled --connect-latency 0.05
+
+Replayed logs are JSON lines; each line is sent as a question (its `question`,
+`body` or `title` field) or, if it has a `pdf` field, as an upload of that file.
+
+The client stages (not run by default) measure the cost of OpenAI clients per
+request. They call a local OpenAI stand-in (fakes.OpenAIStandIn) through the
+real openai and langchain clients, each request on a new thread as under the
+threaded server: `*_new_clients` builds clients and chains per request on
+openai's per-thread sessions, `*_pooled` uses app2's pooled session and an
+extraction chain built once. `--connect-latency` stands in for the TCP and TLS
+handshakes of each new connection; their external calls count the
+connections the stand-in accepted and the retries that absorbed `--error-rate`
+503s.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+PDF_PATH = "prescription.pdf"
+STAGES = ["question", "question_cached", "stream", "pdf_scanner", "pdf_llm", "pdf_cached", "batch"]
+CLIENT_STAGES = ["extraction_new_clients", "extraction_pooled", "embedding_new_clients", "embedding_pooled"]
+
+SYLLABLES = ["am", "bro", "cef", "dox", "ela", "fen", "glu", "hy", "ix", "lo", "mep",
+             "nor", "ox", "pra", "quin", "ri", "sal", "tri", "ul", "vo", "xa", "zol"]
+DETAILS = [
+    "Pain reliever and fever reducer", "Antibiotic for bacterial infections",
+    "Antihistamine for allergies", "Proton pump inhibitor for heartburn",
+    "Beta blocker for high blood pressure", "Statin for lowering cholesterol",
+    "Bronchodilator for asthma", "Antidiabetic for type 2 diabetes",
+]
+
+
+def synthetic_catalog(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    The bundled catalog padded with generated medicines up to `size` records,
+    so the bundled prescription still matches real catalog names.
+    """
+    with open("medicines.json") as file:
+        catalog = json.load(file)[:size]
+    rng = random.Random(seed)
+    names = {medicine["name"].lower() for medicine in catalog}
+    while len(catalog) < size:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{name} {rng.choice([5, 10, 20, 40, 250, 500])}"
+        if name.lower() in names:
+            continue
+        names.add(name.lower())
+        catalog.append({"_id": f"syn-{len(catalog)}", "name": name, "details": rng.choice(DETAILS)})
+    return catalog
+
+
+def percentile(sorted_values: List[float], share: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(share * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Bench:
+    """The app with fake backends installed, plus counters read off the fakes."""
+
+    def __init__(self, app_module: Any, options: argparse.Namespace, openai_stand_in: Any = None):
+        self.app = app_module
+        self.options = options
+        self.openai_stand_in = openai_stand_in
+        self.client = app_module.app.test_client()
+        with open(PDF_PATH, "rb") as file:
+            self.pdf_bytes = file.read()
+        self._uploads = 0
+        self._lock = threading.Lock()
+
+    def external_calls(self) -> Dict[str, int]:
+        calls = {
+            "embedding_requests": self.app.embedding_function.get().embeddings.calls,
+            "chat_llm_calls": self.app.chat_llm.get().calls,
+            "extraction_llm_calls": self.app.extraction_llm.get().calls,
+            "mongo_round_trips": self.app.medicine_repository.get().collection.round_trips,
+        }
+        if self.openai_stand_in is not None:
+            from metrics import REGISTRY
+
+            calls["openai_connections"] = self.openai_stand_in.connections
+            calls["openai_http_requests"] = self.openai_stand_in.requests
+            calls["openai_retries"] = REGISTRY.snapshot().get("medimate_external_retries_total", {}).get("openai", 0)
+        return calls
+
+    def unique_pdf(self) -> io.BytesIO:
+        # Trailing bytes change the upload hash without changing the text
+        with self._lock:
+            self._uploads += 1
+            padding = b" " * self._uploads
+        return io.BytesIO(self.pdf_bytes + padding)
+
+    def ask(self, question: str, session_id: str) -> int:
+        return self.client.post("/chat", json={"question": question, "session_id": session_id}).status_code
+
+    def stream(self, question: str, session_id: str) -> int:
+        response = self.client.post("/chat/stream", json={"question": question, "session_id": session_id})
+        body = response.get_data(as_text=True)
+        return response.status_code if "event: done" in body else 500
+
+    def upload(self, pdf_stream: io.BytesIO, filename: str = PDF_PATH) -> int:
+        return self.client.post("/chat", data={"pdf_file": (pdf_stream, filename)}).status_code
+
+    def upload_batch(self, files: int) -> int:
+        data = {"pdf_files": [(self.unique_pdf(), f"prescription-{number}.pdf") for number in range(files)]}
+        response = self.client.post("/chat/batch", data=data)
+        failed = any("error" in result for result in response.get_json().get("results", []))
+        return 500 if failed else response.status_code
+
+    def run(self, name: str, requests: List[Callable[[int], int]], thread_per_request: bool = False) -> Dict[str, Any]:
+        """
+        Sends `requests` over `--concurrency` threads and summarizes them.
+        With `thread_per_request`, each request is sent from a new thread.
+        """
+        # Untimed first requests pay one-off costs (lazy imports, first chain build)
+        for number in range(self.options.warmup):
+            requests[0](-1 - number)
+
+        latencies: List[float] = []
+        errors = 0
+        calls_before = self.external_calls()
+        pending = list(enumerate(requests))
+        lock = threading.Lock()
+
+        def worker() -> None:
+            nonlocal errors
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    number, send = pending.pop(0)
+                started = time.perf_counter()
+                status = on_new_thread(send, number) if thread_per_request else send(number)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += status != 200
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(self.options.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        calls_after = self.external_calls()
+
+        # Memory is measured on a separate short run; tracing slows every allocation
+        tracemalloc.start()
+        for number, send in list(enumerate(requests))[:self.options.memory_requests]:
+            send(number)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "mean_ms": ms(sum(latencies) / len(latencies) if latencies else None),
+            "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+            "peak_python_memory_mb": round(peak / 2 ** 20, 2),
+            "external_calls": {key: calls_after[key] - calls_before[key] for key in calls_after},
+        }
+
+
+def on_new_thread(send: Callable[[int], int], number: int) -> int:
+    statuses: List[int] = []
+    thread = threading.Thread(target=lambda: statuses.append(send(number)))
+    thread.start()
+    thread.join()
+    return statuses[0] if statuses else 500
+
+
+def ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def stage_requests(bench: Bench, stage: str, count: int) -> List[Callable[[int], int]]:
+    question = "I have a mild fever and a headache, what should I do?"
+    session = lambda number: f"bench-{stage}-{number}"
+    if stage == "question":
+        # A different question each time, so none is answered from the first-turn answer cache
+        return [lambda number: bench.ask(f"{question} (case {number})", session(number))] * count
+    if stage == "question_cached":
+        return [lambda number: bench.ask(question, session(number))] * count
+    if stage == "stream":
+        return [lambda number: bench.stream(question, session(number))] * count
+    if stage in ("pdf_scanner", "pdf_llm"):
+        return [lambda number: bench.upload(bench.unique_pdf())] * count
+    if stage == "pdf_cached":
+        bench.upload(io.BytesIO(bench.pdf_bytes))
+        return [lambda number: bench.upload(io.BytesIO(bench.pdf_bytes))] * count
+    if stage == "batch":
+        return [lambda number: bench.upload_batch(bench.options.batch_size)] * max(1, count // bench.options.batch_size)
+    if stage in CLIENT_STAGES:
+        return client_stage_requests(bench, stage, count)
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def client_stage_requests(bench: Bench, stage: str, count: int) -> List[Callable[[int], int]]:
+    """Calls to the OpenAI stand-in through new or pooled clients (see the module docstring)."""
+    import openai
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.chat_models import ChatOpenAI
+    from langchain.schema import Document
+
+    documents = [
+        Document(page_content="Rx: Paracetamol 500mg twice daily for 5 days", metadata={"page": 0}),
+        Document(page_content="Ibuprofen 400 mg after meals when required for pain", metadata={"page": 0}),
+    ]
+    pooled = stage.endswith("_pooled")
+    # New clients use openai's per-thread sessions and langchain's default retries
+    openai.requestssession = bench.app.openai_session.get() if pooled else None
+
+    if stage.startswith("extraction"):
+        if pooled:
+            # What app2.init_extraction_chain builds, around the real model rather than the fake
+            chain = load_qa_chain(bench.app.init_extraction_llm(), chain_type="stuff")
+            call = lambda: chain.run(input_documents=documents, question="meds name only")
+        else:
+            call = lambda: load_qa_chain(
+                ChatOpenAI(model="gpt-3.5-turbo", temperature=0), chain_type="stuff"
+            ).run(input_documents=documents, question="meds name only")
+    else:
+        # The call OpenAIEmbeddings makes; the langchain wrapper itself needs
+        # tiktoken's downloadable encodings to split texts
+        options = {"request_timeout": bench.app.openai_client_options()["request_timeout"]} if pooled else {}
+        call = lambda: openai.Embedding.create(
+            input=["Paracetamol 500mg"], model="text-embedding-ada-002", **options
+        )
+
+    def send(number: int) -> int:
+        try:
+            call()
+        except Exception:
+            return 500
+        return 200
+
+    return [send] * count
+
+
+def replay_requests(bench: Bench, path: str) -> List[Callable[[int], int]]:
+    requests = []
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "pdf" in entry:
+                with open(entry["pdf"], "rb") as pdf_file:
+                    pdf_bytes = pdf_file.read()
+                requests.append(lambda number, pdf_bytes=pdf_bytes: bench.upload(io.BytesIO(pdf_bytes)))
+            else:
+                question = entry.get("question") or entry.get("body") or entry.get("title") or ""
+                session_id = entry.get("session_id") or entry.get("request_id")
+                requests.append(lambda number, question=question, session_id=session_id:
+                                bench.ask(question, session_id or f"replay-{number}"))
+    return requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    parser.add_argument("--catalog-embedding", default="fake", choices=["fake", "hashed", "spacy"],
+                        help="embedder of the medicine index")
+    parser.add_argument("--requests", type=int, default=50, help="requests per stage")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads per stage")
+    parser.add_argument("--stages", nargs="*", default=STAGES, choices=STAGES + CLIENT_STAGES)
+    parser.add_argument("--batch-size", type=int, default=8, help="PDFs per /chat/batch request")
+    parser.add_argument("--replay", help="JSON-lines request log to replay after the stages")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests before each stage")
+    parser.add_argument("--memory-requests", type=int, default=5, help="requests per stage traced for peak memory")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    parser.add_argument("--mongo-latency", type=float, default=0.0)
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="OpenAI stand-in seconds per request")
+    parser.add_argument("--connect-latency", type=float, default=0.05,
+                        help="OpenAI stand-in seconds per new connection")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of OpenAI stand-in requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    options = parser.parse_args()
+
+    # The app's progress prints go to stderr so stdout carries only the report
+    with redirect_stdout(sys.stderr):
+        report = benchmark(options)
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+def benchmark(options: argparse.Namespace) -> Dict[str, Any]:
+    # Fakes must be installed before anything builds the real clients
+    os.environ["WARM_UP_ON_START"] = "0"
+    # Measures the pipeline, not the token budgets of one client
+    os.environ["ADMISSION_ENABLED"] = "0"
+    from fakes import OpenAIStandIn, install_fake_backends
+
+    openai_stand_in = None
+    if set(options.stages) & set(CLIENT_STAGES):
+        openai_stand_in = OpenAIStandIn(latency=options.openai_latency, connect_latency=options.connect_latency,
+                                        error_rate=options.error_rate)
+        # Read by openai when it is imported
+        os.environ["OPENAI_API_BASE"] = openai_stand_in.start()
+        os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-stand-in"
+    import app2
+
+    catalog_embedding = None
+    if options.catalog_embedding != "fake":
+        from local_embeddings import create_local_embeddings
+        catalog_embedding = create_local_embeddings(options.catalog_embedding)
+
+    setup_started = time.perf_counter()
+    catalog = synthetic_catalog(options.catalog_size, options.seed)
+    app2.medicine_catalog.override(catalog)
+    install_fake_backends(
+        app2,
+        llm_latency=options.llm_latency,
+        embedding_latency=options.embedding_latency,
+        mongo_latency=options.mongo_latency,
+        catalog_embedding=catalog_embedding,
+    )
+    app2.medicine_scanner.get()
+    setup_seconds = time.perf_counter() - setup_started
+
+    bench = Bench(app2, options, openai_stand_in)
+    cache_size = app2.result_cache.max_entries
+    scanner_confidence = app2.SCANNER_MIN_CONFIDENCE
+    stages = {}
+    for stage in options.stages:
+        # Only pdf_cached may be served from the result cache
+        app2.result_cache.max_entries = cache_size if stage == "pdf_cached" else 0
+        # pdf_llm forces the LLM fallback by demanding more than full scanner confidence
+        app2.SCANNER_MIN_CONFIDENCE = 1.1 if stage in ("pdf_llm", "batch") else scanner_confidence
+        stages[stage] = bench.run(
+            stage, stage_requests(bench, stage, options.requests), thread_per_request=stage in CLIENT_STAGES
+        )
+    app2.result_cache.max_entries = 0
+    app2.SCANNER_MIN_CONFIDENCE = scanner_confidence
+    if openai_stand_in is not None:
+        openai_stand_in.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(options).items() if key != "output"},
+        "setup": {"catalog_records": len(catalog), "index_build_seconds": round(setup_seconds, 3)},
+        "stages": stages,
+    }
+    if options.replay:
+        report["replay"] = bench.run("replay", replay_requests(bench, options.replay))
+    return report
+
+
+if __name__ == "__main__":
+    main()
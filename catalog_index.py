@@ -0,0 +1,151 @@
+import json
+import hashlib
+from typing import Iterable, List, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from langchain.schema.embeddings import Embeddings
+    from vector_index import NumpyVectorIndex
+    from vector_store import VectorStore
+
+# Metadata key holding the content hash of the catalog record a vector was built from
+HASH_METADATA_KEY = "catalog_hash"
+
+
+def record_id(medicine: Dict[str, Any]) -> str:
+    """Stable vector id for a catalog record (its Mongo `_id`, or its hash as a fallback)."""
+    if "_id" in medicine:
+        return str(medicine["_id"])
+    return record_hash(medicine)
+
+
+def record_hash(medicine: Dict[str, Any]) -> str:
+    """Content hash of a catalog record, independent of key order."""
+    canonical = json.dumps(medicine, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CatalogFingerprint:
+    """
+    Running, order-independent hash of catalog records, so a catalog can be
+    fingerprinted while it is streamed: record hashes are summed modulo 2**256.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def update(self, medicine: Dict[str, Any]) -> None:
+        self.total = (self.total + int(record_hash(medicine), 16)) % 2 ** 256
+        self.count += 1
+
+    def hexdigest(self) -> str:
+        return hashlib.sha256(f"{self.count}:{self.total:064x}".encode("ascii")).hexdigest()
+
+
+def catalog_fingerprint(medicines: Iterable[Dict[str, Any]]) -> str:
+    """Hash of the whole catalog; changes whenever any record is added, edited or removed."""
+    fingerprint = CatalogFingerprint()
+    for medicine in medicines:
+        fingerprint.update(medicine)
+    return fingerprint.hexdigest()
+
+
+def embedding_model(embedding: "Embeddings") -> str:
+    """Name of the model behind `embedding`, recorded with saved vectors."""
+    return getattr(embedding, "model", type(embedding).__name__)
+
+
+def embed_matrix(embedding: "Embeddings", texts: List[str]) -> "np.ndarray":
+    """Embeds `texts` as one float32 matrix, through `embed_matrix` when the embedder has it."""
+    import numpy as np
+
+    if hasattr(embedding, "embed_matrix"):
+        return embedding.embed_matrix(texts)
+    return np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+
+
+def embedding_dimension(embedding: "Embeddings") -> int:
+    """Dimension of the vectors `embedding` produces, embedding a probe text if it does not say."""
+    dimension = getattr(embedding, "dimension", None)
+    if isinstance(dimension, int):
+        return dimension
+    return len(embedding.embed_query("dimension probe"))
+
+
+def sync_catalog_index(store: "VectorStore", embedding: "Embeddings", medicines: List[Dict[str, Any]],
+                       batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Brings the medicine index in line with the catalog.
+    Only new or changed records are embedded, `batch_size` at a time, and
+    upserted in batches sized for the store; records no longer in the catalog
+    (and stray vectors from older full rebuilds) are deleted.
+    Returns counts of added, updated, deleted and unchanged records and of upsert calls.
+    """
+    from vector_store import upsert_batched
+
+    indexed_hashes = store.hashes()
+
+    catalog = {}
+    for medicine in medicines:
+        catalog[record_id(medicine)] = (json.dumps(medicine), record_hash(medicine))
+
+    ids, texts, hashes = [], [], []
+    added = updated = 0
+    for vector_id, (text, content_hash) in catalog.items():
+        if indexed_hashes.get(vector_id) == content_hash:
+            continue
+        if vector_id in indexed_hashes:
+            updated += 1
+        else:
+            added += 1
+        ids.append(vector_id)
+        texts.append(text)
+        hashes.append(content_hash)
+
+    removed_ids = [vector_id for vector_id in indexed_hashes if vector_id not in catalog]
+
+    if removed_ids:
+        store.delete(removed_ids)
+    # Changed records replace their old vectors in place; batches bound memory
+    upserts = 0
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        upserts += upsert_batched(store, ids[start:end], embed_matrix(embedding, texts[start:end]), hashes[start:end])
+
+    return {
+        "added": added,
+        "updated": updated,
+        "deleted": len(removed_ids),
+        "unchanged": len(catalog) - added - updated,
+        "upsert_calls": upserts,
+    }
+
+
+def open_numpy_catalog_index(directory: str, embedding: "Embeddings", medicines: List[Dict[str, Any]],
+                             batch_size: int = 5000) -> "NumpyVectorIndex":
+    """
+    Opens the saved NumPy medicine index memory-mapped, rebuilding it first if
+    the catalog, the embedding model or its dimension changed since it was saved.
+    Workers sharing `directory` take turns, so only the first rebuilds it.
+    """
+    import numpy as np
+    from vector_index import NumpyVectorIndex, index_lock
+
+    meta = {"catalog": catalog_fingerprint(medicines), "model": embedding_model(embedding)}
+    with index_lock(directory):
+        index = NumpyVectorIndex.load(directory)
+        if (index is not None and all(index.meta.get(key) == value for key, value in meta.items())
+                and (not len(index) or index.dimension == embedding_dimension(embedding))):
+            print(f"Medicine index loaded: {len(index)} vectors")
+            return index
+
+        catalog = {record_id(medicine): json.dumps(medicine) for medicine in medicines}
+        texts = list(catalog.values())
+        batches = [embed_matrix(embedding, texts[start:start + batch_size])
+                   for start in range(0, len(texts), batch_size)]
+        vectors = np.vstack(batches) if batches else np.zeros((0, 1), dtype=np.float32)
+
+        NumpyVectorIndex.build(list(catalog), vectors, meta).save(directory)
+        print(f"Medicine index rebuilt: {len(texts)} vectors")
+        return NumpyVectorIndex.load(directory)
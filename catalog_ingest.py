@@ -0,0 +1,211 @@
+"""
+Streaming ingestion of the medicine catalog.
+
+Reads a JSON array or JSON lines (.jsonl / .ndjson) file record by record,
+and for every fixed-size batch bulk-upserts the records into
+medimate.medicines and embeds them into the medicine index configured for
+app2 (MEDICINE_INDEX_BACKEND, CATALOG_EMBEDDING_BACKEND). Only one batch is
+held in memory, so peak memory does not grow with the catalog. Prints one
+JSON report with records per second and peak memory.
+
+    python catalog_ingest.py formulary.jsonl --batch-size 1000
+    python catalog_ingest.py medicines.json --skip-mongo
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+from contextlib import redirect_stdout
+from itertools import islice
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+from catalog_index import (
+    CatalogFingerprint, embed_matrix, embedding_dimension, embedding_model, record_hash, record_id
+)
+
+READ_CHUNK_CHARS = 1024 * 1024
+
+
+def iter_json_array(file: IO[str], read_size: int = READ_CHUNK_CHARS) -> Iterator[Any]:
+    """Yields the elements of a top-level JSON array, reading `read_size` characters at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    exhausted = False
+    opened = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if exhausted:
+                raise ValueError("Catalog JSON ended before its closing bracket.")
+            buffer, position = file.read(read_size), 0
+            exhausted = not buffer
+            continue
+        if not opened:
+            if buffer[position] != "[":
+                raise ValueError("Catalog JSON must be an array of records.")
+            opened = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            value, end = None, len(buffer)
+        # A value reaching the end of the buffer may continue in the next read
+        if end == len(buffer) and not exhausted:
+            more = file.read(read_size)
+            exhausted = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        if value is None:
+            raise ValueError(f"Invalid catalog JSON near: {buffer[position:position + 80]!r}")
+        yield value
+        position = end
+
+
+def iter_catalog_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Streams the records of a catalog file, JSON lines or a JSON array."""
+    with open(path, "r", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(file)
+
+
+def batched(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ingest_catalog(records: Iterable[Dict[str, Any]], collection: Any = None, index: Any = None,
+                   embedding: Any = None, batch_size: int = 1000,
+                   retry: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Dict[str, Any]:
+    """
+    Writes `records` batch by batch: one unordered bulk upsert (by `_id`) into
+    the Mongo `collection`, then the batch's vectors, embedded with `embedding`,
+    into `index`: a `NumpyIndexWriter` or a `vector_store.VectorStore` (upserted
+    by id in batches sized for it). Either may be None to skip it.
+    `retry`, if given, wraps each bulk write; upserts by `_id` are safe to repeat.
+    Returns counts, timings and the catalog fingerprint.
+    """
+    from vector_index import NumpyIndexWriter
+    from vector_store import upsert_batched
+
+    if collection is not None:
+        from pymongo import ReplaceOne
+
+    fingerprint = CatalogFingerprint()
+    stats: Dict[str, Any] = {"records": 0, "batches": 0, "upserted": 0, "modified": 0, "matched": 0}
+    mongo_seconds = index_seconds = 0.0
+    started = time.perf_counter()
+
+    for batch in batched(records, batch_size):
+        ids = [record_id(medicine) for medicine in batch]
+        if collection is not None:
+            write_started = time.perf_counter()
+            # Matched on the record's own `_id` (an int, say), not its string index id
+            operations = [
+                ReplaceOne({"_id": medicine.get("_id", med_id)}, medicine, upsert=True)
+                for med_id, medicine in zip(ids, batch)
+            ]
+            result = (retry or (lambda call: call()))(lambda: collection.bulk_write(operations, ordered=False))
+            stats["upserted"] += result.upserted_count
+            stats["modified"] += result.modified_count
+            stats["matched"] += result.matched_count
+            mongo_seconds += time.perf_counter() - write_started
+
+        if index is not None:
+            index_started = time.perf_counter()
+            # The same text init_med_vector_store indexes, so the app finds the index current
+            vectors = embed_matrix(embedding, [json.dumps(medicine) for medicine in batch])
+            if isinstance(index, NumpyIndexWriter):
+                index.add(ids, vectors)
+            else:
+                upsert_batched(index, ids, vectors, [record_hash(medicine) for medicine in batch])
+            index_seconds += time.perf_counter() - index_started
+
+        for medicine in batch:
+            fingerprint.update(medicine)
+        stats["records"] += len(batch)
+        stats["batches"] += 1
+
+    seconds = time.perf_counter() - started
+    stats.update({
+        "seconds": round(seconds, 3),
+        "mongo_seconds": round(mongo_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "records_per_second": round(stats["records"] / seconds, 1) if seconds else None,
+        "catalog": fingerprint.hexdigest(),
+    })
+    return stats
+
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=None, help="catalog file (default: app2's MEDICINES_FILE)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--skip-mongo", action="store_true", help="only build the medicine index")
+    parser.add_argument("--skip-index", action="store_true", help="only write to Mongo")
+    options = parser.parse_args()
+
+    # Only the resources used here: app2's warm-up would sync the medicine index
+    # from MEDICINES_FILE while this run writes to it
+    os.environ["WARM_UP_ON_START"] = "0"
+    # app2 prints while it sets up; keep stdout for the report
+    with redirect_stdout(sys.stderr):
+        import app2
+        from vector_index import NumpyIndexWriter, index_lock
+
+        path = options.path or app2.MEDICINES_FILE
+        collection = None if options.skip_mongo else app2.init_mongo_connection()
+        embedding = index = None
+        if not options.skip_index:
+            if app2.MEDICINE_INDEX_BACKEND == "memory":
+                parser.error("MEDICINE_INDEX_BACKEND=memory is built by each app worker; use --skip-index.")
+            embedding = app2.catalog_embedding.get()
+            if app2.MEDICINE_INDEX_BACKEND == "numpy":
+                index = NumpyIndexWriter(app2.MEDICINE_INDEX_DIRECTORY)
+            else:
+                from vector_store import check_dimension
+
+                index = app2.open_medicine_store()
+                check_dimension(index, embedding_dimension(embedding))
+
+        try:
+            stats = ingest_catalog(
+                iter_catalog_records(path), collection, index, embedding,
+                batch_size=options.batch_size, retry=None if collection is None else app2.mongo_retry()
+            )
+        except BaseException:
+            if isinstance(index, NumpyIndexWriter):
+                index.discard()
+            raise
+        if isinstance(index, NumpyIndexWriter):
+            # Recorded like open_numpy_catalog_index does, so the app maps this index as is;
+            # written under the index lock, so no worker rebuilds it meanwhile
+            with index_lock(app2.MEDICINE_INDEX_DIRECTORY):
+                index.close({"catalog": stats["catalog"], "model": embedding_model(embedding)})
+
+    print(json.dumps({"path": path, "index": None if index is None else app2.MEDICINE_INDEX_BACKEND,
+                      **stats, "peak_memory_mb": peak_memory_mb()}))
+
+
+if __name__ == "__main__":
+    main()
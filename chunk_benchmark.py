@@ -0,0 +1,127 @@
+"""
+Chunking cost of multi-page prescriptions: the previous two-splitter pass
+against the single-pass chunker, with and without duplicate elimination.
+
+Pages are synthetic discharge-summary pages with a running header and footer,
+a repeated instructions block and medication lines from medicines.json; a
+share of pages are verbatim repeats (as in re-faxed bundles). For each
+variant it reports chunks (texts sent to the embedder), embedded tokens, time
+and peak Python memory, and checks that the single pass produces the same
+chunks as the old one.
+
+    python chunk_benchmark.py --pages 5 20 50 --repeat-share 0.2
+"""
+import json
+import time
+import random
+import logging
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from langchain.schema import Document
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from chunker import ChunkDeduplicator, PrescriptionChunker
+from token_usage import count_tokens
+
+INSTRUCTIONS = (
+    "Important instructions for the patient:\n"
+    "Take all medicines exactly as prescribed and do not stop any medicine without\n"
+    "talking to your doctor. If you develop a rash, swelling of the face or lips,\n"
+    "difficulty breathing, chest pain or severe dizziness, stop the medicine and seek\n"
+    "emergency care immediately by dialing 108. Keep all medicines out of reach of\n"
+    "children. Bring this summary and all your medicines to your next appointment.\n"
+    "This document is confidential and intended only for the named patient and their\n"
+    "treating clinicians. If you have received it in error, please destroy it."
+)
+FINDINGS = [
+    "Patient reports mild fever and body ache for three days.",
+    "Vitals stable, blood pressure within normal limits.",
+    "No known drug allergies documented at admission.",
+    "Advised oral fluids, rest and review if symptoms persist.",
+    "Lab results show mildly raised white cell count.",
+    "Chest examination clear, no added sounds.",
+]
+
+
+def synthetic_pages(page_count: int, repeat_share: float, seed: int = 0) -> List[Document]:
+    with open("medicines.json") as file:
+        medicines = [medicine["name"] for medicine in json.load(file)]
+    rng = random.Random(seed)
+    pages: List[Document] = []
+    for number in range(page_count):
+        if pages and rng.random() < repeat_share:
+            text = rng.choice(pages).page_content
+        else:
+            lines = [f"City Health Clinic - Discharge Summary - Page {number + 1} of {page_count}",
+                     f"Patient: John Doe  MRN: 00{rng.randint(1000, 9999)}  Printed: 2026-10-{rng.randint(1, 28):02d}"]
+            for _ in range(rng.randint(15, 30)):
+                if rng.random() < 0.3:
+                    lines.append(f"{rng.choice(medicines)} {rng.choice([5, 10, 250, 500])} mg "
+                                 f"{rng.choice(['once', 'twice', 'three times'])} daily for {rng.randint(3, 14)} days")
+                else:
+                    lines.append(rng.choice(FINDINGS))
+            lines.append(INSTRUCTIONS)
+            text = "\n".join(lines)
+        pages.append(Document(page_content=text, metadata={"source": "synthetic.pdf", "page": number}))
+    return pages
+
+
+def two_splitters(pages: List[Document]) -> List[Document]:
+    """The previous chunking: two splitters, each materializing every chunk."""
+    char_splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=50, length_function=len)
+    recursive_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=20)
+    return recursive_splitter.split_documents(char_splitter.split_documents(pages))
+
+
+def single_pass(deduplicate: bool) -> Callable[[List[Document]], List[Document]]:
+    def chunk(pages: List[Document]) -> List[Document]:
+        chunker = PrescriptionChunker()
+        return list(chunker.split_documents(pages, ChunkDeduplicator() if deduplicate else None))
+    return chunk
+
+
+def measure(chunk: Callable[[List[Document]], List[Document]], pages: List[Document]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    chunks = chunk(pages)
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    chunk(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunks": len(chunks),
+        "embedded_tokens": sum(count_tokens(document.page_content) for document in chunks),
+        "chunk_ms": round(seconds * 1000, 2),
+        "peak_python_memory_kb": round(peak / 1024, 1),
+        "texts": [document.page_content for document in chunks],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--repeat-share", type=float, default=0.2, help="share of pages that repeat an earlier page")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+    # The splitters warn about every over-long chunk
+    logging.disable(logging.WARNING)
+
+    for page_count in options.pages:
+        pages = synthetic_pages(page_count, options.repeat_share, options.seed)
+        results = {
+            "two_splitters": measure(two_splitters, pages),
+            "single_pass": measure(single_pass(deduplicate=False), pages),
+            "single_pass_deduplicated": measure(single_pass(deduplicate=True), pages),
+        }
+        same_chunks = results["two_splitters"]["texts"] == results["single_pass"]["texts"]
+        for result in results.values():
+            del result["texts"]
+        print(json.dumps({"pages": page_count, "same_chunks": same_chunks, **results}))
+
+
+if __name__ == "__main__":
+    main()
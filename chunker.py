@@ -0,0 +1,133 @@
+import re
+import hashlib
+from typing import Iterable, Iterator, List, Optional, Set
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from metrics import REGISTRY
+
+DUPLICATE_CHUNKS = REGISTRY.counter(
+    "medimate_duplicate_chunks_total", "Chunks dropped before embedding as duplicates.", ["kind"]
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class PrescriptionChunker:
+    """
+    Single-pass replacement for splitting pages with
+    CharacterTextSplitter(separator, chunk_size, chunk_overlap) and then
+    RecursiveCharacterTextSplitter(sub_chunk_size, sub_chunk_overlap).
+    Produces the same chunks in the same order, but streams them: lines are
+    merged into first-level windows as they are read, and only windows longer
+    than `sub_chunk_size` go through the recursive splitter (shorter ones
+    would come back from it unchanged).
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 50, separator: str = "\n",
+                 sub_chunk_size: int = 500, sub_chunk_overlap: int = 20):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+        self.sub_chunk_size = sub_chunk_size
+        self.sub_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=sub_chunk_size, chunk_overlap=sub_chunk_overlap
+        )
+
+    def _splits(self, text: str) -> Iterator[str]:
+        start = 0
+        while True:
+            end = text.find(self.separator, start)
+            piece = text[start:] if end == -1 else text[start:end]
+            if piece:
+                yield piece
+            if end == -1:
+                return
+            start = end + len(self.separator)
+
+    def _windows(self, text: str) -> Iterator[str]:
+        """CharacterTextSplitter's merge of separator-delimited pieces, as a generator."""
+        separator_len = len(self.separator)
+        current: List[str] = []
+        total = 0
+        for piece in self._splits(text):
+            piece_len = len(piece)
+            if total + piece_len + (separator_len if current else 0) > self.chunk_size:
+                if current:
+                    window = self.separator.join(current).strip()
+                    if window:
+                        yield window
+                    # Keep trailing pieces that fit in the overlap
+                    while total > self.chunk_overlap or (
+                        total + piece_len + (separator_len if current else 0) > self.chunk_size and total > 0
+                    ):
+                        total -= len(current[0]) + (separator_len if len(current) > 1 else 0)
+                        current = current[1:]
+            current.append(piece)
+            total += piece_len + (separator_len if len(current) > 1 else 0)
+        window = self.separator.join(current).strip()
+        if window:
+            yield window
+
+    def split_text(self, text: str) -> Iterator[str]:
+        for window in self._windows(text):
+            if len(window) <= self.sub_chunk_size:
+                yield window
+            else:
+                yield from self.sub_splitter.split_text(window)
+
+    def split_documents(self, pages: Iterable[Document],
+                        deduplicator: Optional["ChunkDeduplicator"] = None) -> Iterator[Document]:
+        """Chunks pages one at a time; chunks `deduplicator` has already seen are skipped."""
+        for page in pages:
+            for chunk in self.split_text(page.page_content):
+                if deduplicator is None or not deduplicator.is_duplicate(chunk):
+                    yield Document(page_content=chunk, metadata=dict(page.metadata))
+
+
+class ChunkDeduplicator:
+    """
+    Remembers the chunks of one document and flags repeats.
+    Exact duplicates match after case and whitespace folding. Near duplicates
+    have 64-bit simhashes, over word pairs, at most `near_duplicate_bits` bits
+    apart. They are off by default (0): two prescription lines that differ only
+    in the drug name can be that close, and both are needed for extraction.
+    Digits are part of the hash, so lines differing in a dose never collide.
+    """
+
+    def __init__(self, near_duplicate_bits: int = 0):
+        self.near_duplicate_bits = near_duplicate_bits
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self._exact: Set[str] = set()
+        self._simhashes: List[int] = []
+
+    @staticmethod
+    def simhash(text: str) -> int:
+        words = text.lower().split()
+        features = [" ".join(pair) for pair in zip(words, words[1:])] or words
+        bits = [
+            format(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"), "064b")
+            for feature in features
+        ]
+        # Each bit is set when most features have it set
+        half = len(bits) / 2
+        return int("".join("1" if column.count("1") > half else "0" for column in zip(*bits)) or "0", 2)
+
+    def is_duplicate(self, text: str) -> bool:
+        key = _WHITESPACE.sub(" ", text.lower()).strip()
+        if key in self._exact:
+            self.exact_duplicates += 1
+            DUPLICATE_CHUNKS.inc(kind="exact")
+            return True
+        self._exact.add(key)
+
+        if self.near_duplicate_bits:
+            fingerprint = self.simhash(text)
+            if any((fingerprint ^ seen).bit_count() <= self.near_duplicate_bits for seen in self._simhashes):
+                self.near_duplicates += 1
+                DUPLICATE_CHUNKS.inc(kind="near")
+                return True
+            self._simhashes.append(fingerprint)
+        return False
@@ -0,0 +1,173 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+from langchain.schema.embeddings import Embeddings
+
+from metrics import REGISTRY
+from token_usage import count_tokens
+
+EMBEDDING_REQUESTS = REGISTRY.counter("medimate_embedding_requests_total", "Requests sent to the embedding backend.")
+EMBEDDING_TEXTS = REGISTRY.counter("medimate_embedding_texts_total", "Texts embedded by the backend (cache misses).")
+EMBEDDING_TOKENS = REGISTRY.counter("medimate_embedding_tokens_total", "Tokens sent to the embedding backend.")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that remembers vectors on disk.
+    Entries are keyed by model name plus a hash of the text, the store is capped
+    at `max_entries` and evicts the least recently used vectors first.
+    Texts missing from the store are sent in requests of up to `batch_size`
+    texts, `max_concurrency` requests at a time.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache_path: str, max_entries: int = 100_000,
+                 batch_size: Optional[int] = None, max_concurrency: int = 1):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return f"{self.model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in entries.items()],
+        )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        missing = {}
+        with self._lock:
+            cached = self._lookup(keys)
+            self._conn.commit()
+            for key, text in zip(keys, texts):
+                if key not in cached and key not in missing:
+                    missing[key] = text
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self._embed_missing(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._store(computed)
+                self._conn.commit()
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self._record_request(texts)
+        return self.embeddings.embed_documents(texts)
+
+    def _embed_missing(self, texts: List[str]) -> List[List[float]]:
+        size = self.batch_size or len(texts)
+        # Texts that fit in one request go in one request; larger sets are
+        # spread evenly over whole rounds of concurrent requests
+        if len(texts) > size and self.max_concurrency > 1:
+            rounds = math.ceil(len(texts) / (size * self.max_concurrency))
+            size = math.ceil(len(texts) / min(len(texts), rounds * self.max_concurrency))
+        batches = [texts[start:start + size] for start in range(0, len(texts), size)]
+        if len(batches) == 1:
+            results = map(self._embed_batch, batches)
+        else:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="embedding")
+            # map keeps the batches in order
+            results = self._pool.map(self._embed_batch, batches)
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            cached = self._lookup([key])
+            self._conn.commit()
+            if key in cached:
+                self.hits += 1
+                return cached[key]
+            self.misses += 1
+
+        self._record_request([text])
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._store({key: vector})
+            self._conn.commit()
+        return vector
+
+    def _record_request(self, texts: List[str]) -> None:
+        EMBEDDING_REQUESTS.inc()
+        EMBEDDING_TEXTS.inc(len(texts))
+        EMBEDDING_TOKENS.inc(sum(count_tokens(text) for text in texts))
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters for this process plus the current size of the store."""
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "entries": size,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,546 @@
+import re
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import ModuleType, SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.chat_models.base import SimpleChatModel
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.messages import BaseMessage
+
+from catalog_index import HASH_METADATA_KEY, embedding_dimension, open_numpy_catalog_index, sync_catalog_index
+from embedding_cache import CachedEmbeddings
+from medicine_repository import MedicineRepository
+from token_usage import TokenUsageHandler
+from vector_store import InMemoryVectorStore, RemoteVectorStore, open_chroma_store
+
+# ==========================================
+# Deterministic local stand-ins for external services
+# (used for offline tests and benchmarks)
+# ==========================================
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic, network-free embedder.
+    Hashes word unigrams and bigrams into a fixed-size unit vector, so equal texts
+    get equal vectors and texts sharing words land close together.
+    Each call sleeps `latency` plus `latency_per_text` for every text, as
+    larger requests take longer upstream.
+    """
+
+    def __init__(self, size: int = 256, model: str = "fake-embedding", latency: float = 0.0,
+                 latency_per_text: float = 0.0):
+        self.size = size
+        self.model = model
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        words = text.lower().split()
+        features = words + [" ".join(pair) for pair in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _record_call(self, texts: int) -> None:
+        time.sleep(self.latency + self.latency_per_text * texts)
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += texts
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._record_call(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._record_call(1)
+        return self._embed(text)
+
+
+SYNTHETIC_PDF_LINES = [
+    "Rx: {name} 500mg twice daily after meals for 5 days",
+    "{name} 10 mg once daily at bedtime, continue for 1 month",
+    "Haemoglobin {value} g/dL (reference 13.0 - 17.0)",
+    "Serum creatinine {value} mg/dL, blood urea nitrogen within range",
+    "Patient reports improvement; review in {value} days with reports",
+    "Advised: plenty of fluids, light diet and rest; avoid driving while on {name}",
+]
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(page_count: int, lines_per_page: int = 45, names: Optional[List[str]] = None,
+                  seed: int = 0) -> bytes:
+    """
+    A multi-page PDF of discharge-summary style text: a repeated header and
+    footer per page around prescription, lab and advice lines, naming `names`
+    (catalog medicines, say). Built by hand, so no PDF writer is needed.
+    """
+    rng = random.Random(seed)
+    names = names or ["Paracetamol", "Ibuprofen", "Amoxicillin", "Cetirizine", "Metformin"]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page_number in range(page_count):
+        lines = ["City Hospital - Discharge Summary - Patient ID 48213"]
+        lines += [
+            rng.choice(SYNTHETIC_PDF_LINES).format(name=rng.choice(names), value=round(rng.uniform(1, 30), 1))
+            for _ in range(lines_per_page)
+        ]
+        lines.append(f"Page {page_number + 1} of {page_count} - Dr. A. Rao, MBBS, MD")
+        text = " T* ".join(f"({_pdf_string(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {page_count} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(output)
+
+
+class FakeMongoCollection:
+    """
+    In-process stand-in for a pymongo collection.
+    Supports the `_id` equality and `$in` filters the app uses, the
+    `ReplaceOne` bulk writes catalog ingestion sends, and counts round trips
+    so batching can be measured.
+    """
+
+    def __init__(self, documents: Optional[Iterable[Dict[str, Any]]] = None, latency: float = 0.0):
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+        self.latency = latency
+        self.round_trips = 0
+        for document in documents or []:
+            self.documents[document["_id"]] = dict(document)
+
+    def _matches(self, document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        for field, condition in query.items():
+            value = document.get(field)
+            if isinstance(condition, dict) and "$in" in condition:
+                if value not in condition["$in"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def find(self, query: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        time.sleep(self.latency)
+        self.round_trips += 1
+        query = query or {}
+        return iter([dict(document) for document in self.documents.values()
+                     if self._matches(document, query)])
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return next(self.find(query), None)
+
+    def bulk_write(self, operations: Iterable[Any], ordered: bool = True) -> SimpleNamespace:
+        """Applies pymongo `ReplaceOne` operations by `_id`, counting like a BulkWriteResult."""
+        time.sleep(self.latency)
+        self.round_trips += 1
+        result = SimpleNamespace(matched_count=0, modified_count=0, upserted_count=0)
+        for operation in operations:
+            document_id = operation._filter["_id"]
+            document = {**operation._doc, "_id": document_id}
+            existing = self.documents.get(document_id)
+            if existing is not None:
+                result.matched_count += 1
+                result.modified_count += existing != document
+            elif operation._upsert:
+                result.upserted_count += 1
+            else:
+                continue
+            self.documents[document_id] = document
+        return result
+
+
+class FakeStreamingChatModel(SimpleChatModel):
+    """
+    Chat model that replays canned responses word by word.
+    Each word is reported through `on_llm_new_token`, like ChatOpenAI with
+    streaming=True, after an optional first-token and per-token delay.
+    """
+
+    responses: List[str] = ["Welcome to MediMate! Please rest, drink fluids and monitor your temperature."]
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat-model"
+
+    def _call(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        time.sleep(self.first_token_delay)
+        for index, token in enumerate(re.findall(r"\S+\s*", response)):
+            if index and self.token_delay:
+                time.sleep(self.token_delay)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+        return response
+
+
+class OpenAIStandIn:
+    """
+    Local HTTP server speaking enough of the OpenAI API (chat completions,
+    plain or streamed, and embeddings) for the real openai/langchain clients.
+    Adds `latency` to every request and `connect_latency` to every new
+    connection (standing in for the TCP and TLS handshakes), answers an
+    `error_rate` share of requests with 503, and counts connections and requests.
+    """
+
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0, error_rate: float = 0.0,
+                 reply: str = "Paracetamol, Ibuprofen", seed: int = 0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.embedder = FakeEmbeddings()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> str:
+        """Starts serving on a free local port; returns the API base URL."""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; with Nagle's algorithm
+            # the body would wait for the client's delayed ACK (~40 ms)
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with stand_in._lock:
+                    stand_in.connections += 1
+                time.sleep(stand_in.connect_latency)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    failed = stand_in._random.random() < stand_in.error_rate
+                    stand_in.errors += failed
+                time.sleep(stand_in.latency)
+                if failed:
+                    self._send_json(503, {"error": {"message": "Stand-in overloaded", "type": "server_error"}})
+                elif self.path.endswith("/embeddings"):
+                    self._send_json(200, stand_in._embeddings(body))
+                elif body.get("stream"):
+                    self._send_stream(stand_in._completion_chunks(body))
+                else:
+                    self._send_json(200, stand_in._completion(body))
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks: List[Dict[str, Any]]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks] + ["data: [DONE]\n\n"]:
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_tokens = sum(len(message.get("content", "").split()) for message in body.get("messages", []))
+        completion_tokens = len(self.reply.split())
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _completion_chunks(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        tokens = re.findall(r"\S+\s*", self.reply)
+        return [
+            {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+             "model": body.get("model", "gpt-3.5-turbo"),
+             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            for token in tokens
+        ]
+
+    def _embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        # Pre-tokenized input arrives as lists of token ids
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in texts]
+        return {
+            "object": "list", "model": body.get("model", "text-embedding-ada-002"),
+            "data": [{"object": "embedding", "index": index, "embedding": vector}
+                     for index, vector in enumerate(self.embedder.embed_documents(texts))],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in texts),
+                      "total_tokens": sum(len(text.split()) for text in texts)},
+        }
+
+
+class VectorServiceStandIn:
+    """
+    Local HTTP server speaking the part of Pinecone's data-plane API that
+    vector_store.RemoteVectorStore uses, over an InMemoryVectorStore per
+    namespace. Like Pinecone, the index has a fixed `dimension` and rejects
+    vectors of another, upserts of more than 1000 vectors or 2MB, and requests
+    without the `api_key` (if set). Adds `latency` to every request and counts
+    requests, upserts and the largest upsert body.
+    """
+
+    MAX_UPSERT_VECTORS = 1000
+    MAX_REQUEST_BYTES = 2 * 1024 * 1024
+
+    def __init__(self, dimension: int, latency: float = 0.0, api_key: Optional[str] = None):
+        self.dimension = dimension
+        self.latency = latency
+        self.api_key = api_key
+        self.namespaces: Dict[str, InMemoryVectorStore] = {}
+        self.requests = 0
+        self.upserts = 0
+        self.largest_upsert_bytes = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _namespace(self, name: str) -> InMemoryVectorStore:
+        with self._lock:
+            return self.namespaces.setdefault(name, InMemoryVectorStore(dimension=self.dimension))
+
+    def _check_dimension(self, values: List[float]) -> None:
+        if len(values) != self.dimension:
+            raise ValueError(
+                f"Vector dimension {len(values)} does not match the dimension of the index {self.dimension}"
+            )
+
+    def start(self) -> str:
+        """Starts serving on a free local port; returns the index host URL."""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _handle(self, body: Optional[bytes]) -> None:
+                with stand_in._lock:
+                    stand_in.requests += 1
+                time.sleep(stand_in.latency)
+                if stand_in.api_key and self.headers.get("Api-Key") != stand_in.api_key:
+                    self._send_json(401, {"code": 16, "message": "Invalid API key"})
+                    return
+                url = urlparse(self.path)
+                try:
+                    if body is None:
+                        payload = stand_in._get(url.path, parse_qs(url.query))
+                    else:
+                        payload = stand_in._post(url.path, body)
+                except KeyError:
+                    self._send_json(404, {"code": 5, "message": f"Not found: {url.path}"})
+                except ValueError as e:
+                    self._send_json(400, {"code": 3, "message": str(e)})
+                else:
+                    self._send_json(200, payload)
+
+            def do_GET(self) -> None:
+                self._handle(None)
+
+            def do_POST(self) -> None:
+                self._handle(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _post(self, path: str, data: bytes) -> Dict[str, Any]:
+        body = json.loads(data or b"{}")
+        if path == "/describe_index_stats":
+            with self._lock:
+                counts = {name: {"vectorCount": len(store)} for name, store in self.namespaces.items()}
+            return {"dimension": self.dimension, "indexFullness": 0.0, "namespaces": counts,
+                    "totalVectorCount": sum(count["vectorCount"] for count in counts.values())}
+
+        store = self._namespace(body.get("namespace", ""))
+        if path == "/vectors/upsert":
+            vectors = body.get("vectors", [])
+            if len(vectors) > self.MAX_UPSERT_VECTORS or len(data) > self.MAX_REQUEST_BYTES:
+                raise ValueError(
+                    f"Upsert of {len(vectors)} vectors and {len(data)} bytes exceeds the limits "
+                    f"of {self.MAX_UPSERT_VECTORS} vectors and {self.MAX_REQUEST_BYTES} bytes"
+                )
+            for vector in vectors:
+                self._check_dimension(vector["values"])
+            if vectors:
+                store.upsert(
+                    [vector["id"] for vector in vectors],
+                    np.asarray([vector["values"] for vector in vectors], dtype=np.float32),
+                    [(vector.get("metadata") or {}).get(HASH_METADATA_KEY) for vector in vectors],
+                )
+            with self._lock:
+                self.upserts += 1
+                self.largest_upsert_bytes = max(self.largest_upsert_bytes, len(data))
+            return {"upsertedCount": len(vectors)}
+        if path == "/query":
+            self._check_dimension(body["vector"])
+            [matches] = store.query([body["vector"]], int(body.get("topK", 10)))
+            return {"matches": [{"id": vector_id, "score": score} for vector_id, score in matches],
+                    "namespace": body.get("namespace", "")}
+        if path == "/vectors/delete":
+            store.delete(body.get("ids", []))
+            return {}
+        raise KeyError(path)
+
+    def _get(self, path: str, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        namespace = params.get("namespace", [""])[0]
+        store = self._namespace(namespace)
+        if path == "/vectors/list":
+            ids = sorted(store.hashes())
+            start = int(params.get("paginationToken", ["0"])[0])
+            end = start + int(params.get("limit", ["100"])[0])
+            page: Dict[str, Any] = {"vectors": [{"id": vector_id} for vector_id in ids[start:end]],
+                                    "namespace": namespace}
+            if end < len(ids):
+                page["pagination"] = {"next": str(end)}
+            return page
+        if path == "/vectors/fetch":
+            return {
+                "vectors": {
+                    vector_id: {"id": vector_id, "values": vector.tolist(), "metadata": {HASH_METADATA_KEY: content_hash}}
+                    for vector_id, (vector, content_hash) in store.fetch(params.get("ids", [])).items()
+                },
+                "namespace": namespace,
+            }
+        raise KeyError(path)
+
+
+def install_fake_backends(
+    app_module: ModuleType,
+    llm_latency: float = 0.0,
+    embedding_latency: float = 0.0,
+    mongo_latency: float = 0.0,
+    catalog_embedding: Optional[Embeddings] = None,
+) -> None:
+    """
+    Points every external resource of `app_module` (app2) at local fakes in the
+    calling process. The medicine index is rebuilt in a temporary directory, so
+    fake vectors never reach the persisted index, and the embedding cache lives
+    in memory. The index uses `catalog_embedding` (e.g. a local embedder) if
+    given, the fake embedder otherwise. The "remote" backend is served by a
+    VectorServiceStandIn started here.
+    """
+    catalog = app_module.medicine_catalog.get()
+    embedding = CachedEmbeddings(
+        FakeEmbeddings(latency=embedding_latency), cache_path=":memory:",
+        batch_size=app_module.EMBEDDING_BATCH_SIZE, max_concurrency=app_module.EMBEDDING_CONCURRENCY
+    )
+    catalog_embedding = catalog_embedding or embedding
+    # On disk like the real index, apart from the in-memory prescription collections
+    index_directory = tempfile.mkdtemp(prefix="medimate-index-")
+    backend = app_module.MEDICINE_INDEX_BACKEND
+    if backend == "numpy":
+        med_vectordb = open_numpy_catalog_index(index_directory, catalog_embedding, catalog)
+    else:
+        if backend == "memory":
+            med_vectordb = InMemoryVectorStore()
+        elif backend == "remote":
+            stand_in = VectorServiceStandIn(dimension=embedding_dimension(catalog_embedding))
+            med_vectordb = RemoteVectorStore(stand_in.start(), max_concurrency=app_module.VECTOR_STORE_CONCURRENCY)
+        else:
+            med_vectordb = open_chroma_store(
+                index_directory, f"catalog_{uuid.uuid4().hex}", search_ef=app_module.CHROMA_SEARCH_EF
+            )
+        sync_catalog_index(med_vectordb, catalog_embedding, catalog)
+
+    extracted_names = ", ".join(medicine["name"] for medicine in catalog[:2]) or "Paracetamol"
+    app_module.embedding_function.override(embedding)
+    app_module.catalog_embedding.override(catalog_embedding)
+    app_module.med_vectordb.override(med_vectordb)
+    app_module.medicine_repository.override(
+        MedicineRepository(collection=FakeMongoCollection(catalog, latency=mongo_latency))
+    )
+    app_module.chat_llm.override(
+        FakeStreamingChatModel(first_token_delay=llm_latency, callbacks=[TokenUsageHandler("chat")])
+    )
+    app_module.extraction_llm.override(
+        FakeStreamingChatModel(
+            responses=[extracted_names], first_token_delay=llm_latency, callbacks=[TokenUsageHandler("extraction")]
+        )
+    )
+    # Rebuilt around the fake extraction model on next use
+    app_module.extraction_chain.reset()
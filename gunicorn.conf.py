@@ -0,0 +1,35 @@
+import os
+import glob
+import tempfile
+import multiprocessing
+
+# Production serving: gunicorn -c gunicorn.conf.py app2:app
+# Every worker process builds its own clients and indexes lazily (see resources.LazyResource),
+# so the app must not be preloaded in the master.
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Inherited by the workers, which split server-wide budgets (admission control) between them
+os.environ["GUNICORN_WORKERS"] = str(workers)
+# A Chroma index lives in one process; workers share the memory-mapped NumPy index instead,
+# which the first of them to start rebuilds when the catalog changed
+if workers > 1:
+    os.environ.setdefault("MEDICINE_INDEX_BACKEND", "numpy")
+    if os.environ["MEDICINE_INDEX_BACKEND"] == "chroma":
+        raise SystemExit("MEDICINE_INDEX_BACKEND=chroma needs WEB_CONCURRENCY=1; use numpy or remote with several workers.")
+# Metrics live in each worker; they share them through files in this directory so that a
+# scrape of /metrics, whichever worker answers it, reports the whole server
+if workers > 1:
+    os.environ.setdefault("METRICS_SHARED_DIRECTORY", tempfile.mkdtemp(prefix="medimate-metrics-"))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+preload_app = False
+# Prescription analysis and LLM calls can take several seconds
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+
+def on_starting(server):
+    """Drops the metrics of a previous run left in a configured METRICS_SHARED_DIRECTORY."""
+    directory = os.environ.get("METRICS_SHARED_DIRECTORY")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
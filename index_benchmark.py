@@ -0,0 +1,165 @@
+"""
+Medicine-index backends compared through the vector-store interface: the
+NumPy index, the in-memory store, Chroma and a remote service (a local
+fakes.VectorServiceStandIn speaking Pinecone's API).
+
+For each size, clustered random unit vectors are written by each backend the
+way the app writes them (vector_store.upsert_batched, NumPy's build and save)
+and queried one at a time. Each backend runs in a fresh process, so the
+memory it reports is the resident-set growth of that process alone; the
+remote stand-in runs in this process and is not counted. The report gives
+build time, upsert calls, start-up time (reopening the saved index), query
+latency percentiles, recall@k against the exact NumPy results and memory.
+
+    python index_benchmark.py --sizes 1000 100000 1000000 --dimension 256
+    python index_benchmark.py --sizes 10000 --remote-latency 0.002
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKENDS = ["numpy", "memory", "chroma", "remote"]
+
+
+def percentile_ms(latencies: List[float], share: float) -> float:
+    ordered = sorted(latencies)
+    return round(ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000, 3)
+
+
+def latency_report(latencies: List[float]) -> Dict[str, float]:
+    return {"p50_ms": percentile_ms(latencies, 0.5), "p95_ms": percentile_ms(latencies, 0.95),
+            "p99_ms": percentile_ms(latencies, 0.99)}
+
+
+def resident_mb() -> float:
+    """Resident set size of this process (Linux)."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def make_data(size: int, dimension: int, queries: int, seed: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    # Clustered vectors (variants of a few thousand "drugs"), since uniformly
+    # random high-dimensional vectors have no meaningful nearest neighbours
+    centers = rng.standard_normal((max(1, size // 100), dimension), dtype=np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)]
+    vectors += 0.5 * rng.standard_normal(vectors.shape, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Queries near stored vectors, as catalog queries are near their medicines
+    anchors = vectors[rng.integers(0, size, queries)]
+    query_vectors = anchors + 0.3 * rng.standard_normal(anchors.shape, dtype=np.float32) / np.sqrt(dimension)
+    return [f"med-{number}" for number in range(size)], vectors, query_vectors
+
+
+def bench_backend(backend: str, size: int, options: argparse.Namespace, remote_url: Optional[str]) -> Dict[str, Any]:
+    """Builds and queries one backend; runs in its own process."""
+    from vector_index import NumpyVectorIndex
+    from vector_store import InMemoryVectorStore, RemoteVectorStore, open_chroma_store, upsert_batched
+
+    ids, vectors, queries = make_data(size, options.dimension, options.queries, options.seed)
+    hashes = ["bench"] * size
+    directory = tempfile.mkdtemp(prefix=f"{backend}-index-")
+    name = f"bench_{uuid.uuid4().hex}"
+    baseline = resident_mb()
+
+    calls, load = 1, None
+    started = time.perf_counter()
+    if backend == "numpy":
+        NumpyVectorIndex.build(ids, vectors).save(directory)
+    elif backend == "memory":
+        store: Any = InMemoryVectorStore()
+        calls = upsert_batched(store, ids, vectors, hashes)
+    elif backend == "chroma":
+        store = open_chroma_store(directory, name, search_ef=options.search_ef)
+        calls = upsert_batched(store, ids, vectors, hashes)
+    else:
+        store = RemoteVectorStore(remote_url, namespace=name)
+        calls = upsert_batched(store, ids, vectors, hashes)
+    build = time.perf_counter() - started
+
+    if backend in ("numpy", "chroma"):
+        started = time.perf_counter()
+        store = NumpyVectorIndex.load(directory) if backend == "numpy" else open_chroma_store(directory, name)
+        store.query(queries[:1], options.k)
+        load = round(time.perf_counter() - started, 4)
+
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        [matches] = store.query([query], options.k)
+        latencies.append(time.perf_counter() - started)
+        results.append([vector_id for vector_id, _ in matches])
+    return {
+        "build_s": round(build, 3),
+        "upsert_calls": calls,
+        "load_s": load,
+        **latency_report(latencies),
+        "memory_mb": round(resident_mb() - baseline, 1),
+        "results": results,
+    }
+
+
+def recall(expected: List[List[str]], found: List[List[str]]) -> float:
+    hits = sum(len(set(want) & set(got)) for want, got in zip(expected, found))
+    return round(hits / sum(len(want) for want in expected), 4)
+
+
+def run(size: int, options: argparse.Namespace) -> Dict[str, Any]:
+    from fakes import VectorServiceStandIn
+
+    report: Dict[str, Any] = {"size": size, "dimension": options.dimension, "k": options.k}
+    limits = {"chroma": options.chroma_max_size, "remote": options.remote_max_size}
+    context = multiprocessing.get_context("spawn")
+    exact: Optional[List[List[str]]] = None
+    for backend in ["numpy"] + [backend for backend in options.backends if backend != "numpy"]:
+        if size > limits.get(backend, size):
+            report[backend] = None
+            continue
+        stand_in, remote_url = None, None
+        if backend == "remote":
+            stand_in = VectorServiceStandIn(options.dimension, latency=options.remote_latency)
+            remote_url = stand_in.start()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(bench_backend, backend, size, options, remote_url).result()
+        if stand_in is not None:
+            result["http_requests"] = stand_in.requests
+            stand_in.stop()
+        results = result.pop("results")
+        # NumPy search is exact: the reference for every backend's recall
+        exact = exact or results
+        result["recall"] = recall(exact, results)
+        if backend in options.backends:
+            report[backend] = result
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--search-ef", type=int, default=100, help="Chroma's hnsw:search_ef")
+    parser.add_argument("--chroma-max-size", type=int, default=1_000_000,
+                        help="skip Chroma above this size (its build dominates the run time)")
+    parser.add_argument("--remote-max-size", type=int, default=100_000,
+                        help="skip the remote stand-in above this size (upserts travel as JSON)")
+    parser.add_argument("--remote-latency", type=float, default=0.0, help="stand-in seconds per request")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    for size in options.sizes:
+        print(json.dumps(run(size, options)))
+
+
+if __name__ == "__main__":
+    main()
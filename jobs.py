@@ -0,0 +1,110 @@
+import math
+import time
+import uuid
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import REGISTRY
+from ttl_cache import TTLCache
+
+QUEUE_DEPTH = REGISTRY.gauge("medimate_job_queue_depth", "Jobs waiting for a worker.")
+JOB_WAIT = REGISTRY.histogram("medimate_job_wait_seconds", "Time a job waited in the queue before starting.")
+JOB_RUN = REGISTRY.histogram("medimate_job_run_seconds", "Time a job took to run.")
+JOBS = REGISTRY.counter("medimate_jobs_total", "Jobs by outcome.", ["outcome"])
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full; retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Bounded background job runner.
+    At most `max_queued` jobs wait for one of `workers` threads; further
+    submissions are rejected with QueueFull. Finished jobs stay pollable for
+    `result_ttl` seconds. Jobs live in this process only.
+    """
+
+    def __init__(self, workers: int, max_queued: int, result_ttl: float, max_results: int = 10_000):
+        self.workers = workers
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queued)
+        self._jobs = TTLCache(max_entries=max_results, ttl=result_ttl)
+        self._tasks: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        # Recent run times, for the retry hint handed to rejected clients
+        self._recent_runs: List[float] = []
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            for number in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, task: Callable[[], Any]) -> str:
+        """Queues `task` and returns its job id."""
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "status": "queued", "submitted_at": time.time()}
+        with self._lock:
+            self._tasks[job_id] = task
+            self._jobs.set(job_id, job)
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                self._tasks.pop(job_id, None)
+                self._jobs.pop(job_id)
+            JOBS.inc(outcome="rejected")
+            raise QueueFull(self.retry_after())
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status of a job (and its result or error once finished), or None if unknown."""
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        with self._lock:
+            average_run = sum(self._recent_runs) / len(self._recent_runs) if self._recent_runs else 1.0
+        return max(1, math.ceil(average_run * self._queue.qsize() / self.workers))
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            QUEUE_DEPTH.set(self._queue.qsize())
+            with self._lock:
+                task = self._tasks.pop(job_id, None)
+            job = self._jobs.get(job_id)
+            if task is None or job is None:
+                continue
+
+            started = time.time()
+            JOB_WAIT.observe(started - job["submitted_at"])
+            job.update(status="running", started_at=started)
+            try:
+                job.update(status="done", result=task())
+                JOBS.inc(outcome="completed")
+            except Exception as e:
+                job.update(status="failed", error=str(e))
+                JOBS.inc(outcome="failed")
+            finished = time.time()
+            job["finished_at"] = finished
+            # Keep the result pollable for a full TTL from now
+            self._jobs.set(job_id, job)
+            JOB_RUN.observe(finished - started)
+            with self._lock:
+                self._recent_runs = (self._recent_runs + [finished - started])[-50:]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "max_queued": self._queue.maxsize,
+            "retry_after": self.retry_after(),
+        }
@@ -0,0 +1,110 @@
+"""
+Throughput of the multi-worker serving mode against local fakes.
+
+Each worker is a separate process (as under gunicorn) that imports app2,
+swaps its external resources for fakes with the given latencies and serves
+requests from several threads through the Flask test client.
+
+    python loadtest.py --workers 1 2 4 --threads 8 --duration 10
+"""
+import os
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from typing import Any, Dict
+
+PDF_PATH = "prescription.pdf"
+
+
+def run_worker(args: Dict[str, Any], results: "multiprocessing.Queue") -> None:
+    # Fakes must be installed before anything builds the real clients
+    os.environ["WARM_UP_ON_START"] = "0"
+    import app2
+    from fakes import install_fake_backends
+
+    install_fake_backends(
+        app2,
+        llm_latency=args["llm_latency"],
+        embedding_latency=args["embedding_latency"],
+        mongo_latency=args["mongo_latency"],
+    )
+    # Every upload should run the full pipeline, not hit the result cache
+    app2.result_cache.max_entries = 0
+    with open(PDF_PATH, "rb") as file:
+        pdf_bytes = file.read()
+
+    client = app2.app.test_client()
+    deadline = time.monotonic() + args["duration"]
+    counts = {"ok": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def serve(thread_number: int) -> None:
+        import io
+        sent = 0
+        while time.monotonic() < deadline:
+            sent += 1
+            if args["pdf_every"] and sent % args["pdf_every"] == 0:
+                response = client.post("/chat", data={"pdf_file": (io.BytesIO(pdf_bytes), PDF_PATH)})
+            else:
+                response = client.post("/chat", json={
+                    "question": "I have a mild fever, what should I do?",
+                    "session_id": f"{os.getpid()}-{thread_number}",
+                })
+            with counts_lock:
+                counts["ok" if response.status_code == 200 else "failed"] += 1
+
+    threads = [threading.Thread(target=serve, args=(number,)) for number in range(args["threads"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(counts)
+
+
+def run(workers: int, args: Dict[str, Any]) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(args, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    counts = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    ok = sum(count["ok"] for count in counts)
+    return {
+        "workers": workers,
+        "threads_per_worker": args["threads"],
+        "requests": ok,
+        "failed": sum(count["failed"] for count in counts),
+        "throughput_rps": round(ok / args["duration"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--mongo-latency", type=float, default=0.005)
+    parser.add_argument("--pdf-every", type=int, default=5, help="every Nth request uploads the PDF; 0 disables")
+    options = parser.parse_args()
+
+    args = {
+        "threads": options.threads,
+        "duration": options.duration,
+        "llm_latency": options.llm_latency,
+        "embedding_latency": options.embedding_latency,
+        "mongo_latency": options.mongo_latency,
+        "pdf_every": options.pdf_every,
+    }
+    for workers in options.workers:
+        print(json.dumps(run(workers, args)))
+
+
+if __name__ == "__main__":
+    main()
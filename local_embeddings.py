@@ -0,0 +1,124 @@
+from typing import Any, List
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+# Texts vectorized per NumPy batch; bounds the size of the intermediate arrays
+DEFAULT_BATCH_SIZE = 4096
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Base class for in-process embedders that vectorize a whole batch of texts
+    into one L2-normalized float32 matrix. `embed_matrix` is the fast path;
+    the langchain methods convert its rows to lists.
+    """
+
+    model = "local"
+    batch_size = DEFAULT_BATCH_SIZE
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        batches = [
+            self._embed_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        matrix = np.vstack(batches) if batches else np.zeros((0, self.dimension), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_matrix([text])[0].tolist()
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+
+class HashedNgramEmbeddings(LocalEmbeddings):
+    """
+    Character n-gram feature hashing, fully vectorized.
+    A batch is packed into one byte array; the hashes of every n-gram of every
+    text are computed with array arithmetic and accumulated with one bincount,
+    so there is no per-n-gram Python work. Texts sharing spelling land close
+    together, which suits drug names and their misspellings.
+    """
+
+    def __init__(self, dimension: int = 512, ngram_sizes: tuple = (3, 4, 5), batch_size: int = DEFAULT_BATCH_SIZE):
+        self._dimension = dimension
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.batch_size = batch_size
+        self.model = f"hashed-ngrams-{dimension}-{'-'.join(map(str, self.ngram_sizes))}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        # Texts are lowercased, padded with spaces (so n-grams mark word edges)
+        # and separated by NUL bytes, which no n-gram may span
+        encoded = [f" {text.lower()} ".encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(data) + 1 for data in encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8).astype(np.uint64)
+        owner = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+        counts = np.zeros(len(texts) * self._dimension, dtype=np.float64)
+        for size in self.ngram_sizes:
+            windows = len(data) - size + 1
+            if windows <= 0:
+                continue
+            hashes = np.zeros(windows, dtype=np.uint64)
+            spans_separator = np.zeros(windows, dtype=bool)
+            for offset in range(size):
+                window = data[offset:offset + windows]
+                # FNV-style mixing; uint64 arithmetic wraps around
+                hashes = (hashes ^ window) * np.uint64(1099511628211)
+                spans_separator |= window == 0
+            hashes ^= np.uint64(size)
+            keep = ~spans_separator
+            hashes = hashes[keep]
+            buckets = (hashes >> np.uint64(1)) % np.uint64(self._dimension)
+            signs = np.where(hashes & np.uint64(1), 1.0, -1.0)
+            flat = owner[:windows][keep] * self._dimension + buckets.astype(np.int64)
+            counts += np.bincount(flat, weights=signs, minlength=counts.size)
+        return counts.reshape(len(texts), self._dimension).astype(np.float32)
+
+
+class SpacyEmbeddings(LocalEmbeddings):
+    """
+    Averaged word vectors of a spaCy model (as backend/app.py uses), computed
+    with `nlp.pipe` over batches and with every pipeline component disabled,
+    since only tokenization and the static vectors are needed.
+    """
+
+    def __init__(self, model: str = "en_core_web_md", batch_size: int = 1024):
+        try:
+            import spacy
+        except ImportError as e:
+            raise ImportError("The spacy embedding backend needs `pip install spacy` and its model.") from e
+        self.nlp = spacy.load(model)
+        self.model = f"spacy-{model}"
+        self.batch_size = batch_size
+
+    @property
+    def dimension(self) -> int:
+        return self.nlp.vocab.vectors_length
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        with self.nlp.select_pipes(disable=self.nlp.pipe_names):
+            docs = self.nlp.pipe(texts, batch_size=self.batch_size)
+            return np.vstack([doc.vector for doc in docs]).astype(np.float32)
+
+
+def create_local_embeddings(backend: str, **options: Any) -> LocalEmbeddings:
+    """Builds the local embedder named `backend` ("hashed" or "spacy")."""
+    if backend == "hashed":
+        return HashedNgramEmbeddings(dimension=options.get("dimension", 512))
+    if backend == "spacy":
+        return SpacyEmbeddings(model=options.get("spacy_model", "en_core_web_md"))
+    raise ValueError(f"Unknown local embedding backend: {backend!r}")
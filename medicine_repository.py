@@ -0,0 +1,84 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ttl_cache import TTLCache
+
+INTEGER_ID_PATTERN = re.compile(r"-?[1-9]\d*|0")
+
+
+def mongo_id_values(med_id: str) -> List[Any]:
+    """
+    `_id` values a Mongo document with index id `med_id` may have. Index ids
+    are strings (catalog_index.record_id), while catalogs may key records by
+    int or ObjectId.
+    """
+    values: List[Any] = [med_id]
+    if INTEGER_ID_PATTERN.fullmatch(med_id):
+        values.append(int(med_id))
+    elif len(med_id) == 24:
+        from bson import ObjectId
+
+        if ObjectId.is_valid(med_id):
+            values.append(ObjectId(med_id))
+    return values
+
+
+class MedicineRepository:
+    """
+    Read-through access to full medicine documents.
+    Documents come from the Mongo collection (one batched `$in` query for all
+    cache misses) or, when Mongo only mirrors medicines.json, straight from
+    the preloaded catalog. Ids are matched as strings, like the index ids
+    they come from, so a catalog keyed by ints or ObjectIds is still found.
+    Results keep the order of the requested ids. `retry`, if given, wraps each Mongo query (e.g. to retry transient errors).
+    """
+
+    def __init__(
+        self,
+        collection: Any = None,
+        catalog: Optional[List[Dict[str, Any]]] = None,
+        ttl: Optional[float] = 300,
+        max_entries: int = 10_000,
+        retry: Optional[Callable[[Callable[[], Any]], Any]] = None,
+    ):
+        if collection is None and catalog is None:
+            raise ValueError("MedicineRepository needs a Mongo collection or a catalog.")
+        self.collection = collection
+        self.catalog = (
+            {str(medicine["_id"]): medicine for medicine in catalog if "_id" in medicine}
+            if collection is None else None
+        )
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.retry = retry or (lambda call: call())
+
+    def get_many(self, ids: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Fetches documents for `ids` in the given order, skipping unknown ids."""
+        ordered_ids = list(dict.fromkeys(str(med_id) for med_id in ids))
+        if self.catalog is not None:
+            return [self.catalog[med_id] for med_id in ordered_ids if med_id in self.catalog]
+
+        found = {}
+        missing = []
+        for med_id in ordered_ids:
+            medicine = self.cache.get(med_id)
+            if medicine is None:
+                missing.append(med_id)
+            else:
+                found[med_id] = medicine
+
+        if missing:
+            values = [value for med_id in missing for value in mongo_id_values(med_id)]
+            documents = self.retry(lambda: list(self.collection.find({"_id": {"$in": values}})))
+            for medicine in documents:
+                self.cache.set(str(medicine["_id"]), medicine)
+                found[str(medicine["_id"])] = medicine
+
+        return [found[med_id] for med_id in ordered_ids if med_id in found]
+
+    def invalidate(self, ids: Optional[Iterable[Any]] = None) -> None:
+        """Forgets cached documents for `ids`, or every cached document when no ids are given."""
+        if ids is None:
+            self.cache.clear()
+            return
+        for med_id in ids:
+            self.cache.pop(str(med_id))
@@ -0,0 +1,206 @@
+import re
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+# A prescribed strength such as "500mg" or "2.5 ml"; every prescribed item carries one
+STRENGTH_PATTERN = re.compile(r"\b\d+(\.\d+)?\s*(mg|mcg|g|ml|iu|units?)\b", re.IGNORECASE)
+
+UNIT_WORDS = {"mg", "mcg", "g", "ml", "iu", "unit", "units"}
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+# Separators between names in a free-text list of medicines, and list markers ("-", "2.")
+NAME_SEPARATOR_PATTERN = re.compile(r"[\n,;]|\band\b", re.IGNORECASE)
+LIST_MARKER_PATTERN = re.compile(r"^(?:[-*\u2022]|\d+[.)])\s*")
+
+# How many other words may sit between a medicine name and its strength
+# (e.g. a salt or dosage form: "Amoxicillin Trihydrate Cap 250mg")
+STRENGTH_MAX_GAP_WORDS = 2
+
+
+def normalize(text: str) -> Tuple[str, List[int]]:
+    """
+    Lower-cases `text` and collapses every run of non-alphanumeric characters
+    into one space. Also returns, for each normalized character, its offset in
+    the original text.
+    """
+    chars, offsets = [], []
+    pending_space = False
+    for offset, char in enumerate(text):
+        if char.isalnum():
+            if pending_space and chars:
+                chars.append(" ")
+                offsets.append(offset - 1)
+            chars.append(char.lower())
+            offsets.append(offset)
+            pending_space = False
+        else:
+            pending_space = True
+    return "".join(chars), offsets
+
+
+def split_medicine_names(text: str) -> List[str]:
+    """
+    Splits a free-text list of medicines (the extraction answer, say
+    "The medicines are: 1. Paracetamol 500mg, Ibuprofen and Cetirizine")
+    into individual names, in order and without repeats.
+    """
+    names: Dict[str, str] = {}
+    for line in text.splitlines():
+        # Drop a lead-in such as "The prescribed medicines are:"
+        lead_in, colon, rest = line.partition(":")
+        if colon and len(lead_in.split()) > 2:
+            line = rest
+        for part in NAME_SEPARATOR_PATTERN.split(line):
+            name = LIST_MARKER_PATTERN.sub("", part.strip()).strip(" .")
+            key, _ = normalize(name)
+            if key and key not in names:
+                names[key] = name
+    return list(names.values())
+
+
+class MedicineScanner:
+    """
+    Aho-Corasick automaton over normalized catalog names.
+    `scan` finds every whole-word catalog name in a text in a single pass.
+    """
+
+    def __init__(self, names: Dict[str, Any]):
+        # Trie as parallel lists: goto transitions, failure links, and the
+        # (pattern length, name) outputs ending at each state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        self._ids: Dict[str, Any] = {}
+
+        for name, med_id in names.items():
+            pattern, _ = normalize(name)
+            if pattern:
+                self._add(pattern, name)
+                self._ids[name] = med_id
+        self._build_failure_links()
+
+    @classmethod
+    def from_catalog(cls, medicines: List[Dict[str, Any]]) -> "MedicineScanner":
+        return cls({medicine["name"]: medicine.get("_id") for medicine in medicines if medicine.get("name")})
+
+    def _add(self, pattern: str, name: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), name))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Returns whole-word catalog names found in `text`, in order of appearance,
+        with `start`/`end` offsets into the original text. Where names overlap
+        the longest one wins.
+        """
+        normalized, offsets = normalize(text)
+        candidates = []
+        state = 0
+        for position, char in enumerate(normalized):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, name in self._out[state]:
+                start = position - length + 1
+                at_word_start = start == 0 or normalized[start - 1] == " "
+                at_word_end = position + 1 == len(normalized) or normalized[position + 1] == " "
+                if at_word_start and at_word_end:
+                    candidates.append((start, position + 1, name))
+
+        matches = []
+        last_end = 0
+        for start, end, name in sorted(candidates, key=lambda match: (match[0], -match[1])):
+            if start < last_end:
+                continue
+            matches.append({
+                "name": name,
+                "_id": self._ids[name],
+                "start": offsets[start],
+                "end": offsets[end - 1] + 1,
+            })
+            last_end = end
+        return matches
+
+    def confidence(self, text: str, matches: List[Dict[str, Any]]) -> float:
+        """
+        Share of prescribed strengths ("500mg", "5 ml", ...) that directly follow
+        a matched name, i.e. how many prescribed items the scan accounts for.
+        Zero when the text has no strengths or a matched name has none: a name
+        without a dose may be an allergy, a history entry or a warning rather
+        than a prescription, which only the LLM can tell.
+        """
+        prescribed, strengths = self.prescribed(text, matches)
+        return prescription_confidence(len(matches), len(prescribed), strengths)
+
+    def prescribed(self, text: str, matches: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        The matches directly followed by their own strength, and the number of
+        strengths in `text`. A strength belongs to the nearest name before it,
+        at most STRENGTH_MAX_GAP_WORDS words away.
+        """
+        strengths = [strength.start() for strength in STRENGTH_PATTERN.finditer(text)]
+
+        prescribed = []
+        for match, next_match in zip(matches, matches[1:] + [None]):
+            following = [position for position in strengths if position >= match["end"]]
+            if not following or (next_match is not None and next_match["start"] < following[0]):
+                continue
+            gap = text[match["end"]:following[0]]
+            gap_words = [word for word in WORD_PATTERN.findall(gap) if word.lower() not in UNIT_WORDS]
+            if len(gap_words) <= STRENGTH_MAX_GAP_WORDS:
+                prescribed.append(match)
+        return prescribed, len(strengths)
+
+
+def prescription_confidence(names: int, prescribed: int, strengths: int) -> float:
+    """MedicineScanner.confidence from the counts of matched names, those with a strength and strengths."""
+    if not strengths or prescribed < names:
+        return 0.0
+    return prescribed / strengths
+
+
+class DocumentScan:
+    """
+    Scan of a document fed page by page, so its pages need not be kept: the
+    prescribed names found so far, in order, and the confidence over all pages.
+    """
+
+    def __init__(self, scanner: MedicineScanner):
+        self.scanner = scanner
+        self.names: Dict[str, None] = {}
+        self.matches = 0
+        self.prescribed = 0
+        self.strengths = 0
+
+    def add(self, text: str) -> None:
+        matches = self.scanner.scan(text)
+        prescribed, strengths = self.scanner.prescribed(text, matches)
+        self.matches += len(matches)
+        self.prescribed += len(prescribed)
+        self.strengths += strengths
+        self.names.update(dict.fromkeys(match["name"] for match in prescribed))
+
+    def confidence(self) -> float:
+        """MedicineScanner.confidence of the pages added so far."""
+        return prescription_confidence(self.matches, self.prescribed, self.strengths)
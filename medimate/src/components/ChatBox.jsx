@@ -9,6 +9,8 @@ function ChatBox({ conversation, setConversation, formatTime }) {
     const conversationRef = useRef();
     const [selectedFile, setSelectedFile] = useState(null);
     const fileInputRef = useRef(null);
+    // Conversation id issued by the backend with the first answer; sent back so it keeps the context
+    const sessionIdRef = useRef(null);
 
     const [placeholders, setPlaceholders] = useState([
         "📅 Schedule an appointment",
@@ -53,7 +55,7 @@ function ChatBox({ conversation, setConversation, formatTime }) {
         try {
             const response = await fetch('http://127.0.0.1:5000/chat', {
                 method: 'POST',
-                body: JSON.stringify({ question: curr_ques }),
+                body: JSON.stringify({ question: curr_ques, session_id: sessionIdRef.current }),
                 headers: {
                     'Content-Type': 'application/json',
                 },
@@ -68,6 +70,10 @@ function ChatBox({ conversation, setConversation, formatTime }) {
                     { text: '⚠️ Invalid response!!', type: 'Bot', time: formatTime() },
                 ]);
             } else {
+                if (data.session_id) {
+                    sessionIdRef.current = data.session_id;
+                }
+
                 const newMessage = {
                     text: data.message,
                     type: 'Bot',
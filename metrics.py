@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import atexit
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metric:
+    """A named metric with optional labels; one value per distinct label set."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+                self._values[key] = state
+            state["count"] += 1
+            state["sum"] += value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+
+    def samples(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return {key: {"count": state["count"], "sum": state["sum"], "buckets": list(state["buckets"])}
+                    for key, state in self._values.items()}
+
+
+class Registry:
+    """Process-wide collection of metrics, created on first use."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._shared_directory: Optional[str] = None
+
+    def _get_or_create(self, cls, name: str, description: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, description, labelnames)
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, description, labelnames,
+                                   buckets=buckets or DEFAULT_BUCKETS)
+
+    def share(self, directory: str, interval: float = 5.0) -> None:
+        """
+        Shares this process's metrics with the other processes of a multi-process
+        server (gunicorn workers) through `directory`: a thread writes them to a
+        file of their own every `interval` seconds, and `snapshot` and
+        `render_prometheus` add in the files of the other processes, so a scrape of
+        any one worker reports the whole server, up to `interval` seconds behind.
+        Gauges of processes that have exited are left out.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._shared_directory = directory
+        path = os.path.join(directory, f"{os.getpid()}.json")
+
+        def write_forever() -> None:
+            while True:
+                time.sleep(interval)
+                self.dump(path)
+
+        self.dump(path)
+        threading.Thread(target=write_forever, name="metrics-share", daemon=True).start()
+        atexit.register(self.dump, path)
+
+    def dump(self, path: str) -> None:
+        """Writes every metric of this process to `path` as JSON, replacing it atomically."""
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self._export(), file)
+        os.replace(temporary, path)
+
+    def _export(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                "kind": metric.kind,
+                "description": metric.description,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(key), value] for key, value in metric.samples().items()],
+            }
+            for metric in metrics
+        }
+
+    def _collect(self) -> Dict[str, Dict[str, Any]]:
+        """Every metric with its samples by label values, summed over the processes sharing metrics."""
+        collected = self._export()
+        directory = self._shared_directory
+        if directory is not None:
+            own = f"{os.getpid()}.json"
+            for name in os.listdir(directory):
+                if not name.endswith(".json") or name == own:
+                    continue
+                try:
+                    with open(os.path.join(directory, name)) as file:
+                        exported = json.load(file)
+                except (OSError, ValueError):
+                    continue
+                alive = _process_alive(int(name[:-len(".json")]))
+                for metric_name, metric in exported.items():
+                    if metric["kind"] == "gauge" and not alive:
+                        continue
+                    collected.setdefault(metric_name, {**metric, "samples": []})["samples"].extend(metric["samples"])
+        for metric in collected.values():
+            merged: Dict[Tuple[str, ...], Any] = {}
+            for key, value in metric["samples"]:
+                key = tuple(key)
+                merged[key] = _add_samples(merged[key], value) if key in merged else value
+            metric["samples"] = merged
+        return collected
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view of every metric, keyed by name then by label values."""
+        return {
+            name: {",".join(key) or "": value for key, value in metric["samples"].items()}
+            for name, metric in self._collect().items()
+        }
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, metric in self._collect().items():
+            lines.append(f"# HELP {name} {_escape(metric['description'], quote=False)}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            for key, value in sorted(metric["samples"].items()):
+                labels = list(zip(metric["labelnames"], key))
+                if metric["kind"] == "histogram":
+                    # Bucket counts are already cumulative
+                    for bound, count in zip(metric["buckets"], value["buckets"]):
+                        lines.append(_sample(f"{name}_bucket", labels + [("le", repr(float(bound)))], count))
+                    lines.append(_sample(f"{name}_bucket", labels + [("le", "+Inf")], value["count"]))
+                    lines.append(_sample(f"{name}_sum", labels, value["sum"]))
+                    lines.append(_sample(f"{name}_count", labels, value["count"]))
+                else:
+                    lines.append(_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _add_samples(first: Any, second: Any) -> Any:
+    if isinstance(first, dict):
+        return {
+            "count": first["count"] + second["count"],
+            "sum": first["sum"] + second["sum"],
+            "buckets": [a + b for a, b in zip(first["buckets"], second["buckets"])],
+        }
+    return first + second
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(text: str, quote: bool = True) -> str:
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def _sample(name: str, labels: Sequence[Tuple[str, str]], value: float) -> str:
+    if labels:
+        name += "{" + ",".join(f'{label}="{_escape(str(label_value))}"' for label, label_value in labels) + "}"
+    return f"{name} {value}"
+
+
+REGISTRY = Registry()
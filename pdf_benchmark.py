@@ -0,0 +1,100 @@
+"""
+Long-PDF benchmark: page text extraction in the request thread against the
+process pool, and chunk embedding in one request against concurrent batches.
+
+PDFs are generated locally (fakes.synthetic_pdf) for each page count. The
+chunks are those of the prescription pipeline (app2.split_prescription_pages),
+embedded through CachedEmbeddings by a fake embedder whose requests take
+`--embedding-latency` plus `--latency-per-text` per text. Reports the median
+time of each step over `--repeat` runs and the speedups.
+
+    python pdf_benchmark.py --pages 1 8 16 32 50 --processes 4 --concurrency 4
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Callable, List
+
+from embedding_cache import CachedEmbeddings
+from fakes import FakeEmbeddings, synthetic_pdf
+from pdf_ingest import iter_pdf_pages
+
+
+def median_ms(call: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="*", default=[1, 8, 16, 32, 50])
+    parser.add_argument("--lines-per-page", type=int, default=45)
+    parser.add_argument("--processes", type=int, default=4, help="page extraction processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding requests at a time")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="fake seconds per embedding request")
+    parser.add_argument("--latency-per-text", type=float, default=0.002, help="fake seconds per embedded text")
+    parser.add_argument("--repeat", type=int, default=3)
+    options = parser.parse_args()
+
+    os.environ["WARM_UP_ON_START"] = "0"
+    with redirect_stdout(sys.stderr):
+        import app2
+
+    pool = ProcessPoolExecutor(max_workers=options.processes, mp_context=multiprocessing.get_context("spawn"))
+    # Start the processes before timing anything
+    list(pool.map(int, range(options.processes)))
+
+    def extract(data: bytes, **parallel: Any) -> List[Any]:
+        return list(iter_pdf_pages(io.BytesIO(data), "synthetic.pdf", max_pages=max(options.pages), **parallel))
+
+    def embed(texts: List[str], **batching: Any) -> None:
+        embedder = FakeEmbeddings(latency=options.embedding_latency, latency_per_text=options.latency_per_text)
+        CachedEmbeddings(embedder, cache_path=":memory:", **batching).embed_documents(texts)
+
+    results = []
+    for page_count in options.pages:
+        data = synthetic_pdf(page_count, lines_per_page=options.lines_per_page, seed=page_count)
+        pages = extract(data)
+        parallel_pages = extract(data, pool=pool, tasks=options.processes, min_parallel_pages=1)
+        if [page.page_content for page in pages] != [page.page_content for page in parallel_pages]:
+            raise AssertionError(f"Pages of the {page_count}-page PDF differ between serial and pooled extraction.")
+        texts = [chunk.page_content for chunk in app2.split_prescription_pages(pages)]
+
+        extract_serial = median_ms(lambda: extract(data), options.repeat)
+        extract_pool = median_ms(
+            lambda: extract(data, pool=pool, tasks=options.processes, min_parallel_pages=1), options.repeat
+        )
+        embed_serial = median_ms(lambda: embed(texts), options.repeat)
+        embed_concurrent = median_ms(
+            lambda: embed(texts, batch_size=options.batch_size, max_concurrency=options.concurrency), options.repeat
+        )
+        results.append({
+            "pages": page_count,
+            "chunks": len(texts),
+            "extract_serial_ms": extract_serial,
+            "extract_pool_ms": extract_pool,
+            "extract_speedup": round(extract_serial / extract_pool, 2),
+            "embed_serial_ms": embed_serial,
+            "embed_concurrent_ms": embed_concurrent,
+            "embed_speedup": round(embed_serial / embed_concurrent, 2),
+            "total_speedup": round((extract_serial + embed_serial) / (extract_pool + embed_concurrent), 2),
+        })
+    pool.shutdown()
+
+    print(json.dumps({"config": vars(options), "cpus": multiprocessing.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
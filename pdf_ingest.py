@@ -0,0 +1,71 @@
+import io
+import math
+import hashlib
+from concurrent.futures import Executor
+from typing import IO, Iterator, List, Optional
+
+from pypdf import PdfReader
+from langchain.schema import Document
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class PdfLimitExceeded(Exception):
+    """Raised when an uploaded PDF is larger than the configured size or page limit."""
+
+
+def hash_upload(stream: IO[bytes], max_bytes: int) -> str:
+    """
+    Reads an uploaded file chunk by chunk and returns its SHA-256 hex digest,
+    leaving the stream rewound for parsing.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(READ_CHUNK_BYTES), b""):
+        size += len(chunk)
+        if size > max_bytes:
+            raise PdfLimitExceeded(f"PDF is larger than the {max_bytes} byte limit.")
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def extract_page_texts(data: bytes, start: int, stop: int) -> List[str]:
+    """Text of pages `start` to `stop` (exclusive) of the PDF in `data`; runs in pool processes."""
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[page_number].extract_text() for page_number in range(start, stop)]
+
+
+def iter_pdf_pages(stream: IO[bytes], source: str, max_pages: int, pool: Optional[Executor] = None,
+                   tasks: int = 1, min_parallel_pages: int = 8) -> Iterator[Document]:
+    """
+    Parses a PDF straight from a file-like object and yields one document per
+    page, in page order. Metadata matches PyPDFLoader's (`source`, `page`).
+    PDFs of at least `min_parallel_pages` pages have their text extracted in
+    `pool` (a process pool), split into `tasks` contiguous page ranges; others
+    are extracted here, each page only when it is requested.
+    """
+    reader = PdfReader(stream)
+    page_count = len(reader.pages)
+    if page_count > max_pages:
+        raise PdfLimitExceeded(f"PDF has {page_count} pages; the limit is {max_pages}.")
+
+    if pool is None or tasks < 2 or page_count < min_parallel_pages:
+        for page_number in range(page_count):
+            yield Document(
+                page_content=reader.pages[page_number].extract_text(),
+                metadata={"source": source, "page": page_number},
+            )
+        return
+
+    stream.seek(0)
+    data = stream.read()
+    pages_per_task = math.ceil(page_count / tasks)
+    futures = [
+        (start, pool.submit(extract_page_texts, data, start, min(start + pages_per_task, page_count)))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    for start, future in futures:
+        for offset, text in enumerate(future.result()):
+            yield Document(page_content=text, metadata={"source": source, "page": start + offset})
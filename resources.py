@@ -0,0 +1,125 @@
+import os
+import time
+import importlib
+import threading
+from typing import Any, Callable, Dict, Generic, Optional, Sequence, TypeVar
+
+from retries import backoff_delay
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """
+    Process-local singleton built on first use.
+    Initialization is thread-safe and happens at most once per process; a
+    forked worker (e.g. under gunicorn) builds its own instance instead of
+    reusing sockets or clients inherited from its parent.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._value
+        with self._lock:
+            if self._pid != pid:
+                self._value = self.factory()
+                self._pid = pid
+        return self._value
+
+    def override(self, value: T) -> None:
+        """Replaces the resource in this process, e.g. with a local fake."""
+        with self._lock:
+            self._value = value
+            self._pid = os.getpid()
+
+    def reset(self) -> None:
+        """Forgets the resource so the next `get` rebuilds it."""
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+    @property
+    def initialized(self) -> bool:
+        return self._pid == os.getpid()
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.initialized else "pending"
+        return f"<LazyResource {self.name} ({state})>"
+
+
+class WarmUp:
+    """
+    Builds lazy resources (and imports slow modules) on a background thread,
+    recording how long each step took so cold-start regressions are visible.
+    A step that fails (say, a transient OpenAI error) is retried with jittered
+    exponential backoff up to `retry_max_delay` apart until it succeeds, since
+    a worker that is not ready gets no requests to build it on demand.
+    """
+
+    def __init__(self, resources: Sequence[LazyResource], modules: Sequence[str] = (),
+                 retry_base_delay: float = 0.5, retry_max_delay: float = 60.0):
+        self.resources = list(resources)
+        self.modules = list(modules)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.failures = 0
+        self.timings: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def _timed(self, phase: str, step: Callable[[], Any]) -> None:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                step()
+                break
+            except Exception as e:
+                # Requests still build whatever is missing on demand meanwhile
+                self.state = "retrying"
+                self.error = f"{phase}: {e}"
+                self.failures += 1
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                print(f"Startup: {phase} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+        self.state = "running"
+        self.timings[phase] = time.perf_counter() - started
+        print(f"Startup: {phase} ready in {self.timings[phase]:.2f}s")
+
+    def run(self) -> None:
+        self.state = "running"
+        started = time.perf_counter()
+        for module in self.modules:
+            self._timed(f"import {module}", lambda: importlib.import_module(module))
+        for resource in self.resources:
+            self._timed(resource.name, resource.get)
+        self.error = None
+        self.timings["total"] = time.perf_counter() - started
+        self.state = "done"
+        print(f"Startup: warm-up finished in {self.timings['total']:.2f}s")
+
+    def status(self) -> Dict[str, Any]:
+        resources = {resource.name: resource.initialized for resource in self.resources}
+        return {
+            "ready": all(resources.values()),
+            "warm_up": self.state,
+            "error": self.error,
+            "failures": self.failures,
+            "resources": resources,
+            "timings": {phase: round(seconds, 3) for phase, seconds in self.timings.items()},
+        }
@@ -0,0 +1,81 @@
+import time
+import random
+from typing import Any, Callable, Tuple, Type, TypeVar
+
+from metrics import REGISTRY
+
+T = TypeVar("T")
+
+RETRIES = REGISTRY.counter("medimate_external_retries_total", "Retried calls to external services.", ["target"])
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    "Full jitter" backoff: a random delay up to base_delay * 2**attempt
+    (capped at max_delay), so clients that failed together retry apart.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retries(function: Callable[[], T], attempts: int, retryable: Tuple[Type[BaseException], ...],
+                      target: str, base_delay: float = 0.2, max_delay: float = 5.0) -> T:
+    """Calls `function`, retrying `retryable` errors up to `attempts` calls in total."""
+    for attempt in range(attempts):
+        try:
+            return function()
+        except retryable:
+            if attempt + 1 >= attempts:
+                raise
+            RETRIES.inc(target=target)
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    raise ValueError("attempts must be at least 1.")
+
+
+def pooled_session(target: str, pool_size: int, retries: int, base_delay: float, max_delay: float) -> Any:
+    """
+    A requests session for all calls to one API, keeping up to `pool_size`
+    connections alive per host. Connection failures and RETRY_STATUS_CODES
+    responses are retried up to `retries` times with jittered exponential
+    backoff, honouring Retry-After. Read timeouts are not retried, since the
+    request (an LLM completion, say) may already be running upstream.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class SharedSession(requests.Session):
+        # openai "refreshes" the session of each thread every few minutes by
+        # closing it; that would drop the connections every thread shares
+        def close(self) -> None:
+            pass
+
+    class JitteredRetry(Retry):
+        def get_backoff_time(self) -> float:
+            # Same backoff as call_with_retries; urllib3 would retry the first failure at once
+            return backoff_delay(len(self.history) - 1, base_delay, max_delay) if self.history else 0.0
+
+        def increment(self, *args: Any, **kwargs: Any) -> Retry:
+            retry = super().increment(*args, **kwargs)
+            RETRIES.inc(target=target)
+            return retry
+
+    retry = JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        # Completions and embeddings are POSTs
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        # Hand the last error response back, so the client raises its own error
+        raise_on_status=False,
+    )
+    session = SharedSession()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
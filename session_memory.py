@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain.memory import ConversationBufferMemory
+from langchain.schema.messages import BaseMessage
+
+from token_usage import count_tokens
+from ttl_cache import TTLCache
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class BoundedConversationMemory(ConversationBufferMemory):
+    """
+    Conversation buffer capped at `max_tokens`.
+    The first `preamble_messages` messages (the bot instructions) are always kept;
+    after that the oldest turns are dropped until the history fits, but the
+    latest turn is never dropped.
+    """
+
+    max_tokens: int = 2000
+    preamble_messages: int = 2
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self.prune()
+
+    def prune(self) -> None:
+        messages = self.chat_memory.messages
+        preamble = messages[:self.preamble_messages]
+        history = messages[self.preamble_messages:]
+        budget = self.max_tokens - count_message_tokens(preamble)
+
+        # Drop whole turns (human + AI message) from the oldest end
+        while len(history) > 2 and count_message_tokens(history) > budget:
+            history = history[2:]
+        self.chat_memory.messages = preamble + history
+
+    def is_new(self) -> bool:
+        """True until the first turn after the preamble is saved."""
+        return len(self.chat_memory.messages) <= self.preamble_messages
+
+    def token_count(self) -> int:
+        return count_message_tokens(self.chat_memory.messages)
+
+
+class SessionMemoryStore:
+    """
+    Conversation memories keyed by session id.
+    Holds at most `max_sessions` sessions, evicting the least recently used one,
+    and forgets sessions idle for longer than `idle_timeout` seconds.
+    """
+
+    def __init__(self, memory_factory: Callable[[], ConversationBufferMemory],
+                 max_sessions: int, idle_timeout: Optional[float]):
+        self.memory_factory = memory_factory
+        self.sessions = TTLCache(max_entries=max_sessions, ttl=idle_timeout, sliding=True)
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: str) -> Tuple[ConversationBufferMemory, threading.Lock]:
+        with self._lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                entry = (self.memory_factory(), threading.Lock())
+                self.sessions.set(session_id, entry)
+            return entry
+
+    def get(self, session_id: str) -> ConversationBufferMemory:
+        """Returns the memory for `session_id`, starting a new session if needed."""
+        return self._entry(session_id)[0]
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[ConversationBufferMemory]:
+        """
+        Yields the memory for `session_id` while holding that session's lock, so
+        concurrent requests of one session take turns while other sessions run freely.
+        """
+        memory, session_lock = self._entry(session_id)
+        with session_lock:
+            yield memory
+
+    def end(self, session_id: str) -> None:
+        self.sessions.pop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        self.sessions.purge_expired()
+        return self.sessions.stats()
@@ -0,0 +1,51 @@
+import queue
+import threading
+from typing import Any, Dict, Iterator, Tuple
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.chains.base import Chain
+
+# Sentinel kinds put on the token queue alongside "token"
+DONE = "done"
+ERROR = "error"
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Forwards every new LLM token onto a queue."""
+
+    def __init__(self, token_queue: "queue.Queue[Tuple[str, Any]]"):
+        self.token_queue = token_queue
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.token_queue.put(("token", token))
+
+
+def stream_prediction(chain: Chain, inputs: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Runs `chain.predict` on a background thread and yields ("token", text) events
+    as the LLM produces them, then ("done", answer) or ("error", message).
+    The chain runs to completion normally, so its memory records the final answer.
+    """
+    token_queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+    handler = QueueCallbackHandler(token_queue)
+
+    def run() -> None:
+        try:
+            answer = chain.predict(callbacks=[handler], **inputs)
+            token_queue.put((DONE, answer))
+        except Exception as e:
+            token_queue.put((ERROR, str(e)))
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+
+    try:
+        while True:
+            kind, value = token_queue.get()
+            yield kind, value
+            if kind in (DONE, ERROR):
+                return
+    finally:
+        # Even if the client goes away, let the chain finish writing its memory
+        # before the caller releases anything it holds for this prediction
+        worker.join()
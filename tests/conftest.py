@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app's modules live flat in the repository root
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture(scope="session")
+def app2():
+    """app2 with every external service replaced by the fakes, as benchmark.py runs it."""
+    os.environ["WARM_UP_ON_START"] = "0"
+    os.environ["ADMISSION_ENABLED"] = "0"
+    os.environ.setdefault("MEDICINES_FILE", os.path.join(REPO_ROOT, "medicines.json"))
+    os.environ.setdefault("MEDICINE_INDEX_BACKEND", "memory")
+    import app2 as app_module
+    from fakes import install_fake_backends
+
+    install_fake_backends(app_module)
+    return app_module
+
+
+@pytest.fixture
+def client(app2):
+    return app2.app.test_client()
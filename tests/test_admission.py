@@ -0,0 +1,72 @@
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_requests_within_budget_are_admitted():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=0)
+
+    controller.admit("alice", 300, "question")
+    controller.admit("alice", 300, "question")
+
+    assert controller.stats()["admitted"] == 2
+
+
+def test_client_over_budget_is_shed_with_retry_after():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=0)
+    controller.admit("alice", 600, "question")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("alice", 60, "question")
+
+    # 60 tokens refill in 6s at 600 tokens per minute
+    assert rejected.value.retry_after == 6
+    assert controller.stats()["shed"] == 1
+
+
+def test_clients_have_separate_budgets():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=0)
+    controller.admit("alice", 600, "question")
+
+    controller.admit("bob", 600, "question")
+
+    assert controller.stats()["clients"] == 2
+
+
+def test_global_budget_is_shared_by_all_clients():
+    controller = AdmissionController(global_tokens_per_minute=600, client_tokens_per_minute=600, max_wait=0)
+    controller.admit("alice", 600, "question")
+
+    with pytest.raises(AdmissionRejected):
+        controller.admit("bob", 60, "question")
+
+
+def test_short_waits_are_queued():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=1)
+    controller.admit("alice", 600, "question")
+
+    # 5 tokens refill in 0.5s, within max_wait
+    controller.admit("alice", 5, "question")
+
+    stats = controller.stats()
+    assert (stats["admitted"], stats["queued"], stats["shed"]) == (1, 1, 0)
+
+
+def test_queued_requests_reserve_their_tokens():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=1)
+    controller.admit("alice", 600, "question")
+    controller.admit("alice", 5, "question")
+
+    # The queued request already took the refill, so the next one waits longer
+    with pytest.raises(AdmissionRejected):
+        controller.admit("alice", 15, "question")
+
+
+def test_requests_larger_than_the_budget_need_a_full_bucket():
+    controller = AdmissionController(global_tokens_per_minute=6000, client_tokens_per_minute=600, max_wait=0)
+
+    controller.admit("alice", 10_000, "batch")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("alice", 10_000, "batch")
+    assert rejected.value.retry_after == 60
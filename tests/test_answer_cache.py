@@ -0,0 +1,115 @@
+from typing import List
+
+import pytest
+from langchain.schema.embeddings import Embeddings
+
+from answer_cache import SemanticAnswerCache
+from medicine_scanner import MedicineScanner
+
+SCANNER = MedicineScanner.from_catalog([{"_id": "1", "name": "Warfarin"}, {"_id": "2", "name": "Metformin"},
+                                        {"_id": "3", "name": "Ibuprofen"}])
+
+
+class SameVectorEmbeddings(Embeddings):
+    """Embeds every text as the same vector, so only the cache's other rules tell questions apart."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+
+def medicine_names(text: str) -> List[str]:
+    return [match["name"] for match in SCANNER.scan(text)]
+
+
+@pytest.fixture
+def semantic_cache():
+    return SemanticAnswerCache(SameVectorEmbeddings(), threshold=0.9, medicine_names=medicine_names)
+
+
+def test_exact_matching_ignores_case_punctuation_and_filler_words():
+    cache = SemanticAnswerCache()
+    cache.set("Can I take ibuprofen?", "answer")
+
+    assert cache.get("Hi, can I take Ibuprofen") == "answer"
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_exact_matching_is_the_default():
+    cache = SemanticAnswerCache()
+    cache.set("I am pregnant, can I take ibuprofen?", "answer")
+
+    assert cache.get("I am not pregnant, can I take ibuprofen?") is None
+    assert cache.get("I'm pregnant, may I take ibuprofen?") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_semantic_match_with_the_same_terms(semantic_cache):
+    semantic_cache.set("I am pregnant, can I take ibuprofen?", "answer")
+
+    assert semantic_cache.get("I'm pregnant, may I take ibuprofen?") == "answer"
+    assert semantic_cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_match_needs_the_same_negations(semantic_cache):
+    semantic_cache.set("I am pregnant, can I take ibuprofen?", "answer")
+
+    assert semantic_cache.get("I am not pregnant, can I take ibuprofen?") is None
+    assert semantic_cache.get("I'm pregnant, can't I take ibuprofen?") is None
+
+
+def test_semantic_match_needs_the_same_medicines(semantic_cache):
+    semantic_cache.set("Can I drink alcohol while taking warfarin?", "answer")
+
+    assert semantic_cache.get("Can I drink alcohol while taking metformin?") is None
+    assert semantic_cache.get("Can I drink alcohol while taking warfarin and ibuprofen?") is None
+
+
+def test_semantic_match_needs_the_same_numbers(semantic_cache):
+    semantic_cache.set("Is 400 mg of ibuprofen safe?", "answer")
+
+    assert semantic_cache.get("Is 800 mg of ibuprofen safe?") is None
+
+
+def test_semantic_match_needs_the_threshold():
+    cache = SemanticAnswerCache(SameVectorEmbeddings(), threshold=1.1, medicine_names=medicine_names)
+    cache.set("Can I take ibuprofen?", "answer")
+
+    assert cache.get("May I take ibuprofen?") is None
+
+
+def test_exact_mode_never_embeds():
+    embedding = SameVectorEmbeddings()
+    cache = SemanticAnswerCache(embedding)
+    cache.set("Can I take ibuprofen?", "answer")
+
+    assert cache.get("May I take ibuprofen?") is None
+    assert embedding.calls == 0
+
+
+def test_entries_expire():
+    cache = SemanticAnswerCache(ttl=0)
+    cache.set("Can I take ibuprofen?", "answer")
+
+    assert cache.get("Can I take ibuprofen?") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.set("first question", "1")
+    cache.set("second question", "2")
+    cache.get("first question")
+
+    cache.set("third question", "3")
+
+    assert cache.get("second question") is None
+    assert cache.get("first question") == "1"
+    assert cache.get("third question") == "3"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,71 @@
+import json
+
+from catalog_index import open_numpy_catalog_index, record_hash, record_id, sync_catalog_index
+from fakes import FakeEmbeddings
+from vector_store import InMemoryVectorStore
+
+CATALOG = [
+    {"_id": 1, "name": "Paracetamol", "details": "Pain reliever"},
+    {"_id": 2, "name": "Ibuprofen", "details": "NSAID"},
+    {"_id": 3, "name": "Amoxicillin", "details": "Antibiotic"},
+]
+
+
+def test_first_sync_adds_every_record():
+    store = InMemoryVectorStore()
+
+    counts = sync_catalog_index(store, FakeEmbeddings(size=16), CATALOG)
+
+    assert counts == {"added": 3, "updated": 0, "deleted": 0, "unchanged": 0, "upsert_calls": 1}
+    assert store.hashes() == {record_id(medicine): record_hash(medicine) for medicine in CATALOG}
+
+
+def test_resync_embeds_only_changed_records():
+    store = InMemoryVectorStore()
+    sync_catalog_index(store, FakeEmbeddings(size=16), CATALOG)
+    embedding = FakeEmbeddings(size=16)
+    changed = dict(CATALOG[0], details="Fever and pain reliever")
+    added = {"_id": 4, "name": "Cetirizine", "details": "Antihistamine"}
+
+    counts = sync_catalog_index(store, embedding, [changed, CATALOG[1], added])
+
+    assert counts == {"added": 1, "updated": 1, "deleted": 1, "unchanged": 1, "upsert_calls": 1}
+    assert embedding.texts_embedded == 2
+    assert store.hashes() == {
+        "1": record_hash(changed), "2": record_hash(CATALOG[1]), "4": record_hash(added)
+    }
+    [[(best_id, _)]] = store.query([FakeEmbeddings(size=16).embed_query(json.dumps(changed))], 1)
+    assert best_id == "1"
+
+
+def test_unchanged_catalog_embeds_nothing():
+    store = InMemoryVectorStore()
+    sync_catalog_index(store, FakeEmbeddings(size=16), CATALOG)
+    embedding = FakeEmbeddings(size=16)
+
+    counts = sync_catalog_index(store, embedding, list(reversed(CATALOG)))
+
+    assert counts == {"added": 0, "updated": 0, "deleted": 0, "unchanged": 3, "upsert_calls": 0}
+    assert embedding.calls == 0
+
+
+def test_sync_embeds_in_batches():
+    store = InMemoryVectorStore()
+    embedding = FakeEmbeddings(size=16)
+
+    sync_catalog_index(store, embedding, CATALOG, batch_size=2)
+
+    assert embedding.calls == 2
+    assert len(store) == 3
+
+
+def test_numpy_index_is_rebuilt_only_when_the_catalog_changes(tmp_path, capsys):
+    directory = str(tmp_path)
+
+    open_numpy_catalog_index(directory, FakeEmbeddings(size=16), CATALOG)
+    index = open_numpy_catalog_index(directory, FakeEmbeddings(size=16), CATALOG)
+    changed = open_numpy_catalog_index(directory, FakeEmbeddings(size=16), CATALOG[:2])
+
+    output = capsys.readouterr().out
+    assert output.count("rebuilt") == 2 and output.count("loaded") == 1
+    assert len(index) == 3 and len(changed) == 2
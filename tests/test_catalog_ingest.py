@@ -0,0 +1,85 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from catalog_ingest import ingest_catalog, iter_catalog_records, iter_json_array
+from fakes import FakeEmbeddings, FakeMongoCollection
+from vector_index import NumpyIndexWriter, NumpyVectorIndex
+
+RECORDS = [
+    {"_id": "1", "name": "Paracetamol", "details": "Pain reliever, fever reducer [OTC]"},
+    {"_id": 2, "name": "Ibuprofen", "details": "NSAID \"400mg\" tablets\nwith food"},
+    {"_id": "3", "name": "Amoxicillin", "details": "Antibiotic", "strengths": [250, 500]},
+]
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 64, 1024 * 1024])
+def test_values_split_across_reads_are_parsed_whole(read_size):
+    text = " [\n" + ",\n  ".join(json.dumps(record) for record in RECORDS) + "\n] \n"
+
+    assert list(iter_json_array(io.StringIO(text), read_size=read_size)) == RECORDS
+
+
+@pytest.mark.parametrize("text, values", [
+    ("[]", []),
+    ("[1,2,3]", [1, 2, 3]),
+    ('["a]b", "c,d", {"e": [1, "]"]}]', ["a]b", "c,d", {"e": [1, "]"]}]),
+])
+def test_scalars_and_brackets_inside_strings(text, values):
+    assert list(iter_json_array(io.StringIO(text), read_size=2)) == values
+
+
+@pytest.mark.parametrize("text", ['[{"_id": "1"}, {"_id": "2"}', '[{"_id": "1"}, {"_id": "2"', "["])
+def test_missing_closing_bracket_is_an_error(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size=4))
+
+
+@pytest.mark.parametrize("text", ['{"_id": "1"}', '[{"_id": "1"} {"_id": ]'])
+def test_invalid_catalog_json_is_an_error(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size=4))
+
+
+def test_json_lines_skip_blank_lines(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in RECORDS[:2]) + "\n\n" + json.dumps(RECORDS[2]) + "\n")
+
+    assert list(iter_catalog_records(str(path))) == RECORDS
+
+
+def test_json_array_file_is_streamed(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(RECORDS, indent=2))
+
+    assert list(iter_catalog_records(str(path))) == RECORDS
+
+
+def test_ingest_upserts_batches_and_builds_the_index(tmp_path):
+    collection = FakeMongoCollection()
+    embedding = FakeEmbeddings()
+    index = NumpyIndexWriter(str(tmp_path))
+
+    stats = ingest_catalog(RECORDS, collection, index, embedding, batch_size=2)
+    index.close({"catalog": stats["catalog"]})
+
+    assert (stats["records"], stats["batches"], stats["upserted"], stats["matched"]) == (3, 2, 3, 0)
+    assert collection.round_trips == 2
+    assert collection.documents[2] == RECORDS[1]
+    loaded = NumpyVectorIndex.load(str(tmp_path))
+    assert list(loaded.ids) == ["1", "2", "3"]
+    assert np.allclose(loaded.vectors[2], embedding.embed_documents([json.dumps(RECORDS[2])])[0])
+
+
+def test_reingesting_matches_by_id_and_counts_changes():
+    collection = FakeMongoCollection()
+    first = ingest_catalog(RECORDS, collection, batch_size=10)
+
+    changed = [RECORDS[0], {**RECORDS[1], "details": "NSAID"}, RECORDS[2]]
+    second = ingest_catalog(changed, collection, batch_size=10)
+
+    assert (second["upserted"], second["matched"], second["modified"]) == (0, 3, 1)
+    assert collection.documents[2]["details"] == "NSAID"
+    assert second["catalog"] != first["catalog"]
@@ -0,0 +1,69 @@
+import os
+import json
+
+from conftest import REPO_ROOT
+from metrics import REGISTRY
+
+
+def test_question_starts_a_session_and_continues_it(app2, client):
+    first = client.post("/chat", json={"question": "I have had a sore throat since Monday"})
+    session_id = first.get_json()["session_id"]
+
+    assert first.status_code == 200
+    assert first.headers["X-Session-Id"] == session_id
+
+    second = client.post("/chat", json={"question": "It got worse today", "session_id": session_id})
+
+    assert second.get_json()["session_id"] == session_id
+    history = app2.session_store.get().get(session_id).chat_memory.messages
+    assert [message.content for message in history[-4::2]] == [
+        "I have had a sore throat since Monday", "It got worse today"
+    ]
+
+
+def test_session_id_header_continues_a_session(app2, client):
+    session_id = client.post("/chat", json={"question": "My child has a rash"}).get_json()["session_id"]
+
+    response = client.post("/chat", json={"question": "Should I see a doctor?"}, headers={"X-Session-Id": session_id})
+
+    assert response.get_json()["session_id"] == session_id
+    assert not app2.session_store.get().get(session_id).is_new()
+
+
+def test_prescription_upload_times_parsing_scanning_and_chunking_separately(client):
+    with open(os.path.join(REPO_ROOT, "prescription.pdf"), "rb") as pdf:
+        response = client.post("/chat", data={"pdf_file": (pdf, "prescription.pdf")})
+
+    assert response.status_code == 200
+    stages = [entry.split(";")[0].strip() for entry in response.headers["Server-Timing"].split(",")]
+    assert {"pdf_parse", "scan", "split"} <= set(stages)
+
+
+def server_sent_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def time_to_first_token_count() -> int:
+    return REGISTRY.snapshot()["medimate_chat_time_to_first_token_seconds"].get("", {"count": 0})["count"]
+
+
+def test_stream_sends_tokens_then_the_answer_and_remembers_it(app2, client):
+    answer = app2.chat_llm.get().responses[0]
+    first_tokens_before = time_to_first_token_count()
+
+    response = client.post("/chat/stream", json={"question": "What should I do about a fever?"})
+    events = server_sent_events(response.get_data(as_text=True))
+
+    assert response.mimetype == "text/event-stream"
+    session_id = response.headers["X-Session-Id"]
+    tokens = [data["token"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == answer
+    assert events[-1] == ("done", {"message": answer, "session_id": session_id})
+    history = app2.session_store.get().get(session_id).chat_memory.messages
+    assert [message.content for message in history[-2:]] == ["What should I do about a fever?", answer]
+    assert time_to_first_token_count() == first_tokens_before + 1
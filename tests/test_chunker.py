@@ -0,0 +1,58 @@
+import random
+
+import pytest
+from langchain.schema import Document
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from chunker import ChunkDeduplicator, PrescriptionChunker
+
+
+def two_pass(pages):
+    char_splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=50, length_function=len)
+    recursive_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=20)
+    return recursive_splitter.split_documents(char_splitter.split_documents(pages))
+
+
+def random_line(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.1:
+        return ""
+    if kind < 0.15:
+        return " " * rng.randint(1, 5)
+    if kind < 0.2:
+        # Unbroken runs longer than either chunk size
+        return "x" * rng.randint(400, 1500)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(rng.randint(1, 12)))
+        for _ in range(rng.randint(1, 200))
+    ]
+    line = " ".join(words)
+    if rng.random() < 0.2:
+        line = line.replace(" ", "  ", rng.randint(1, 3))
+    if rng.random() < 0.2:
+        line = " " + line + " "
+    return line
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_single_pass_matches_the_two_splitters(seed):
+    rng = random.Random(seed)
+    pages = [
+        Document(page_content="\n".join(random_line(rng) for _ in range(rng.randint(0, 40))), metadata={"page": page})
+        for page in range(rng.randint(1, 3))
+    ]
+
+    expected = two_pass(pages)
+    chunks = list(PrescriptionChunker(chunk_size=1000, chunk_overlap=50, separator="\n",
+                                      sub_chunk_size=500, sub_chunk_overlap=20).split_documents(pages))
+
+    assert [(chunk.page_content, chunk.metadata) for chunk in chunks] == \
+        [(chunk.page_content, chunk.metadata) for chunk in expected]
+
+
+def test_deduplicator_skips_repeated_chunks_across_pages():
+    pages = [Document(page_content="Tab Dolo 650\nTwice daily"), Document(page_content="tab  dolo 650\ntwice DAILY")]
+
+    chunks = list(PrescriptionChunker().split_documents(pages, deduplicator=ChunkDeduplicator()))
+
+    assert [chunk.page_content for chunk in chunks] == ["Tab Dolo 650\nTwice daily"]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from embedding_cache import CachedEmbeddings
+from fakes import FakeEmbeddings
+
+
+@pytest.fixture
+def backend():
+    return FakeEmbeddings(size=16)
+
+
+def cached(backend, tmp_path, **options):
+    return CachedEmbeddings(backend, str(tmp_path / "embeddings.sqlite"), **options)
+
+
+def test_cached_vectors_match_the_backend(backend, tmp_path):
+    embeddings = cached(backend, tmp_path)
+    texts = ["paracetamol 500mg", "ibuprofen 200mg"]
+
+    assert np.allclose(embeddings.embed_documents(texts), FakeEmbeddings(size=16).embed_documents(texts))
+    assert np.allclose(embeddings.embed_query(texts[0]), FakeEmbeddings(size=16).embed_query(texts[0]))
+
+
+def test_only_missing_texts_are_embedded(backend, tmp_path):
+    embeddings = cached(backend, tmp_path)
+    embeddings.embed_documents(["a", "b"])
+
+    embeddings.embed_documents(["b", "c", "c"])
+
+    assert backend.texts_embedded == 3
+    assert embeddings.stats()["hits"] == 2
+    assert embeddings.stats()["misses"] == 3
+
+
+def test_cache_persists_across_instances(backend, tmp_path):
+    cached(backend, tmp_path).embed_documents(["a", "b"])
+
+    embeddings = cached(backend, tmp_path)
+    embeddings.embed_documents(["a", "b"])
+
+    assert backend.calls == 1
+    assert embeddings.stats()["hit_ratio"] == 1.0
+
+
+def test_texts_within_the_batch_size_go_in_one_request(backend, tmp_path):
+    embeddings = cached(backend, tmp_path, batch_size=32, max_concurrency=4)
+
+    embeddings.embed_documents([f"medicine {number}" for number in range(3)])
+    embeddings.embed_documents([f"dose {number}" for number in range(32)])
+
+    assert backend.calls == 2
+
+
+def test_larger_sets_are_split_into_batches_in_order(backend, tmp_path):
+    embeddings = cached(backend, tmp_path, batch_size=32, max_concurrency=4)
+    texts = [f"chunk {number}" for number in range(100)]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert backend.calls == 4
+    assert np.allclose(vectors, FakeEmbeddings(size=16).embed_documents(texts))
+
+
+def test_sequential_batches_without_concurrency(backend, tmp_path):
+    embeddings = cached(backend, tmp_path, batch_size=32)
+
+    embeddings.embed_documents([f"chunk {number}" for number in range(65)])
+
+    assert backend.calls == 3
+
+
+def test_least_recently_used_entries_are_evicted(backend, tmp_path):
+    embeddings = cached(backend, tmp_path, max_entries=2)
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["b"])
+    embeddings.embed_query("a")
+
+    embeddings.embed_documents(["c"])
+    embeddings.embed_documents(["a", "c"])
+
+    assert embeddings.stats()["entries"] == 2
+    assert embeddings.stats()["evictions"] == 1
+    assert backend.texts_embedded == 3
@@ -0,0 +1,77 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import ttl_cache
+from jobs import JobQueue, QueueFull
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_moves_from_queued_to_running_to_done():
+    release = threading.Event()
+    jobs = JobQueue(workers=1, max_queued=2, result_ttl=60)
+    first = jobs.submit(lambda: release.wait(5) and "first")
+    second = jobs.submit(lambda: {"medicines": ["Paracetamol"]})
+
+    wait_for(lambda: jobs.get(first)["status"] == "running")
+    assert jobs.get(second)["status"] == "queued"
+
+    release.set()
+    wait_for(lambda: jobs.get(second)["status"] == "done")
+    assert jobs.get(first)["result"] == "first"
+    job = jobs.get(second)
+    assert job["result"] == {"medicines": ["Paracetamol"]}
+    assert job["submitted_at"] <= job["started_at"] <= job["finished_at"]
+
+
+def test_failed_job_keeps_its_error():
+    def task():
+        raise RuntimeError("PDF has no pages")
+
+    jobs = JobQueue(workers=1, max_queued=1, result_ttl=60)
+    job_id = jobs.submit(task)
+
+    wait_for(lambda: jobs.get(job_id)["status"] == "failed")
+    job = jobs.get(job_id)
+    assert job["error"] == "PDF has no pages"
+    assert "result" not in job
+
+
+def test_full_queue_rejects_with_a_retry_hint():
+    release = threading.Event()
+    jobs = JobQueue(workers=1, max_queued=1, result_ttl=60)
+    running = jobs.submit(lambda: release.wait(5))
+    wait_for(lambda: jobs.get(running)["status"] == "running")
+    queued = jobs.submit(lambda: None)
+
+    with pytest.raises(QueueFull) as rejected:
+        jobs.submit(lambda: None)
+
+    assert rejected.value.retry_after >= 1
+    assert jobs.stats()["queued"] == 1
+    release.set()
+    wait_for(lambda: jobs.get(queued)["status"] == "done")
+    # A slot is free again
+    jobs.submit(lambda: None)
+
+
+def test_finished_jobs_expire_after_the_result_ttl(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    jobs = JobQueue(workers=1, max_queued=1, result_ttl=30)
+    job_id = jobs.submit(lambda: "ok")
+    wait_for(lambda: jobs.get(job_id)["status"] == "done")
+
+    clock.now += 29
+    assert jobs.get(job_id)["result"] == "ok"
+    clock.now += 2
+    assert jobs.get(job_id) is None
+    assert jobs.get("no-such-job") is None
@@ -0,0 +1,58 @@
+from bson import ObjectId
+
+from fakes import FakeMongoCollection
+from medicine_repository import MedicineRepository, mongo_id_values
+
+OBJECT_ID = ObjectId()
+DOCUMENTS = [
+    {"_id": 1, "name": "Paracetamol"},
+    {"_id": OBJECT_ID, "name": "Ibuprofen"},
+    {"_id": "amoxicillin", "name": "Amoxicillin"},
+]
+
+
+def test_mongo_id_values():
+    assert mongo_id_values("12") == ["12", 12]
+    assert mongo_id_values(str(OBJECT_ID)) == [str(OBJECT_ID), OBJECT_ID]
+    assert mongo_id_values("012") == ["012"]
+    assert mongo_id_values("amoxicillin") == ["amoxicillin"]
+
+
+def test_index_ids_find_documents_of_any_id_type_in_one_query():
+    collection = FakeMongoCollection(DOCUMENTS)
+    repository = MedicineRepository(collection)
+
+    medicines = repository.get_many(["amoxicillin", str(OBJECT_ID), "1", "missing"])
+
+    assert [medicine["name"] for medicine in medicines] == ["Amoxicillin", "Ibuprofen", "Paracetamol"]
+    assert collection.round_trips == 1
+
+
+def test_cached_documents_are_not_queried_again():
+    collection = FakeMongoCollection(DOCUMENTS)
+    repository = MedicineRepository(collection)
+    repository.get_many(["1", "amoxicillin"])
+
+    assert [medicine["name"] for medicine in repository.get_many([1, "amoxicillin"])] == ["Paracetamol", "Amoxicillin"]
+    assert collection.round_trips == 1
+
+
+def test_invalidated_documents_are_reloaded():
+    collection = FakeMongoCollection(DOCUMENTS)
+    repository = MedicineRepository(collection)
+    repository.get_many(["1", "amoxicillin"])
+    collection.documents[1] = {"_id": 1, "name": "Acetaminophen"}
+
+    repository.invalidate([1])
+
+    assert [medicine["name"] for medicine in repository.get_many(["1", "amoxicillin"])] == ["Acetaminophen", "Amoxicillin"]
+    assert collection.round_trips == 2
+    repository.invalidate()
+    repository.get_many(["amoxicillin"])
+    assert collection.round_trips == 3
+
+
+def test_catalog_repository_needs_no_collection():
+    repository = MedicineRepository(catalog=DOCUMENTS)
+
+    assert [medicine["name"] for medicine in repository.get_many(["1", str(OBJECT_ID)])] == ["Paracetamol", "Ibuprofen"]
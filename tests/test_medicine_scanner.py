@@ -0,0 +1,93 @@
+import pytest
+
+from medicine_scanner import DocumentScan, MedicineScanner, split_medicine_names
+
+SCANNER = MedicineScanner.from_catalog([
+    {"_id": "1", "name": "Amoxicillin"},
+    {"_id": "2", "name": "Aspirin"},
+    {"_id": "3", "name": "Ibuprofen"},
+    {"_id": "4", "name": "Paracetamol"},
+])
+
+
+def scan_document(*pages: str) -> DocumentScan:
+    scan = DocumentScan(SCANNER)
+    for page in pages:
+        scan.add(page)
+    return scan
+
+
+def test_prescribed_names_with_strengths_are_trusted():
+    scan = scan_document("Rx: Paracetamol 500mg twice daily\nIbuprofen 400 mg after meals")
+
+    assert list(scan.names) == ["Paracetamol", "Ibuprofen"]
+    assert scan.confidence() == 1.0
+
+
+def test_names_without_a_strength_are_not_reported_and_fall_back():
+    scan = scan_document("Rx: Amoxicillin 250mg three times daily. Known allergies: Aspirin, Ibuprofen.")
+
+    assert list(scan.names) == ["Amoxicillin"]
+    assert scan.confidence() == 0.0
+
+
+def test_text_without_strengths_falls_back():
+    scan = scan_document("Patient allergic to Aspirin. Tab Dolo 650 twice daily")
+
+    assert list(scan.names) == []
+    assert scan.confidence() == 0.0
+
+
+def test_a_strength_belongs_to_the_nearest_name():
+    text = "Allergies: Aspirin, Ibuprofen 400mg"
+    matches = SCANNER.scan(text)
+
+    prescribed, strengths = SCANNER.prescribed(text, matches)
+
+    assert [match["name"] for match in prescribed] == ["Ibuprofen"]
+    assert strengths == 1
+    assert SCANNER.confidence(text, matches) == 0.0
+
+
+def test_unknown_prescribed_items_lower_the_confidence():
+    scan = scan_document("Paracetamol 500mg", "Dolo 650 mg twice daily")
+
+    assert list(scan.names) == ["Paracetamol"]
+    assert scan.confidence() == pytest.approx(0.5)
+
+
+def test_scan_finds_whole_word_names_in_order_with_offsets():
+    text = "Tab. PARACETAMOL 500mg; ibuprofen-400 mg"
+
+    matches = SCANNER.scan(text)
+
+    assert [(match["name"], match["_id"]) for match in matches] == [("Paracetamol", "4"), ("Ibuprofen", "3")]
+    assert [text[match["start"]:match["end"]] for match in matches] == ["PARACETAMOL", "ibuprofen"]
+
+
+def test_scan_ignores_names_inside_other_words():
+    assert SCANNER.scan("Aspirinate and preamoxicillin") == []
+
+
+def test_scan_prefers_the_longest_overlapping_name():
+    scanner = MedicineScanner.from_catalog([{"name": "Vitamin"}, {"name": "Vitamin D3"}, {"name": "D3 Drops"}])
+
+    assert [match["name"] for match in scanner.scan("vitamin d3 drops daily")] == ["Vitamin D3"]
+
+
+def test_scan_finds_names_inside_a_longer_partial_match():
+    # "Forte" is only reached through the failure link of the "Amox Fortex" branch
+    scanner = MedicineScanner.from_catalog([{"name": "Amox Fortex"}, {"name": "Forte"}])
+
+    assert [match["name"] for match in scanner.scan("amox forte")] == ["Forte"]
+
+
+@pytest.mark.parametrize("text, names", [
+    ("The medicines are: 1. Paracetamol 500mg, Ibuprofen and Cetirizine",
+     ["Paracetamol 500mg", "Ibuprofen", "Cetirizine"]),
+    ("- Amoxicillin\n- Omeprazole;\n2) amoxicillin", ["Amoxicillin", "Omeprazole"]),
+    ("Dosage: 500mg", ["Dosage: 500mg"]),
+    ("", []),
+])
+def test_split_medicine_names(text, names):
+    assert split_medicine_names(text) == names
@@ -0,0 +1,34 @@
+import os
+import json
+
+from metrics import Registry
+
+
+def test_shared_metrics_add_up_the_other_processes(tmp_path):
+    worker = Registry()
+    worker.counter("requests_total", "Requests.", ["branch"]).inc(2, branch="pdf")
+    worker.histogram("request_seconds", "Latency.", buckets=(0.1, 1.0)).observe(0.5)
+    worker.gauge("queue_depth", "Queued jobs.").set(3)
+    # Another worker that is still running, and one that has exited (no such pid)
+    worker.dump(str(tmp_path / f"{os.getppid()}.json"))
+    worker.dump(str(tmp_path / "999999999.json"))
+
+    registry = Registry()
+    registry.counter("requests_total", "Requests.", ["branch"]).inc(branch="pdf")
+    registry.share(str(tmp_path), interval=60)
+    snapshot = registry.snapshot()
+
+    assert snapshot["requests_total"] == {"pdf": 5}
+    assert snapshot["request_seconds"][""] == {"count": 2, "sum": 1.0, "buckets": [0, 2]}
+    # The exited worker's gauge is left out
+    assert snapshot["queue_depth"] == {"": 3}
+    assert 'requests_total{branch="pdf"} 5' in registry.render_prometheus()
+
+
+def test_share_writes_this_process_metrics(tmp_path):
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs.").inc()
+    registry.share(str(tmp_path), interval=60)
+
+    with open(tmp_path / f"{os.getpid()}.json") as file:
+        assert json.load(file)["jobs_total"]["samples"] == [[[], 1]]
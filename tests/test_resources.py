@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+
+from resources import LazyResource, WarmUp
+
+
+class Flaky:
+    """Factory that fails its first `failures` calls."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("upstream unavailable")
+        return "client"
+
+
+def test_lazy_resource_is_built_once_per_process():
+    factory = Flaky(0)
+    resource = LazyResource("client", factory)
+
+    assert not resource.initialized
+    assert resource.get() == resource.get() == "client"
+    assert factory.calls == 1
+    assert resource._pid == os.getpid()
+
+
+def test_lazy_resource_override_and_reset():
+    factory = Flaky(0)
+    resource = LazyResource("client", factory)
+    resource.override("fake")
+
+    assert resource.get() == "fake"
+    resource.reset()
+    assert resource.get() == "client"
+
+
+def test_warm_up_builds_every_resource():
+    resources = [LazyResource("first", Flaky(0)), LazyResource("second", Flaky(0))]
+    warm_up = WarmUp(resources, modules=["json"])
+
+    warm_up.run()
+
+    status = warm_up.status()
+    assert status["ready"] and status["warm_up"] == "done"
+    assert set(status["timings"]) == {"import json", "first", "second", "total"}
+
+
+def test_warm_up_retries_failed_steps_until_they_succeed():
+    flaky = Flaky(2)
+    resources = [LazyResource("flaky", flaky), LazyResource("after", Flaky(0))]
+    warm_up = WarmUp(resources, retry_base_delay=0.001, retry_max_delay=0.01)
+
+    warm_up.run()
+
+    status = warm_up.status()
+    assert status["ready"] and status["warm_up"] == "done"
+    assert status["failures"] == 2 and status["error"] is None
+    assert flaky.calls == 3
+
+
+def test_status_reports_the_error_while_a_step_is_retrying():
+    available = threading.Event()
+
+    def factory() -> str:
+        if not available.is_set():
+            raise ConnectionError("upstream unavailable")
+        return "client"
+
+    warm_up = WarmUp([LazyResource("client", factory)], retry_base_delay=0.001, retry_max_delay=0.01)
+    warm_up.start()
+    deadline = time.monotonic() + 5
+    while warm_up.failures < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    status = warm_up.status()
+    assert not status["ready"] and status["warm_up"] == "retrying"
+    assert status["error"] == "client: upstream unavailable"
+
+    available.set()
+    warm_up._thread.join(5)
+    assert warm_up.status()["ready"]
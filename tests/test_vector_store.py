@@ -0,0 +1,124 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from fakes import VectorServiceStandIn
+from vector_store import (
+    DimensionMismatch, InMemoryVectorStore, RemoteVectorStore, open_chroma_store, upsert_batched
+)
+
+DIMENSION = 4
+
+
+def unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture(params=["memory", "chroma", "remote"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryVectorStore()
+    elif request.param == "chroma":
+        yield open_chroma_store(str(tmp_path), f"test_{uuid.uuid4().hex}")
+    else:
+        stand_in = VectorServiceStandIn(DIMENSION)
+        yield RemoteVectorStore(stand_in.start(), namespace="test")
+        stand_in.stop()
+
+
+def test_upsert_query_and_hashes(store):
+    vectors = np.stack([unit(1, 0, 0, 0), unit(0, 1, 0, 0), unit(0, 0, 1, 0)])
+    assert upsert_batched(store, ["a", "b", "c"], vectors, ["ha", "hb", "hc"]) == 1
+
+    assert len(store) == 3
+    assert store.dimension == DIMENSION
+    assert store.hashes() == {"a": "ha", "b": "hb", "c": "hc"}
+    [matches] = store.query(np.stack([unit(0.9, 0.1, 0, 0)]), 2)
+    assert [vector_id for vector_id, _ in matches] == ["a", "b"]
+    assert matches[0][1] == pytest.approx(float(unit(0.9, 0.1, 0, 0) @ unit(1, 0, 0, 0)), abs=1e-3)
+
+
+def test_upsert_replaces_vectors_and_hashes(store):
+    upsert_batched(store, ["a", "b"], np.stack([unit(1, 0, 0, 0), unit(0, 1, 0, 0)]), ["h1", "h1"])
+    upsert_batched(store, ["a"], np.stack([unit(0, 0, 0, 1)]), ["h2"])
+
+    assert len(store) == 2
+    assert store.hashes() == {"a": "h2", "b": "h1"}
+    [matches] = store.query(np.stack([unit(0, 0, 0, 1)]), 1)
+    assert matches[0][0] == "a"
+
+
+def test_delete(store):
+    upsert_batched(store, ["a", "b", "c"], np.eye(3, DIMENSION, dtype=np.float32), ["h", "h", "h"])
+    store.delete(["b", "missing"])
+
+    assert store.hashes() == {"a": "h", "c": "h"}
+    [matches] = store.query(np.stack([unit(0, 1, 0, 0)]), 2)
+    assert {vector_id for vector_id, _ in matches} == {"a", "c"}
+
+
+def test_dimension_mismatch(store):
+    upsert_batched(store, ["a"], np.stack([unit(1, 0, 0, 0)]), ["h"])
+
+    with pytest.raises(DimensionMismatch):
+        upsert_batched(store, ["b"], np.ones((1, DIMENSION - 1), dtype=np.float32), ["h"])
+    assert store.hashes() == {"a": "h"}
+
+
+def test_in_memory_store_reuses_deleted_rows():
+    store = InMemoryVectorStore(capacity=2)
+    upsert_batched(store, ["a", "b"], np.eye(2, DIMENSION, dtype=np.float32), ["h", "h"])
+    store.delete(["a"])
+    upsert_batched(store, ["c"], np.stack([unit(0, 0, 1, 0)]), ["h"])
+
+    assert len(store._vectors) == 2
+    assert set(store.fetch(["b", "c"])) == {"b", "c"}
+
+
+def test_upsert_batched_keeps_to_the_record_limit():
+    class LimitedStore(InMemoryVectorStore):
+        max_batch_records = 2
+        calls = 0
+
+        def upsert(self, ids, vectors, hashes):
+            assert len(ids) <= self.max_batch_records
+            self.calls += 1
+            super().upsert(ids, vectors, hashes)
+
+    store = LimitedStore()
+    vectors = np.random.default_rng(0).standard_normal((5, DIMENSION)).astype(np.float32)
+
+    assert upsert_batched(store, list("abcde"), vectors, ["h"] * 5) == 3
+    assert store.calls == 3
+    assert len(store) == 5
+    assert upsert_batched(store, [], np.zeros((0, DIMENSION), dtype=np.float32), []) == 0
+
+
+def test_remote_upserts_keep_to_the_service_limits():
+    stand_in = VectorServiceStandIn(DIMENSION)
+    store = RemoteVectorStore(stand_in.start(), namespace="test")
+    try:
+        count = 2 * VectorServiceStandIn.MAX_UPSERT_VECTORS + 1
+        vectors = np.random.default_rng(0).standard_normal((count, DIMENSION)).astype(np.float32)
+        ids = [f"med-{number}" for number in range(count)]
+
+        assert upsert_batched(store, ids, vectors, ["h"] * count) == 3
+        assert stand_in.upserts == 3
+        assert stand_in.largest_upsert_bytes <= VectorServiceStandIn.MAX_REQUEST_BYTES
+        assert len(store) == count
+        assert len(store.hashes()) == count
+    finally:
+        stand_in.stop()
+
+
+def test_remote_dimension_is_checked_before_the_first_upsert():
+    stand_in = VectorServiceStandIn(DIMENSION)
+    store = RemoteVectorStore(stand_in.start(), namespace="test")
+    try:
+        with pytest.raises(DimensionMismatch):
+            upsert_batched(store, ["a"], np.ones((1, DIMENSION + 1), dtype=np.float32), ["h"])
+        assert stand_in.upserts == 0
+    finally:
+        stand_in.stop()
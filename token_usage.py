@@ -0,0 +1,71 @@
+import threading
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import LLMResult
+from langchain.schema.messages import BaseMessage
+
+from metrics import REGISTRY
+
+LLM_TOKENS = REGISTRY.counter(
+    "medimate_llm_tokens_total", "LLM tokens by model role and kind (prompt or completion).", ["model", "kind"]
+)
+LLM_CALLS = REGISTRY.counter("medimate_llm_calls_total", "LLM calls by model role and outcome.", ["model", "outcome"])
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with the gpt-3.5-turbo encoding, or estimates ~4 chars/token if it cannot be loaded."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+                except Exception as e:
+                    print(f"Warning: tiktoken encoding unavailable ({e}); estimating token counts.")
+                    _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Counts prompt and completion tokens of every call of the model it is attached to.
+    Uses the usage the API reports, and tiktoken estimates when it reports none
+    (as with streaming responses).
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._prompt_tokens: Dict[UUID, int] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]],
+                            *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_tokens[run_id] = sum(
+            count_tokens(message.content) for batch in messages for message in batch
+        )
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_tokens[run_id] = sum(count_tokens(prompt) for prompt in prompts)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        estimated_prompt = self._prompt_tokens.pop(run_id, 0)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion = usage.get("completion_tokens")
+        if completion is None:
+            completion = sum(
+                count_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+        LLM_TOKENS.inc(usage.get("prompt_tokens", estimated_prompt), model=self.model, kind="prompt")
+        LLM_TOKENS.inc(completion, model=self.model, kind="completion")
+        LLM_CALLS.inc(model=self.model, outcome="ok")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_tokens.pop(run_id, None)
+        LLM_CALLS.inc(model=self.model, outcome="error")
@@ -0,0 +1,103 @@
+import re
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from metrics import REGISTRY
+
+STAGE_SECONDS = REGISTRY.histogram("medimate_stage_seconds", "Time spent in each pipeline stage.", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("medimate_stage_errors_total", "Pipeline stages that raised.", ["stage"])
+
+# Trace ids accepted from callers; anything else gets a fresh id
+TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """The spans recorded while handling one request."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id if trace_id and TRACE_ID_PATTERN.match(trace_id) else uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Spans as a Server-Timing header value (durations in milliseconds)."""
+        return ", ".join(f"{span['stage']};dur={span['seconds'] * 1000:.1f}" for span in self.spans)
+
+    def summary(self) -> str:
+        spans = " ".join(f"{span['stage']}={span['seconds']:.3f}s" for span in self.spans)
+        return f"trace {self.trace_id} took {self.elapsed():.3f}s: {spans or 'no spans'}"
+
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    """Starts a trace for the current request (thread or context) and returns it."""
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace() -> None:
+    _current_trace.set(None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_span(stage: str, seconds: float) -> None:
+    """Records `seconds` spent in stage `stage`, like a `span` that took that long."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append({"stage": stage, "seconds": seconds})
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times the enclosed block as pipeline stage `stage`: always into the
+    stage histogram, and into the current trace when there is one.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - started)
+
+
+class StageClock:
+    """
+    Time of stages that take turns, such as parsing, scanning and chunking the
+    pages of a streamed PDF: summed per stage, then recorded as one span each.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def record(self) -> None:
+        for stage, seconds in self.seconds.items():
+            record_span(stage, seconds)
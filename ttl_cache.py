@@ -0,0 +1,96 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU mapping whose entries expire after `ttl` seconds.
+    With `sliding=True` every read pushes the expiry forward, which turns the
+    TTL into an idle timeout.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float], sliding: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sliding = sliding
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _expiry(self) -> Optional[float]:
+        return time.monotonic() + self.ttl if self.ttl is not None else None
+
+    def _is_expired(self, expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._is_expired(entry[1], time.monotonic()):
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if self.sliding:
+                entry[1] = self._expiry()
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = [value, self._expiry()]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def purge_expired(self) -> int:
+        """Drops every expired entry; returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items()
+                       if self._is_expired(expires_at, now)]
+            for key in expired:
+                del self._entries[key]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry[1], time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
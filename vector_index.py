@@ -0,0 +1,198 @@
+import os
+import json
+import fcntl
+import shutil
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+# Block size when NumpyIndexWriter copies its scratch files into the index files
+COPY_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine top-k over one contiguous float32 matrix of unit vectors.
+    A query is a single matrix-vector product plus `argpartition`. Saved as
+    plain .npy files and reopened memory-mapped, so start-up only pages the
+    matrix in and worker processes on one host share its pages.
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, meta: Optional[Dict[str, Any]] = None):
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors.")
+        self.ids = ids
+        self.vectors = vectors
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, ids: Sequence[str], vectors: Any, meta: Optional[Dict[str, Any]] = None) -> "NumpyVectorIndex":
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        return cls(np.asarray(ids, dtype=str), normalize_rows(matrix), meta)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, directory: str) -> None:
+        """Writes the index files; each replaces its old version atomically."""
+        os.makedirs(directory, exist_ok=True)
+        for name, array in ((VECTORS_FILE, self.vectors), (IDS_FILE, self.ids)):
+            temporary = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+            with open(temporary, "wb") as file:
+                np.save(file, array, allow_pickle=False)
+            os.replace(temporary, os.path.join(directory, name))
+        _save_meta(directory, {**self.meta, "count": len(self), "dimension": self.dimension})
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Optional["NumpyVectorIndex"]:
+        """Opens a saved index (memory-mapped by default), or returns None if there is none."""
+        try:
+            with open(os.path.join(directory, META_FILE)) as file:
+                meta = json.load(file)
+            ids = np.load(os.path.join(directory, IDS_FILE), allow_pickle=False)
+            vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        except FileNotFoundError:
+            return None
+        if len(ids) != meta.get("count") or vectors.shape[0] != meta.get("count"):
+            # Files from different saves (a concurrent rebuild); treat as missing
+            return None
+        return cls(ids, vectors, meta)
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[str, float]]:
+        """The `k` nearest ids by cosine similarity, best first, with their scores."""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries: Any, k: int) -> List[List[Tuple[str, float]]]:
+        """
+        `search` for several queries at once: one matrix-matrix product and a
+        row-wise `argpartition`, returning the ranked matches of each query.
+        """
+        k = min(k, len(self))
+        if k <= 0 or not len(queries):
+            return [[] for _ in range(len(queries))]
+        scores = normalize_rows(queries) @ self.vectors.T
+        top, top_scores = top_k_rows(scores, k)
+        return [
+            [(str(self.ids[index]), float(score)) for index, score in zip(row, row_scores)]
+            for row, row_scores in zip(top, top_scores)
+        ]
+
+    # The query method of vector_store.VectorStore, which this read-only index serves too
+    query = search_many
+
+
+class NumpyIndexWriter:
+    """
+    Builds a saved index batch by batch in constant memory. Vectors and ids
+    are appended to scratch files as they arrive; `close` turns those into the
+    .npy files `NumpyVectorIndex.load` reads, copying block by block.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.count = 0
+        self.dimension: Optional[int] = None
+        self._id_length = 1
+        self._vectors_path = os.path.join(directory, f".vectors.{os.getpid()}.raw")
+        self._ids_path = os.path.join(directory, f".ids.{os.getpid()}.jsonl")
+        self._vectors = open(self._vectors_path, "wb")
+        self._ids = open(self._ids_path, "w", encoding="utf-8")
+
+    def add(self, ids: Sequence[str], vectors: Any) -> None:
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        elif matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vectors have dimension {matrix.shape[1]}; the index has {self.dimension}.")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._vectors.write((matrix / np.maximum(norms, 1e-12)).astype("<f4").tobytes())
+        for vector_id in ids:
+            vector_id = str(vector_id)
+            self._id_length = max(self._id_length, len(vector_id))
+            self._ids.write(json.dumps(vector_id) + "\n")
+        self.count += len(ids)
+
+    def close(self, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Writes the index files (each replacing its old version atomically) and removes the scratch files."""
+        self._vectors.close()
+        self._ids.close()
+        dimension = self.dimension or 1
+        try:
+            temporary = os.path.join(self.directory, f".{VECTORS_FILE}.{os.getpid()}.tmp")
+            with open(temporary, "wb") as target, open(self._vectors_path, "rb") as source:
+                np.lib.format.write_array_header_1_0(
+                    target, {"descr": "<f4", "fortran_order": False, "shape": (self.count, dimension)}
+                )
+                shutil.copyfileobj(source, target, COPY_BLOCK_BYTES)
+            os.replace(temporary, os.path.join(self.directory, VECTORS_FILE))
+
+            temporary = os.path.join(self.directory, f".{IDS_FILE}.{os.getpid()}.tmp")
+            ids = np.lib.format.open_memmap(temporary, mode="w+", dtype=f"<U{self._id_length}", shape=(self.count,))
+            rows = max(1, COPY_BLOCK_BYTES // ids.itemsize)
+            with open(self._ids_path, encoding="utf-8") as source:
+                for start in range(0, self.count, rows):
+                    block = [json.loads(source.readline()) for _ in range(min(rows, self.count - start))]
+                    ids[start:start + len(block)] = block
+            ids.flush()
+            del ids
+            os.replace(temporary, os.path.join(self.directory, IDS_FILE))
+
+            _save_meta(self.directory, {**(meta or {}), "count": self.count, "dimension": dimension})
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """Drops the scratch files without touching the saved index."""
+        self._vectors.close()
+        self._ids.close()
+        for path in (self._vectors_path, self._ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@contextmanager
+def index_lock(directory: str) -> Iterator[None]:
+    """
+    Holds an exclusive lock on the index in `directory` across processes, so
+    one of the workers sharing it checks and rebuilds it while the others wait
+    and then map the result.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def normalize_rows(vectors: Any) -> np.ndarray:
+    """`vectors` as a float32 matrix of unit rows."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix.reshape(len(matrix), -1)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the `k` highest scores of each row, best first (row-wise `argpartition`)."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _save_meta(directory: str, meta: Dict[str, Any]) -> None:
+    temporary = os.path.join(directory, f".{META_FILE}.{os.getpid()}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(meta, file)
+    os.replace(temporary, os.path.join(directory, META_FILE))
@@ -0,0 +1,353 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+
+from catalog_index import HASH_METADATA_KEY
+from vector_index import normalize_rows, top_k_rows
+
+Matches = List[List[Tuple[str, float]]]
+
+
+class DimensionMismatch(ValueError):
+    """Raised when vectors do not have the dimension of the store they are meant for."""
+
+
+class VectorStoreError(Exception):
+    """Raised when a remote vector service rejects a request."""
+
+
+class VectorStore:
+    """
+    Interface of the medicine index backends: unit vectors by id, each tagged
+    with the content hash of the record it embeds, searched by cosine similarity.
+    Write through `upsert_batched`, which checks the dimension and splits the
+    records into the largest batches the backend accepts per call.
+    """
+
+    # Most records and request bytes one upsert call may carry (None: no limit)
+    max_batch_records: Optional[int] = None
+    max_batch_bytes: Optional[int] = None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Dimension of the stored vectors, or None while the store cannot tell (it is empty)."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def hashes(self) -> Dict[str, Optional[str]]:
+        """Content hash of every stored id."""
+        raise NotImplementedError
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, hashes: Sequence[str]) -> None:
+        """Writes one batch of unit vectors, replacing those with the same ids."""
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def query(self, vectors: Any, k: int) -> Matches:
+        """The `k` nearest ids of each query vector, best first, with their cosine similarities."""
+        raise NotImplementedError
+
+    def record_bytes(self, dimension: int) -> int:
+        """Size of one record in an upsert call, for sizing batches by `max_batch_bytes`."""
+        return 4 * dimension + 256
+
+    def batch_size(self, dimension: int, records: int) -> int:
+        """Records per upsert call for `records` vectors of `dimension`."""
+        limits = [records]
+        if self.max_batch_records:
+            limits.append(self.max_batch_records)
+        if self.max_batch_bytes:
+            limits.append(self.max_batch_bytes // self.record_bytes(dimension))
+        return max(1, min(limits))
+
+
+def check_dimension(store: Any, dimension: int) -> None:
+    """Raises DimensionMismatch unless `store` (a VectorStore or NumpyVectorIndex) holds `dimension`-wide vectors."""
+    if store.dimension is not None and store.dimension != dimension:
+        raise DimensionMismatch(
+            f"The {type(store).__name__} holds {store.dimension}-dimension vectors, but the embedder "
+            f"produces {dimension}-dimension ones. Rebuild the index for this embedder, or use "
+            f"one created with {dimension} dimensions."
+        )
+
+
+def upsert_batched(store: VectorStore, ids: Sequence[str], vectors: Any, hashes: Sequence[str]) -> int:
+    """Upserts in batches sized by `store.batch_size`; returns the number of calls made."""
+    if not len(ids):
+        return 0
+    matrix = normalize_rows(vectors)
+    check_dimension(store, matrix.shape[1])
+    size = store.batch_size(matrix.shape[1], len(ids))
+    for start in range(0, len(ids), size):
+        store.upsert(ids[start:start + size], matrix[start:start + size], hashes[start:start + size])
+    return -(-len(ids) // size)
+
+
+class InMemoryVectorStore(VectorStore):
+    """
+    Exact search in this process over one float32 matrix, grown by doubling.
+    Deleted rows are masked out and reused by later upserts. Nothing is saved;
+    the app rebuilds it from the catalog when a worker starts.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, capacity: int = 1024):
+        self._dimension = dimension
+        self._capacity = capacity
+        self._vectors: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._hashes: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._lock = threading.Lock()
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._dimension
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def hashes(self) -> Dict[str, Optional[str]]:
+        with self._lock:
+            return {vector_id: self._hashes[row] for vector_id, row in self._rows.items()}
+
+    def _grow(self, rows: int) -> None:
+        capacity = max(self._capacity, 2 * len(self._ids), rows)
+        vectors = np.zeros((capacity, self._dimension), dtype=np.float32)
+        live = np.zeros(capacity, dtype=bool)
+        if self._vectors is not None:
+            vectors[:len(self._vectors)] = self._vectors
+            live[:len(self._live)] = self._live
+        self._vectors, self._live = vectors, live
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, hashes: Sequence[str]) -> None:
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+            new_rows = sum(1 for vector_id in ids if vector_id not in self._rows)
+            if self._vectors is None or len(self._ids) + new_rows - len(self._free_rows) > len(self._vectors):
+                self._grow(len(self._ids) + new_rows)
+            for vector_id, vector, content_hash in zip(ids, vectors, hashes):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    if self._free_rows:
+                        row = self._free_rows.pop()
+                    else:
+                        row = len(self._ids)
+                        self._ids.append(None)
+                        self._hashes.append(None)
+                    self._rows[vector_id] = row
+                self._vectors[row] = vector
+                self._live[row] = True
+                self._ids[row] = vector_id
+                self._hashes[row] = content_hash
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, Tuple[np.ndarray, Optional[str]]]:
+        """Stored vector and content hash of each of `ids` that is present."""
+        with self._lock:
+            return {
+                vector_id: (self._vectors[self._rows[vector_id]].copy(), self._hashes[self._rows[vector_id]])
+                for vector_id in ids if vector_id in self._rows
+            }
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is not None:
+                    self._live[row] = False
+                    self._ids[row] = self._hashes[row] = None
+                    self._free_rows.append(row)
+
+    def query(self, vectors: Any, k: int) -> Matches:
+        with self._lock:
+            k = min(k, len(self._rows))
+            if k <= 0 or not len(vectors):
+                return [[] for _ in range(len(vectors))]
+            used = len(self._ids)
+            scores = normalize_rows(vectors) @ self._vectors[:used].T
+            scores[:, ~self._live[:used]] = -np.inf
+            top, top_scores = top_k_rows(scores, k)
+            return [
+                [(self._ids[row], float(score)) for row, score in zip(rows, row_scores)]
+                for rows, row_scores in zip(top, top_scores)
+            ]
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    A persisted Chroma collection (approximate HNSW search). Upsert calls are
+    capped at the client's `max_batch_size`. Distances are turned into cosine
+    similarities for the collection's `hnsw:space`, since vectors are unit length.
+    """
+
+    def __init__(self, collection: Any, max_batch_records: Optional[int] = None):
+        self.collection = collection
+        self.max_batch_records = max_batch_records
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self._dimension: Optional[int] = None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        if self._dimension is None:
+            stored = self.collection.get(limit=1, include=["embeddings"])["embeddings"]
+            if stored:
+                self._dimension = len(stored[0])
+        return self._dimension
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+    def hashes(self) -> Dict[str, Optional[str]]:
+        existing = self.collection.get(include=["metadatas"])
+        return {
+            vector_id: (metadata or {}).get(HASH_METADATA_KEY)
+            for vector_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, hashes: Sequence[str]) -> None:
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=vectors.tolist(),
+            metadatas=[{HASH_METADATA_KEY: content_hash} for content_hash in hashes],
+        )
+        self._dimension = vectors.shape[1]
+
+    def delete(self, ids: Sequence[str]) -> None:
+        self.collection.delete(ids=list(ids))
+
+    def query(self, vectors: Any, k: int) -> Matches:
+        if not len(vectors):
+            return []
+        results = self.collection.query(
+            query_embeddings=normalize_rows(vectors).tolist(), n_results=k, include=["distances"]
+        )
+        # l2 is squared Euclidean distance: 2 - 2 * cosine for unit vectors
+        scale = 0.5 if self.space == "l2" else 1.0
+        return [
+            [(vector_id, 1.0 - scale * distance) for vector_id, distance in zip(ids, distances)]
+            for ids, distances in zip(results["ids"], results["distances"])
+        ]
+
+
+def open_chroma_store(directory: str, name: str, search_ef: int = 100) -> ChromaVectorStore:
+    """
+    Opens the Chroma collection `name` persisted in `directory`, creating it
+    with cosine space and `search_ef` if it does not exist. Existing collections
+    keep their HNSW settings, which Chroma cannot change after creation.
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=directory, settings=Settings(anonymized_telemetry=False))
+    try:
+        collection = client.get_collection(name, embedding_function=None)
+    except ValueError:
+        collection = client.create_collection(
+            name, metadata={"hnsw:space": "cosine", "hnsw:search_ef": search_ef}, embedding_function=None
+        )
+    return ChromaVectorStore(collection, max_batch_records=client.max_batch_size)
+
+
+class RemoteVectorStore(VectorStore):
+    """
+    An index in a remote vector service speaking Pinecone's data-plane REST
+    API (upsert, query, delete, fetch, list and describe_index_stats) at
+    `base_url`. Upserts keep to its limits of 1000 vectors and 2MB per request;
+    queries, one vector per request, run `max_concurrency` at a time.
+    """
+
+    max_batch_records = 1000
+    max_batch_bytes = 2 * 1024 * 1024
+    # Ids per fetch request, keeping the query string short
+    FETCH_BATCH = 100
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, namespace: str = "",
+                 session: Any = None, timeout: Any = (5, 30), max_concurrency: int = 4):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.namespace = namespace
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.headers = {"Api-Key": api_key} if api_key else {}
+        self._pool = ThreadPoolExecutor(max_concurrency, thread_name_prefix="vector-store")
+        self._dimension: Optional[int] = None
+
+    def _call(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = self.session.request(
+            method, f"{self.base_url}{path}", json=body, headers=self.headers, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise VectorStoreError(f"{method} {path} failed with {response.status_code}: {response.text[:500]}")
+        return response.json() if response.content else {}
+
+    def _stats(self) -> Dict[str, Any]:
+        return self._call("POST", "/describe_index_stats", {})
+
+    @property
+    def dimension(self) -> Optional[int]:
+        # Remote indexes declare their dimension when they are created
+        if self._dimension is None:
+            self._dimension = self._stats().get("dimension")
+        return self._dimension
+
+    def __len__(self) -> int:
+        stats = self._stats()
+        return stats.get("namespaces", {}).get(self.namespace, {}).get("vectorCount", 0)
+
+    def record_bytes(self, dimension: int) -> int:
+        # JSON floats take up to ~24 characters each, plus the id and metadata
+        return 24 * dimension + 256
+
+    def hashes(self) -> Dict[str, Optional[str]]:
+        ids: List[str] = []
+        token = None
+        while True:
+            params = {"namespace": self.namespace, "limit": 100, **({"paginationToken": token} if token else {})}
+            page = self._call("GET", f"/vectors/list?{urlencode(params)}")
+            ids.extend(vector["id"] for vector in page.get("vectors", []))
+            token = page.get("pagination", {}).get("next")
+            if not token:
+                break
+        found: Dict[str, Optional[str]] = {}
+        for start in range(0, len(ids), self.FETCH_BATCH):
+            params = urlencode({"ids": ids[start:start + self.FETCH_BATCH], "namespace": self.namespace}, doseq=True)
+            for vector_id, vector in self._call("GET", f"/vectors/fetch?{params}").get("vectors", {}).items():
+                found[vector_id] = (vector.get("metadata") or {}).get(HASH_METADATA_KEY)
+        return found
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, hashes: Sequence[str]) -> None:
+        self._call("POST", "/vectors/upsert", {
+            "vectors": [
+                {"id": vector_id, "values": vector, "metadata": {HASH_METADATA_KEY: content_hash}}
+                for vector_id, vector, content_hash in zip(ids, vectors.tolist(), hashes)
+            ],
+            "namespace": self.namespace,
+        })
+
+    def delete(self, ids: Sequence[str]) -> None:
+        for start in range(0, len(ids), self.max_batch_records):
+            self._call("POST", "/vectors/delete", {
+                "ids": list(ids[start:start + self.max_batch_records]), "namespace": self.namespace
+            })
+
+    def _query_one(self, vector: List[float], k: int) -> List[Tuple[str, float]]:
+        response = self._call("POST", "/query", {
+            "vector": vector, "topK": k, "namespace": self.namespace,
+            "includeValues": False, "includeMetadata": False,
+        })
+        return [(match["id"], float(match["score"])) for match in response.get("matches", [])]
+
+    def query(self, vectors: Any, k: int) -> Matches:
+        if not len(vectors):
+            return []
+        return list(self._pool.map(lambda vector: self._query_one(vector, k), normalize_rows(vectors).tolist()))